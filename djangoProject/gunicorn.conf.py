@@ -0,0 +1,41 @@
+# gunicorn 预派生配置：gunicorn -c djangoProject/gunicorn.conf.py djangoProject.wsgi
+#
+# master 中导入 TensorFlow 与模型代码并 gc.freeze()，worker 通过写时复制共享这些模块占用的页；
+# TF 运行时不是 fork 安全的，建图与预热放在 post_fork 中由每个 worker 各自完成，权重每个 worker 一份（见 myapp/prefork.py）。
+# 用 python manage.py memory_report --master <master pid> 查看每个 worker 的独占内存（USS）。
+# python manage.py tune_threads 生成的线程配置决定默认 worker 数，并可把每个 worker 绑定到专属的 CPU 段。
+import json
+import os
+
+os.environ.setdefault('CTA_PREFORK', '1')
+
+# 配置文件加载时项目目录未必在 sys.path 中，这里直接读 JSON，不导入 myapp
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THREAD_CONFIG = os.environ.get('CTA_THREAD_CONFIG', os.path.join(BASE_DIR, 'cache', 'thread_config.json'))
+thread_config = None
+if os.path.exists(THREAD_CONFIG):
+    with open(THREAD_CONFIG) as f:
+        thread_config = json.load(f)
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', (thread_config or {}).get('workers', 2)))
+# 推理是 CPU 密集的，每个 worker 只开少量线程；TF 自身的线程池由 intra/inter-op 设置控制
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('CTA_PREFORK') == '1'
+
+
+def post_fork(server, worker):
+    from myapp.src.home.ubuntu.js.thread_config import pin_worker
+
+    # worker.age 随每次派生递增，按它轮流分配 CPU 段；重启的 worker 接替空出的位置
+    cpus = pin_worker(worker.age % server.num_workers, thread_config)
+    if cpus:
+        server.log.info(f"worker {worker.pid} 绑定 CPU {sorted(cpus)}")
+    if not preload_app:
+        # 未预加载时应用还没导入，生成器按 CTA_PRELOAD_GENERATOR 在 worker 导入 wsgi 时加载
+        return
+    from myapp.prefork import post_fork_warmup
+
+    post_fork_warmup()
+    server.log.info(f"worker {worker.pid} 已完成生成器预热")
@@ -143,4 +143,48 @@ LOGGING = {
 }
 # 阈值分割
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # 存储上传和处理后的文件
-MEDIA_URL = '/media/'  # 访问媒体文件的 URL 前缀
\ No newline at end of file
+MEDIA_URL = '/media/'  # 访问媒体文件的 URL 前缀
+MEDIA_STORAGE_AREAS = ('processed', 'temp', 'series', 'pyramids')  # 受垃圾回收管理的 media 子目录
+MEDIA_STORAGE_TTL = 24 * 3600  # 超过该时间（秒）未访问的输出文件被删除
+MEDIA_STORAGE_MAX_BYTES = 1024 * 1024 * 1024  # 受管理目录的总容量上限，超出后按最近访问时间淘汰到 90%
+MEDIA_STORAGE_SWEEP_INTERVAL = 300  # 写入时顺带清理的最短间隔（秒）
+PYRAMID_TILE_SIZE = 256  # 结果瓦片金字塔的瓦片边长
+
+# CT→CTA 图像生成
+CTA_PRELOAD_GENERATOR = True  # 进程启动时加载生成器权重并预热
+CTA_PREFORK = os.environ.get('CTA_PREFORK') == '1'  # 由 gunicorn.conf.py 设置：master 只做 fork 安全的预加载，worker 在 post_fork 中建图
+CTA_BATCH_ENABLED = True  # 合并并发请求做批量推理
+CTA_BATCH_MAX_SIZE = 8  # 单批最多图像数
+CTA_BATCH_MAX_WAIT_MS = 10  # 凑批最长等待时间（毫秒）
+CTA_TILE_SIZE = 512  # 分块推理的 tile 边长（需与生成器输入一致）
+CTA_TILE_OVERLAP = 64  # 相邻 tile 的重叠像素，用于窗函数融合接缝
+CTA_TILE_BATCH_SIZE = 4  # 每次前向送入的 tile 数，决定峰值内存
+CTA_TILE_SCRATCH_DIR = None  # 设置后累加缓冲改用该目录下的内存映射文件
+CTA_RESULT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'cta')  # 生成结果磁盘缓存目录
+CTA_RESULT_CACHE_MEMORY_ITEMS = 128  # 进程内 LRU 保存的 PNG 数量
+CTA_RESULT_CACHE_DISK_MAX_BYTES = 512 * 1024 * 1024  # 磁盘缓存容量上限，超出后按最近访问时间淘汰
+CTA_GENERATOR_BACKEND = 'keras'  # keras：按 build_generator 建图加载 .hdf5；savedmodel：加载 export_generator 导出的产物；tflite：加载 quantize_generator 发布的量化模型
+CTA_GENERATOR_ARTIFACT = os.path.join(BASE_DIR, 'myapp', 'src', 'home', 'ubuntu', 'js', 'saved_models', 'exported', 'G_A2B')
+CTA_QUANTIZED_ARTIFACT = os.path.join(BASE_DIR, 'myapp', 'src', 'home', 'ubuntu', 'js', 'saved_models', 'exported', 'G_A2B_quantized.tflite')
+CTA_JOB_DIR = os.path.join(BASE_DIR, 'cache', 'jobs')  # 异步任务状态与结果目录
+CTA_JOB_WORKERS = 2  # 推理进程池大小
+CTA_JOB_RESULT_TTL = 600  # 已完成结果的保留时间（秒）
+CTA_INFERENCE_SOCKET = None  # 设置为 Unix socket 路径后改由 run_inference_server 进程推理，Django 进程不加载 TensorFlow
+CTA_INFERENCE_TIMEOUT = 120  # 等待推理服务应答的超时（秒）
+CTA_INFERENCE_INFO_TTL = 1.0  # 复用推理服务模型版本等信息的时长（秒），避免每个请求多一次往返
+CTA_SERIES_BATCH_SIZE = 8  # 整序列生成时每次前向的切片数
+CTA_SERIES_WINDOW = (400, 40)  # DICOM 序列转灰度时整个序列共用的 (窗宽, 窗位)，单位 HU
+CTA_MODEL_MANIFEST = os.path.join(BASE_DIR, 'myapp', 'src', 'home', 'ubuntu', 'js', 'saved_models', 'manifest.json')  # 模型版本清单，不存在时退回目录扫描
+CTA_MODEL_MAX_RESIDENT = 2  # 每个进程最多常驻的模型版本数
+CTA_MODEL_MANIFEST_POLL_SECONDS = 5  # 检查清单默认版本是否变化的间隔（秒）
+CTA_THREAD_CONFIG = os.environ.get('CTA_THREAD_CONFIG', os.path.join(BASE_DIR, 'cache', 'thread_config.json'))  # tune_threads 生成的 TF 线程配置，存在时在建图前应用
+CTA_PREVIEW_SIZE = 256  # 预览模式的推理边长（需为 4 的倍数），结果双线性放大回 512x512
+
+# DICOM 骨水泥分割
+DICOM_MAX_UPLOAD_SIZE = 64 * 1024 * 1024  # 单个 DICOM 上传的大小上限（字节），上传内容在内存中解析，不落盘
+DICOM_MASK_FORMAT = 'png'  # 分割结果格式：png 或 webp（无损）
+DICOM_MASK_BITS = 1  # PNG 位深：1 位（最小）或 8 位灰度
+DICOM_HU_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 每个进程缓存的 HU 数组总字节数上限，用于免重传地调整阈值
+
+# 监控
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')  # 允许抓取 /metrics/ 的来源地址
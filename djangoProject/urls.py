@@ -30,7 +30,16 @@ from myapp.views import (
     VideoListView,
     VideoDetailView,
     ImageProcessingView,
+    InferenceStatsView,
+    MetricsView,
+    ImageJobView,
+    ImageJobStatusView,
+    SeriesProcessingView,
     DicomProcessingView,
+    DicomThresholdView,
+    DicomPreviewView,
+    PyramidMetaView,
+    PyramidTileView,
     PriceAnalysisView,
     AIChatHandler
 )
@@ -43,7 +52,16 @@ urlpatterns = [
     path('sysm/', SYSMView.as_view(), name='sysm'),
     path('chat/', ChatView.as_view(), name='chat'),
     path('process_image/', ImageProcessingView.as_view(), name='process_image'),
+    path('process_image/stats/', InferenceStatsView.as_view(), name='inference_stats'),
+    path('process_image/jobs/', ImageJobView.as_view(), name='image_jobs'),
+    path('process_image/jobs/<str:job_id>/', ImageJobStatusView.as_view(), name='image_job_status'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('process_series/', SeriesProcessingView.as_view(), name='process_series'),
     path('process-dicom/', DicomProcessingView.as_view(), name='dicom_processor'),
+    path('process-dicom/threshold/', DicomThresholdView.as_view(), name='dicom_threshold'),
+    path('process-dicom/preview/', DicomPreviewView.as_view(), name='dicom_preview'),
+    path('pyramids/<str:key>/meta.json', PyramidMetaView.as_view(), name='pyramid_meta'),
+    path('pyramids/<str:key>/<int:level>/<int:col>_<int:row>.png', PyramidTileView.as_view(), name='pyramid_tile'),
     path('get_response/', AIChatHandler.handle_request, name='get_response'),
     path('articles/', ArticleListView.as_view(), name='article_list'),
     path('article/<int:pk>/', ArticleDetailView.as_view(), name='article_detail'),
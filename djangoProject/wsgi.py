@@ -14,3 +14,20 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoProject.settings')
 
 application = get_wsgi_application()
+
+# 启动时在当前进程内预加载并预热 CT→CTA 生成器，避免首个请求承担建图和加载权重的开销
+from django.conf import settings
+
+if getattr(settings, 'CTA_PREFORK', False):
+    # gunicorn preload_app：此处运行在 master 中，只做 fork 安全的准备，建图由各 worker 的 post_fork 完成
+    from myapp.prefork import preload_for_fork
+
+    preload_for_fork()
+elif getattr(settings, 'CTA_PRELOAD_GENERATOR', False):
+    import logging
+    from myapp.inference import preload_generator
+
+    try:
+        preload_generator()
+    except Exception:
+        logging.getLogger(__name__).exception("生成器预加载失败，将在首个请求时重试")
@@ -0,0 +1,77 @@
+# 序列预览渲染基准：对比逐切片浮点窗宽窗位（乘加、裁剪、取整、转 uint8）与 render_volume 的查找表 np.take，
+# 并以同样读写字节数的 int16 → uint8 类型转换作为内存带宽参照，查找表路径应接近该参照。
+#
+#   python -m myapp.benchmarks.dicom_render --slices 200 --size 512 --repeats 5
+import argparse
+import time
+
+import numpy as np
+
+from myapp.dicom_render import PRESETS, render_volume, window_lut
+from myapp.dicom_volume import DicomVolume
+
+
+def synthetic_volume(slices, size):
+    """CT 存储值：空气 / 软组织 / 骨混合，RescaleIntercept 为 -1024"""
+    rng = np.random.default_rng(0)
+    voxels = rng.normal(1064, 300, (slices, size, size)).clip(0, 4095).astype(np.int16)
+    return DicomVolume(voxels, np.ones(slices), np.full(slices, -1024.0), (1.0, 0.5, 0.5),
+                       [f"{i:04d}.dcm" for i in range(slices)])
+
+
+def float_render(volume, window, level):
+    out = np.empty(volume.shape, dtype=np.uint8)
+    lower = level - window / 2.0
+    for i in range(volume.shape[0]):
+        hu = volume.voxels[i] * np.float32(volume.slopes[i]) + np.float32(volume.intercepts[i])
+        out[i] = np.rint(np.clip((hu - lower) * (255.0 / window), 0, 255))
+    return out
+
+
+def bandwidth_floor(volume, window, level):
+    out = np.empty(volume.shape, dtype=np.uint8)
+    np.copyto(out, volume.voxels, casting='unsafe')
+    return out
+
+
+def best_of(fn, volume, window, level, repeats):
+    fn(volume, window, level)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(volume, window, level)
+        samples.append(time.perf_counter() - started)
+    return min(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='序列预览渲染：浮点窗宽窗位 vs 查找表 np.take')
+    parser.add_argument('--slices', type=int, default=200)
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='soft_tissue')
+    args = parser.parse_args(argv)
+
+    volume = synthetic_volume(args.slices, args.size)
+    window, level = PRESETS[args.preset]
+    # 浮点路径为 float32，个别恰在 .5 边界的像素可能差 1 级灰度
+    diff = np.abs(float_render(volume, window, level).astype(np.int16) - render_volume(volume, args.preset))
+    assert diff.max() <= 1, diff.max()
+
+    started = time.perf_counter()
+    window_lut.cache_clear()
+    window_lut(float(window), float(level), 1.0, -1024.0, True)
+    print(f"构建查找表 {(time.perf_counter() - started) * 1000:.2f}ms（之后命中缓存）")
+
+    moved = volume.voxels.nbytes + volume.voxels.size  # 读 int16 + 写 uint8
+    for label, fn in (
+        ('浮点逐切片', float_render),
+        ('查找表 np.take', lambda v, w, l: render_volume(v, window=w, level=l)),
+        ('带宽参照 astype', bandwidth_floor),
+    ):
+        seconds = best_of(fn, volume, window, level, args.repeats)
+        print(f"{label:<16} {seconds * 1000:8.1f}ms  {args.slices / seconds:8.0f} 张/s  {moved / seconds / 1e9:6.2f} GB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# DICOM 上传路径基准：对比原先 写入 media/temp → dcmread(路径) → os.remove 与直接从内存中的上传对象 dcmread，
+# 统计单次 p50 延迟与 Python 侧峰值内存分配。
+#
+#   python -m myapp.benchmarks.dicom_upload --size 512 --repeats 50
+#   python -m myapp.benchmarks.dicom_upload --size 2048 --temp-dir /data/media/temp   # 大切片、实际部署的磁盘
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+import pydicom
+from pydicom.data import get_testdata_file
+
+CHUNK_SIZE = 64 * 1024  # 与 Django 上传文件 chunks() 的默认块大小一致
+
+
+def synthetic_dicom(size):
+    """以 pydicom 自带的 CT 切片为模板，换成 size×size 的 int16 像素"""
+    ds = pydicom.dcmread(get_testdata_file('CT_small.dcm'))
+    pixels = np.random.default_rng(0).integers(-1024, 3000, (size, size), dtype=np.int16)
+    ds.Rows, ds.Columns = size, size
+    ds.PixelData = pixels.tobytes()
+    buffer = io.BytesIO()
+    ds.save_as(buffer)
+    return buffer.getvalue()
+
+
+def legacy_path(upload, temp_dir):
+    """FileSystemStorage.save 按块写盘，再按路径读回，最后删除"""
+    path = os.path.join(temp_dir, f"upload_{uuid.uuid4().hex}.dcm")
+    upload.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(upload, f, CHUNK_SIZE)
+    try:
+        return pydicom.dcmread(path).pixel_array
+    finally:
+        os.remove(path)
+
+
+def direct_path(upload):
+    upload.seek(0)
+    return pydicom.dcmread(upload).pixel_array
+
+
+def measure(fn, repeats):
+    fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return {'p50_ms': float(np.percentile(samples, 50)), 'mean_ms': float(np.mean(samples)),
+            'peak_alloc_mb': peak / 1024 / 1024}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='DICOM 上传：临时文件往返 vs 直接从上传对象解析')
+    parser.add_argument('--size', type=int, default=512, help='切片边长')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--temp-dir', type=str, default=None, help='临时文件目录（默认系统临时目录）')
+    args = parser.parse_args(argv)
+
+    data = synthetic_dicom(args.size)
+    upload = io.BytesIO(data)  # 相当于 DicomUploadHandler 生成的 InMemoryUploadedFile
+    temp_dir = args.temp_dir or tempfile.mkdtemp()
+    os.makedirs(temp_dir, exist_ok=True)
+    try:
+        assert np.array_equal(legacy_path(upload, temp_dir), direct_path(upload))
+        legacy = measure(lambda: legacy_path(upload, temp_dir), args.repeats)
+        direct = measure(lambda: direct_path(upload), args.repeats)
+    finally:
+        if args.temp_dir is None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"{args.size}x{args.size} DICOM，{len(data) / 1024 / 1024:.2f} MB")
+    for label, stats in (('临时文件往返', legacy), ('直接解析上传', direct)):
+        print(f"{label:<8} p50={stats['p50_ms']:7.2f}ms mean={stats['mean_ms']:7.2f}ms "
+              f"peak_alloc={stats['peak_alloc_mb']:6.2f}MB")
+    print(f"p50 {(direct['p50_ms'] - legacy['p50_ms']) / legacy['p50_ms'] * 100:+.1f}%")
+
+
+if __name__ == '__main__':
+    main()
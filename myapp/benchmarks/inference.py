@@ -0,0 +1,222 @@
+# CT→CTA 推理路径基准：随机初始化的 build_generator（无需训练权重），
+# 按 批大小 × 线程数 统计 decode / resize / predict / encode 各阶段的 p50/p95/p99 延迟、吞吐与该阶段的峰值 RSS 及增量，结果写入 JSON。
+#
+#   python -m myapp.benchmarks.inference --batch-sizes 1 2 4 --threads 1 2 4 --output bench_inference.json
+#   python -m myapp.benchmarks.inference --baseline old.json --output new.json   # 与上一次结果对比
+#
+# TensorFlow 的线程池只能在运行时初始化前设置，因此每个线程配置在独立子进程中运行（--worker）。
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+STAGES = ('decode', 'resize', 'predict', 'encode')
+
+
+def _proc_status_mb(field):
+    """读取 /proc/self/status 中的 VmRSS / VmHWM（MB）；非 Linux 时返回 None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """向 /proc/self/clear_refs 写入 5 把 VmHWM 重置为当前 RSS，使峰值只反映之后的阶段"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _summarize(samples, memory, batch_size):
+    samples = np.asarray(samples)
+    return {
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean()),
+        'images_per_s': float(batch_size * 1000.0 / samples.mean()),
+        **memory,
+    }
+
+
+def _time(fn, repeats, warmup):
+    """返回 (每次耗时 ms 列表, 本阶段内存统计)
+
+    ru_maxrss 是整个进程生命周期的峰值，排在最大阶段之后的阶段只会重复该值；
+    因此计时前重置 VmHWM 并记下基线 RSS，报告本阶段的峰值与相对基线的增量。
+    无法重置时退回进程峰值，rss_delta_mb 为 None。
+    """
+    for _ in range(warmup):
+        fn()
+    baseline = _proc_status_mb('VmRSS') if _reset_peak_rss() else None
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    if baseline is None:
+        # Linux 上 ru_maxrss 的单位是 KB
+        memory = {'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 'rss_delta_mb': None}
+    else:
+        peak = _proc_status_mb('VmHWM')
+        memory = {'peak_rss_mb': peak, 'rss_delta_mb': peak - baseline}
+    return samples, memory
+
+
+def build_random_generator():
+    """按推理配置构建 G_A2B，权重保持随机初始化"""
+    from tensorflow_addons.layers import InstanceNormalization
+    from myapp.src.home.ubuntu.js.test_image import build_generator, opt
+
+    return build_generator({'normalization': InstanceNormalization}, opt, name='G_A2B_model')
+
+
+def run_worker(batch_sizes, intra, inter, repeats, warmup, input_size, stages=STAGES):
+    """在当前进程内跑一个线程配置，返回 {批大小: {阶段: 统计}}"""
+    if 'predict' in stages:
+        import tensorflow as tf
+
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+    from myapp.src.home.ubuntu.js.preprocessing import decode_gray, denormalize_to_uint8, preprocess_into
+
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 256, (input_size, input_size), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(raw).save(buffer, format='PNG')
+    png = buffer.getvalue()
+
+    generator = build_random_generator() if 'predict' in stages else None
+    results = {}
+    for batch_size in batch_sizes:
+        batch = np.empty((batch_size, 512, 512, 1), dtype=np.float32)
+        for i in range(batch_size):
+            preprocess_into(raw, batch[i])
+        output = generator.predict(batch) if generator is not None else batch
+
+        def encode():
+            for i in range(batch_size):
+                Image.fromarray(denormalize_to_uint8(output[i])).save(io.BytesIO(), format='PNG')
+
+        stage_fns = {
+            'decode': lambda: [decode_gray(io.BytesIO(png)) for _ in range(batch_size)],
+            'resize': lambda: [preprocess_into(raw, batch[i]) for i in range(batch_size)],
+            'predict': lambda: generator.predict(batch),
+            'encode': encode,
+        }
+        results[str(batch_size)] = {
+            stage: _summarize(*_time(stage_fns[stage], repeats, warmup), batch_size) for stage in stages
+        }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def worker_command(batch_sizes, intra, inter, repeats, warmup, input_size, stages=STAGES):
+    """单个线程配置的子进程命令行，子进程最后一行输出为 JSON 结果"""
+    return [sys.executable, '-m', 'myapp.benchmarks.inference', '--worker',
+            '--intra', str(intra), '--inter', str(inter),
+            '--repeats', str(repeats), '--warmup', str(warmup), '--input-size', str(input_size),
+            '--batch-sizes', *map(str, batch_sizes), '--stages', *stages]
+
+
+def parse_worker_output(output):
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def run_config(batch_sizes, intra, inter, repeats, warmup, input_size, stages=STAGES):
+    """在子进程中运行一个线程配置，返回其 JSON 结果"""
+    output = subprocess.check_output(worker_command(batch_sizes, intra, inter, repeats, warmup, input_size, stages))
+    return parse_worker_output(output)
+
+
+def compare(baseline, current):
+    """打印与基线相比 p50 的变化"""
+    for config, batches in current['results'].items():
+        for batch_size, stages in batches.items():
+            for stage, stats in stages.items():
+                try:
+                    old = baseline['results'][config][batch_size][stage]['p50_ms']
+                except KeyError:
+                    continue
+                change = (stats['p50_ms'] - old) / old * 100.0
+                flag = '⚠️' if change > 10 else ''
+                print(f"{config:<12} batch={batch_size:<3} {stage:<8} p50 {old:8.2f} → {stats['p50_ms']:8.2f} ms "
+                      f"({change:+.1f}%) {flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CT→CTA 推理路径基准')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help='要测试的 intra-op 线程数')
+    parser.add_argument('--inter', type=int, default=1, help='inter-op 线程数')
+    parser.add_argument('--intra', type=int, default=1, help='（--worker 模式）intra-op 线程数')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--input-size', type=int, default=1024, help='解码/缩放阶段的输入边长')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--output', type=str, default='bench_inference.json')
+    parser.add_argument('--baseline', type=str, default=None, help='用于对比的上一次结果文件')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = run_worker(args.batch_sizes, args.intra, args.inter, args.repeats, args.warmup,
+                            args.input_size, args.stages)
+        print(json.dumps(result))
+        return
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'python': platform.python_version()},
+        'params': {'batch_sizes': args.batch_sizes, 'threads': args.threads, 'inter': args.inter,
+                   'repeats': args.repeats, 'input_size': args.input_size},
+        'results': {},
+    }
+    for threads in args.threads:
+        key = f"intra{threads}_inter{args.inter}"
+        print(f"运行 {key} ...", file=sys.stderr)
+        report['results'][key] = run_config(args.batch_sizes, threads, args.inter, args.repeats, args.warmup,
+                                            args.input_size, args.stages)
+        for batch_size, stages in report['results'][key].items():
+            for stage, stats in stages.items():
+                print(f"{key:<12} batch={batch_size:<3} {stage:<8} p50={stats['p50_ms']:8.2f}ms "
+                      f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms "
+                      f"{stats['images_per_s']:8.1f} img/s rss={stats['peak_rss_mb']:.0f}MB"
+                      + (f" (+{stats['rss_delta_mb']:.0f}MB)" if stats.get('rss_delta_mb') is not None else ''))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# 分割掩膜编码基准：对比 plt.imsave(cmap='gray')（RGBA PNG）与 encode_mask 的 1 位 / 8 位 PNG 和无损 WebP，
+# 统计单线程 p50、多线程并发吞吐与输出大小。pyplot 不是线程安全的，并发测试时原路径串行加锁执行。
+#
+#   python -m myapp.benchmarks.mask_encoding --size 512 --repeats 50 --threads 4
+import argparse
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+from myapp.dicom_utils import encode_mask
+
+_pyplot_lock = threading.Lock()
+
+
+def synthetic_mask(size):
+    """阈值分割后的骨水泥掩膜：少量不规则高亮区域，其余为背景"""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[:size, :size]
+    mask = np.zeros((size, size), dtype=bool)
+    for _ in range(6):
+        cy, cx, r = rng.integers(size // 8, size - size // 8, 2).tolist() + [int(rng.integers(size // 40, size // 12))]
+        mask |= (yy - cy) ** 2 + (xx - cx) ** 2 < r ** 2
+    mask |= rng.random((size, size)) > 0.995  # 孤立噪点
+    return np.where(mask, 255, 0).astype(np.uint8)
+
+
+def legacy_encode(mask):
+    buffer = io.BytesIO()
+    with _pyplot_lock:
+        plt.imsave(buffer, mask, cmap='gray', format='png')
+        plt.close()
+    return buffer.getvalue()
+
+
+ENCODERS = {
+    'plt.imsave RGBA': legacy_encode,
+    'PNG 1 位': lambda mask: encode_mask(mask, 'png', bits=1),
+    'PNG 8 位': lambda mask: encode_mask(mask, 'png', bits=8),
+    'WebP 无损': lambda mask: encode_mask(mask, 'webp'),
+}
+
+
+def decoded_mask(data):
+    return np.asarray(Image.open(io.BytesIO(data)).convert('L')) > 127
+
+
+def single_thread_p50(fn, mask, repeats):
+    fn(mask)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(mask)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return float(np.percentile(samples, 50))
+
+
+def throughput(fn, mask, repeats, threads):
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        started = time.perf_counter()
+        list(pool.map(lambda _: fn(mask), range(repeats * threads)))
+        return repeats * threads / (time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='分割掩膜编码：plt.imsave vs 直接 PNG / WebP')
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=4, help='并发吞吐测试的线程数')
+    args = parser.parse_args(argv)
+
+    mask = synthetic_mask(args.size)
+    expected = mask > 0
+    for label, fn in ENCODERS.items():
+        data = fn(mask)
+        assert np.array_equal(decoded_mask(data), expected), label
+        p50 = single_thread_p50(fn, mask, args.repeats)
+        rate = throughput(fn, mask, args.repeats, args.threads)
+        print(f"{label:<16} p50={p50:7.2f}ms  {args.threads} 线程 {rate:8.1f} 张/s  大小 {len(data) / 1024:7.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
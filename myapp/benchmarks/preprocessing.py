@@ -0,0 +1,77 @@
+# 前/后处理微基准：对比原 skimage 路径与 preprocessing 模块的单张耗时和内存分配
+#
+#   python -m myapp.benchmarks.preprocessing --size 1024 --repeats 50
+import argparse
+import io
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from myapp.src.home.ubuntu.js.preprocessing import decode_gray, denormalize_to_uint8, preprocess_into
+
+
+def legacy_pipeline(png, output):
+    """改造前的路径：PIL 解码 → np.array → skimage resize(float64) → *2-1 → newaxis → reshape；输出 astype"""
+    from skimage.transform import resize
+
+    image = np.array(Image.open(io.BytesIO(png)).convert('L'))
+    image = resize(image, (512, 512))
+    image = image[:, :, np.newaxis]
+    image = image * 2 - 1
+    batch = np.reshape(image, (1, 512, 512, 1))
+    result = (output.squeeze() * 127.5 + 127.5).astype(np.uint8)
+    return batch, result
+
+
+def fused_pipeline(png, output, batch):
+    image = decode_gray(io.BytesIO(png))
+    preprocess_into(image, batch[0])
+    return batch, denormalize_to_uint8(output)
+
+
+def measure(fn, repeats):
+    fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return {'p50_ms': float(np.percentile(samples, 50)), 'mean_ms': float(np.mean(samples)),
+            'peak_alloc_mb': peak / 1024 / 1024}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='前/后处理微基准')
+    parser.add_argument('--size', type=int, default=1024, help='输入切片边长')
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (args.size, args.size), dtype=np.uint8)).save(buffer, format='PNG')
+    png = buffer.getvalue()
+    output = rng.uniform(-1, 1, (512, 512, 1)).astype(np.float32)
+    batch = np.empty((1, 512, 512, 1), dtype=np.float32)
+
+    results = {'fused': measure(lambda: fused_pipeline(png, output, batch), args.repeats)}
+    try:
+        results['legacy'] = measure(lambda: legacy_pipeline(png, output), args.repeats)
+    except ImportError:
+        print('未安装 scikit-image，跳过原路径')
+
+    for name, r in results.items():
+        print(f"{name:<8} p50={r['p50_ms']:.2f}ms mean={r['mean_ms']:.2f}ms peak_alloc={r['peak_alloc_mb']:.2f}MB")
+    if 'legacy' in results:
+        print(f"加速 {results['legacy']['p50_ms'] / results['fused']['p50_ms']:.1f}x，"
+              f"峰值分配降低 {results['legacy']['peak_alloc_mb'] / max(results['fused']['peak_alloc_mb'], 1e-6):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# 反射填充卷积基准：对比 ReflectionPadding2D + Conv2D 与合并后的 ReflectionPaddingConv2D（reflect_pad_conv2d）
+# 在生成器各层形状上的 CPU 延迟、输出差异，以及填充中间结果的内存读写量；--generator 时再对比整个 G_A2B。
+#
+#   python -m myapp.benchmarks.reflection_conv --batch-size 1 --repeats 20 --generator
+import argparse
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from myapp.src.home.ubuntu.js.helper_funcs import reflect_pad_conv2d
+
+# build_generator 中所有“反射填充 + 卷积”的位置：(名称, 边长, 输入通道, 输出通道, 卷积核, 在生成器中出现的次数)
+GENERATOR_LAYERS = (
+    ('c7Ak 输入层', 512, 1, 32, 7, 1),
+    ('Rk 残差块', 128, 128, 128, 3, 18),
+    ('uk 上采样 64', 256, 128, 64, 3, 1),
+    ('uk 上采样 32', 512, 64, 32, 3, 1),
+    ('输出层', 512, 32, 1, 7, 1),
+)
+
+
+def padded_bytes(batch, size, channels, pad):
+    """未合并时 tf.pad 生成的整张填充特征图（写一次、卷积读一次）"""
+    return 2 * batch * (size + 2 * pad) ** 2 * channels * 4
+
+
+def strip_bytes(batch, size, channels, filters, pad):
+    """合并后只生成四条窄条及其边框输出"""
+    strips = 2 * batch * 3 * pad * (size + 2 * pad) * channels * 2
+    border = batch * (4 * pad * size) * filters
+    return 2 * (strips + border) * 4
+
+
+def _median_ms(fn, x, repeats, warmup):
+    for _ in range(warmup):
+        fn(x)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(x).numpy()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return float(np.median(samples))
+
+
+def bench_layers(batch_size, repeats, warmup):
+    rng = np.random.default_rng(0)
+    total_unfused = total_fused = 0.0
+    for name, size, channels, filters, kernel_size, count in GENERATOR_LAYERS:
+        pad = kernel_size // 2
+        x = tf.constant(rng.standard_normal((batch_size, size, size, channels), dtype=np.float32))
+        kernel = tf.constant(rng.standard_normal((kernel_size, kernel_size, channels, filters), dtype=np.float32) * 0.05)
+        paddings = [[0, 0], [pad, pad], [pad, pad], [0, 0]]
+
+        unfused = tf.function(lambda t: tf.nn.conv2d(tf.pad(t, paddings, 'REFLECT'), kernel, 1, 'VALID'))
+        fused = tf.function(lambda t: reflect_pad_conv2d(t, kernel, pad, pad))
+        diff = float(tf.reduce_max(tf.abs(unfused(x) - fused(x))))
+        unfused_ms = _median_ms(unfused, x, repeats, warmup)
+        fused_ms = _median_ms(fused, x, repeats, warmup)
+        total_unfused += unfused_ms * count
+        total_fused += fused_ms * count
+        print(f"{name:<12} {size:>4}x{size:<4} {channels:>3}→{filters:<3} k={kernel_size} ×{count:<2} "
+              f"未合并 {unfused_ms:7.2f}ms  合并 {fused_ms:7.2f}ms  "
+              f"填充读写 {padded_bytes(batch_size, size, channels, pad) / 2 ** 20:6.1f}MB → "
+              f"{strip_bytes(batch_size, size, channels, filters, pad) / 2 ** 20:5.2f}MB  max|Δ|={diff:.1e}")
+    print(f"按生成器中出现次数加权：未合并 {total_unfused:.1f}ms，合并 {total_fused:.1f}ms "
+          f"({(total_fused - total_unfused) / total_unfused * 100:+.1f}%)")
+
+
+def bench_generator(batch_size, repeats, warmup):
+    from tensorflow_addons.layers import InstanceNormalization
+    from myapp.src.home.ubuntu.js.test_image import build_generator, opt
+
+    model = {'normalization': InstanceNormalization}
+    unfused = build_generator(model, dict(opt, fuse_reflection_conv=False), name='G_A2B_model')
+    fused = build_generator(model, dict(opt, fuse_reflection_conv=True), name='G_A2B_model')
+    # 两者可训练权重的数量、形状和顺序一致，等价于用同一个 .hdf5 加载
+    fused.set_weights(unfused.get_weights())
+
+    x = tf.constant(np.random.default_rng(0).uniform(-1, 1, (batch_size,) + opt['img_shape']).astype(np.float32))
+    unfused_fn = tf.function(lambda t: unfused(t, training=False))
+    fused_fn = tf.function(lambda t: fused(t, training=False))
+    diff = float(tf.reduce_max(tf.abs(unfused_fn(x) - fused_fn(x))))
+    unfused_ms = _median_ms(unfused_fn, x, repeats, warmup)
+    fused_ms = _median_ms(fused_fn, x, repeats, warmup)
+    print(f"G_A2B 整体（batch={batch_size}）：未合并 {unfused_ms:.1f}ms，合并 {fused_ms:.1f}ms "
+          f"({(fused_ms - unfused_ms) / unfused_ms * 100:+.1f}%)，max|Δ|={diff:.1e}，"
+          f"层数 {len(unfused.layers)} → {len(fused.layers)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='反射填充卷积合并前后的 CPU 延迟与内存读写对比')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--generator', action='store_true', help='同时对比整个 G_A2B')
+    args = parser.parse_args(argv)
+
+    bench_layers(args.batch_size, args.repeats, args.warmup)
+    if args.generator:
+        bench_generator(args.batch_size, args.repeats, args.warmup)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# dicom_index.py
+# DICOM 目录索引：遍历目录树，只对新增或 mtime / 大小变化的文件在进程池中读文件头（stop_before_pixels），
+# 提取患者、检查、序列、实例号、切片位置、Rescale 参数和像素数据偏移，供 index_dicom 写入 DicomInstance 表。
+# 本模块不依赖 Django，进程池子进程无需初始化 Django。
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+PIXEL_DATA_TAG = b'\xe0\x7f\x10\x00'  # (7FE0,0010) 小端
+PIXEL_DATA_TAG_BE = b'\x7f\xe0\x00\x10'
+
+
+def path_hash(path):
+    return hashlib.sha256(path.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def walk_files(roots):
+    """遍历目录树，产出 (绝对路径, 大小, mtime)；跳过隐藏文件"""
+    for root in roots:
+        for directory, dirnames, filenames in os.walk(os.path.abspath(root)):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+
+def _text(ds, keyword, limit):
+    value = ds.get(keyword)
+    return str(value)[:limit] if value is not None else ''
+
+
+def _int(ds, keyword):
+    value = ds.get(keyword)
+    try:
+        return int(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def read_header(path):
+    """读取单个文件头；不是 DICOM 或无法解析时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            ds = pydicom.dcmread(f, stop_before_pixels=True)
+            # stop_before_pixels 时文件指针停在像素数据元素的起始处
+            offset = f.tell()
+            marker = f.read(4)
+    except (InvalidDicomError, OSError, ValueError, EOFError):
+        return None
+    if 'SOPClassUID' not in ds and 'SeriesInstanceUID' not in ds:
+        return None
+
+    position = ds.get('ImagePositionPatient')
+    try:
+        slice_position = float(position[2]) if position is not None and len(position) == 3 else None
+    except (TypeError, ValueError):
+        slice_position = None
+    meta = getattr(ds, 'file_meta', None)
+    return {
+        'patient_id': _text(ds, 'PatientID', 64),
+        'patient_name': _text(ds, 'PatientName', 128),
+        'study_uid': _text(ds, 'StudyInstanceUID', 64),
+        'study_date': _text(ds, 'StudyDate', 8),
+        'study_description': _text(ds, 'StudyDescription', 128),
+        'series_uid': _text(ds, 'SeriesInstanceUID', 64),
+        'series_number': _int(ds, 'SeriesNumber'),
+        'series_description': _text(ds, 'SeriesDescription', 128),
+        'modality': _text(ds, 'Modality', 16),
+        'sop_instance_uid': _text(ds, 'SOPInstanceUID', 64),
+        'instance_number': _int(ds, 'InstanceNumber'),
+        'slice_position': slice_position,
+        'rows': _int(ds, 'Rows'),
+        'columns': _int(ds, 'Columns'),
+        'rescale_slope': float(ds.get('RescaleSlope', 1) or 1),
+        'rescale_intercept': float(ds.get('RescaleIntercept', 0) or 0),
+        'transfer_syntax': str(meta.get('TransferSyntaxUID', ''))[:64] if meta is not None else '',
+        'pixel_offset': offset if marker in (PIXEL_DATA_TAG, PIXEL_DATA_TAG_BE) else None,
+    }
+
+
+def _read_chunk(paths):
+    return [(path, read_header(path)) for path in paths]
+
+
+def plan_scan(files, known):
+    """files 为 walk_files 的结果，known 为 {路径哈希: (大小, mtime)}；返回 (需要读取的文件, 已消失的路径哈希)"""
+    changed, seen = [], set()
+    for path, size, mtime in files:
+        key = path_hash(path)
+        seen.add(key)
+        if known.get(key) != (size, mtime):
+            changed.append((path, key, size, mtime))
+    return changed, set(known) - seen
+
+
+def read_headers(paths, workers=None, chunk_size=64):
+    """在进程池中批量读取文件头，按完成顺序产出 (路径, 头信息或 None)"""
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _read_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_read_chunk, chunks):
+            yield from results
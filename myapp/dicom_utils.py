@@ -0,0 +1,113 @@
+# dicom_utils.py
+# DICOM 上传直接在内存中解析：专用的上传处理器把文件块写进内存缓冲区（超过上限即丢弃），
+# pydicom 从上传对象读取，不再经 media/temp 写盘再读回，异常时也不会留下临时文件。
+# 分割结果直接由 PIL 编码为 1 位 / 8 位灰度 PNG（或无损 WebP），不经过 pyplot 的全局状态，可在多线程中并发调用。
+import io
+
+import numpy as np
+import pydicom
+from PIL import Image
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+# multipart 边界、表单字段等相对文件本身的余量
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_upload_size():
+    return getattr(settings, 'DICOM_MAX_UPLOAD_SIZE', 64 * 1024 * 1024)
+
+
+def upload_too_large(request, max_size=None):
+    """按 Content-Length 提前拒绝明显超限的请求，无需读取请求体"""
+    max_size = max_size if max_size is not None else max_upload_size()
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    return content_length > max_size + MULTIPART_OVERHEAD
+
+
+def size_error(max_size=None):
+    max_size = max_size if max_size is not None else max_upload_size()
+    return f"DICOM 文件过大（上限 {max_size / 1024 / 1024:.1f} MB）"
+
+
+class DicomUploadHandler(FileUploadHandler):
+    """上传内容留在内存中，不像 TemporaryFileUploadHandler 那样在超过 2.5MB 时落盘；超过 max_size 时中止解析
+
+    必须在读取 request.POST / FILES（包括 CSRF 校验）之前装到 request.upload_handlers。
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size if max_size is not None else max_upload_size()
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = io.BytesIO()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.too_large = True
+            # 丢弃已收到的内容；解析器中止时会关闭 handler.file
+            self.file.close()
+            raise StopUpload(connection_reset=False)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        return InMemoryUploadedFile(
+            file=self.file,
+            field_name=self.field_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+
+def read_upload(file, stop_before_pixels=False):
+    """直接从上传对象（内存缓冲或 Django 落盘的临时文件）解析 DICOM"""
+    file.seek(0)
+    return pydicom.dcmread(file, stop_before_pixels=stop_before_pixels)
+
+
+MASK_FORMATS = {'png': ('PNG', '.png', 'image/png'), 'webp': ('WEBP', '.webp', 'image/webp')}
+
+
+def mask_image(mask, bits=1):
+    """uint8 掩膜 (H,W)（非 0 即前景）转为 PIL 图像：bits=1 时按位打包为 '1' 模式，否则为 0/255 的 'L' 模式"""
+    mask = np.asarray(mask)
+    if bits == 1:
+        # 每行按 MSB 在前打包并补齐到整字节，与 PIL '1' 模式的原始布局一致，省去 convert('1') 的抖动计算
+        packed = np.packbits(mask > 0, axis=1)
+        return Image.frombytes('1', (mask.shape[1], mask.shape[0]), packed.tobytes())
+    return Image.fromarray(np.where(mask > 0, 255, 0).astype(np.uint8), mode='L')
+
+
+def encode_mask(mask, fmt='png', bits=1, compress_level=6):
+    """把掩膜编码为 PNG / 无损 WebP 字节串；每次调用只用局部对象，线程安全"""
+    if fmt not in MASK_FORMATS:
+        raise ValueError(f"不支持的掩膜格式: {fmt}")
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        # WebP 没有 1 位模式，用 8 位灰度无损编码
+        mask_image(mask, bits=8).save(buffer, format='WEBP', lossless=True)
+    else:
+        mask_image(mask, bits=bits).save(buffer, format='PNG', compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def mask_extension(fmt):
+    return MASK_FORMATS[fmt][1]
+
+
+def mask_content_type(fmt):
+    return MASK_FORMATS[fmt][2]
@@ -0,0 +1,141 @@
+# dicom_volume.py
+# 整个脊柱 DICOM 序列的骨水泥三维分析：按空间位置排序后读入一块连续的 int16 体数据（可改用磁盘内存映射），
+# 阈值在原始像素值空间对整卷向量化比较，再做 26 邻域三维连通域标记，报告每个骨水泥区域的体积、包围盒和切片范围。
+import os
+import zipfile
+
+import numpy as np
+import pydicom
+from scipy import ndimage
+
+from myapp.series import _dicom_sort_key, dicom_sources
+
+INT16 = np.iinfo(np.int16)
+
+
+class DicomVolume:
+    """voxels 为 (切片, 行, 列) 的原始像素值；每张切片各自的 RescaleSlope / Intercept 保存在 slopes / intercepts"""
+
+    def __init__(self, voxels, slopes, intercepts, spacing, names):
+        self.voxels = voxels
+        self.slopes = slopes
+        self.intercepts = intercepts
+        # (层间距, 行间距, 列间距)，单位 mm
+        self.spacing = spacing
+        self.names = names
+
+    @property
+    def shape(self):
+        return self.voxels.shape
+
+    @property
+    def voxel_mm3(self):
+        return float(np.prod(self.spacing))
+
+    def threshold(self, hu):
+        """HU > hu 的体素掩膜：把阈值换算到每张切片的原始像素值空间，整卷一次比较，不生成 HU 浮点副本"""
+        raw = ((hu - self.intercepts) / self.slopes).astype(np.float32)
+        return self.voxels > raw[:, np.newaxis, np.newaxis]
+
+
+def _slice_spacing(headers):
+    # 优先用相邻切片 ImagePositionPatient 的间距中位数，缺失时退回 SliceThickness
+    positions = [getattr(ds, 'ImagePositionPatient', None) for ds in headers]
+    if len(headers) > 1 and all(p is not None and len(p) == 3 for p in positions):
+        gaps = np.abs(np.diff([float(p[2]) for p in positions]))
+        gaps = gaps[gaps > 0]
+        if len(gaps):
+            return float(np.median(gaps))
+    return float(getattr(headers[0], 'SliceThickness', None) or 1.0)
+
+
+def load_volume(sources, memmap_path=None):
+    """sources 为 (名称, 打开函数) 列表；先只读文件头排序并确定尺寸，再逐张解码写入预分配的体数据"""
+    headers = []
+    for name, opener in sources:
+        with opener() as f:
+            ds = pydicom.dcmread(f, stop_before_pixels=True)
+        headers.append((_dicom_sort_key(name, ds), name, opener, ds))
+    if not headers:
+        raise ValueError("序列中没有 DICOM 文件")
+    headers.sort(key=lambda item: item[0])
+
+    first = headers[0][3]
+    rows, columns = int(first.Rows), int(first.Columns)
+    shape = (len(headers), rows, columns)
+    if memmap_path:
+        voxels = np.memmap(memmap_path, dtype=np.int16, mode='w+', shape=shape)
+    else:
+        voxels = np.empty(shape, dtype=np.int16)
+    slopes = np.empty(len(headers), dtype=np.float64)
+    intercepts = np.empty(len(headers), dtype=np.float64)
+
+    for i, (_, name, opener, ds) in enumerate(headers):
+        with opener() as f:
+            pixels = pydicom.dcmread(f).pixel_array
+        if pixels.shape != (rows, columns):
+            raise ValueError(f"切片尺寸不一致: {name} 为 {pixels.shape}，应为 {(rows, columns)}")
+        if pixels.dtype != np.int16 and (pixels.min() < INT16.min or pixels.max() > INT16.max):
+            raise ValueError(f"像素值超出 int16 范围: {name}")
+        voxels[i] = pixels
+        slopes[i] = float(getattr(ds, 'RescaleSlope', 1))
+        intercepts[i] = float(getattr(ds, 'RescaleIntercept', 0))
+    if (slopes <= 0).any():
+        raise ValueError("不支持 RescaleSlope ≤ 0 的序列")
+
+    pixel_spacing = getattr(first, 'PixelSpacing', None) or (1.0, 1.0)
+    spacing = (_slice_spacing([h[3] for h in headers]), float(pixel_spacing[0]), float(pixel_spacing[1]))
+    return DicomVolume(voxels, slopes, intercepts, spacing, [h[1] for h in headers])
+
+
+def load_volume_from_path(path, memmap_path=None):
+    """读取 ZIP 文件或目录下的 DICOM 序列（含无扩展名的 PACS 导出文件）"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [n for n in zf.namelist()
+                     if not n.endswith('/') and not os.path.basename(n).startswith('.') and '__MACOSX' not in n]
+            return load_volume(dicom_sources([(n, (lambda n=n: zf.open(n))) for n in names]), memmap_path)
+    paths = [os.path.join(path, n) for n in sorted(os.listdir(path))
+             if not n.startswith('.') and os.path.isfile(os.path.join(path, n))]
+    return load_volume(dicom_sources([(p, (lambda p=p: open(p, 'rb'))) for p in paths]), memmap_path)
+
+
+def load_volume_from_files(paths, memmap_path=None):
+    """读取给定的 DICOM 文件（例如 DicomInstance.series_paths 的结果），不需要遍历目录"""
+    return load_volume([(p, (lambda p=p: open(p, 'rb'))) for p in paths], memmap_path)
+
+
+def analyze_cement(volume, threshold=650, min_volume_mm3=0.0):
+    """阈值分割 + 26 邻域连通域，返回按体积从大到小排列的骨水泥区域报告"""
+    mask = volume.threshold(threshold)
+    labels, count = ndimage.label(mask, structure=np.ones((3, 3, 3), dtype=bool))
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+    voxel_mm3 = volume.voxel_mm3
+
+    components = []
+    for label, bbox in enumerate(ndimage.find_objects(labels), start=1):
+        if bbox is None:
+            continue
+        volume_mm3 = float(sizes[label]) * voxel_mm3
+        if volume_mm3 < min_volume_mm3:
+            continue
+        z, y, x = bbox
+        components.append({
+            'label': label,
+            'voxels': int(sizes[label]),
+            'volume_mm3': volume_mm3,
+            'bbox': {'slice': [z.start, z.stop - 1], 'row': [y.start, y.stop - 1], 'column': [x.start, x.stop - 1]},
+            'extent_mm': [(s.stop - s.start) * d for s, d in zip(bbox, volume.spacing)],
+            'slice_extent': [volume.names[z.start], volume.names[z.stop - 1]],
+            'slice_count': z.stop - z.start,
+        })
+    components.sort(key=lambda c: c['volume_mm3'], reverse=True)
+    return {
+        'shape': list(volume.shape),
+        'spacing_mm': list(volume.spacing),
+        'threshold': threshold,
+        'total_voxels': int(sizes[1:].sum()),
+        'total_volume_mm3': float(sizes[1:].sum()) * voxel_mm3,
+        'component_count': len(components),
+        'components': components,
+    }
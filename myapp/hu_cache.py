@@ -0,0 +1,92 @@
+# hu_cache.py
+# 阈值分割的交互调参：首次上传时把换算后的 HU 数组放进进程内 LRU（按字节数限容），返回随机令牌，
+# 之后调整阈值只需带着令牌请求 /process-dicom/threshold/，不必重新上传和解码 DICOM。
+# 缓存在每个 worker 进程内，令牌落到其他 worker 或已被淘汰时按未命中处理，前端提示重新上传。
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from myapp.metrics import REGISTRY, flatten_stats
+
+
+def rescale_hu(dcm):
+    """pixel_array * RescaleSlope + RescaleIntercept；斜率、截距为整数且结果在 int16 范围内时保持 int16，省一半内存"""
+    pixels = dcm.pixel_array
+    slope = float(getattr(dcm, 'RescaleSlope', 1))
+    intercept = float(getattr(dcm, 'RescaleIntercept', 0))
+    if slope.is_integer() and intercept.is_integer():
+        low = min(pixels.min() * slope, pixels.max() * slope) + intercept
+        high = max(pixels.min() * slope, pixels.max() * slope) + intercept
+        if np.iinfo(np.int16).min <= low and high <= np.iinfo(np.int16).max:
+            hu = pixels.astype(np.int16)
+            if slope != 1:
+                hu *= int(slope)
+            if intercept:
+                hu += int(intercept)
+            return hu
+    return (pixels * np.float32(slope) + np.float32(intercept)).astype(np.float32)
+
+
+class HUCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, hu):
+        """缓存 HU 数组并返回令牌；单个数组超过容量时不缓存，返回 None"""
+        if hu.nbytes > self.max_bytes:
+            return None
+        hu.setflags(write=False)
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._items[token] = hu
+            self._bytes += hu.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return token
+
+    def get(self, token):
+        with self._lock:
+            hu = self._items.get(token)
+            if hu is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(token)
+            self.hits += 1
+            return hu
+
+    def stats(self):
+        with self._lock:
+            return {
+                'items': len(self._items),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_hu_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HUCache(getattr(settings, 'DICOM_HU_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    return _cache
+
+
+REGISTRY.add_collector(lambda: flatten_stats('dicom_hu_cache', get_hu_cache().stats()))
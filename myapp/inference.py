@@ -0,0 +1,233 @@
+# inference.py
+# 视图层与 CT→CTA 生成器之间的衔接：按 settings 选择进程外推理服务、微批调度或直接推理。
+# 模型相关模块在函数内按需导入，配置了 CTA_INFERENCE_SOCKET 时 Django 进程不会加载 TensorFlow。
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from myapp.metrics import REGISTRY, flatten_stats, stage_timer
+from myapp.result_cache import get_result_cache
+from myapp.src.home.ubuntu.js.inference_server import InferenceClient
+
+_scheduler = None
+_client = None
+_lock = threading.Lock()
+_server_info = (0.0, None)
+_server_info_lock = threading.Lock()
+
+_backend = getattr(settings, 'CTA_GENERATOR_BACKEND', 'keras')
+REGISTRY_OPTIONS = {
+    'backend': _backend,
+    'artifact_path': getattr(settings, 'CTA_QUANTIZED_ARTIFACT' if _backend == 'tflite' else 'CTA_GENERATOR_ARTIFACT', None),
+    'max_resident': getattr(settings, 'CTA_MODEL_MAX_RESIDENT', 2),
+    'poll_interval': getattr(settings, 'CTA_MODEL_MANIFEST_POLL_SECONDS', 5.0),
+    'preview_size': getattr(settings, 'CTA_PREVIEW_SIZE', 256),
+}
+if getattr(settings, 'CTA_MODEL_MANIFEST', None):
+    REGISTRY_OPTIONS['manifest_path'] = settings.CTA_MODEL_MANIFEST
+
+
+def tile_options():
+    return {
+        'tile_size': getattr(settings, 'CTA_TILE_SIZE', 512),
+        'overlap': getattr(settings, 'CTA_TILE_OVERLAP', 64),
+        'batch_size': getattr(settings, 'CTA_TILE_BATCH_SIZE', 4),
+        'scratch_dir': getattr(settings, 'CTA_TILE_SCRATCH_DIR', None),
+    }
+
+
+def get_local_registry():
+    """本进程内的生成器注册表（会导入 TensorFlow）"""
+    from myapp.src.home.ubuntu.js.model_registry import configure_registry, get_registry
+    from myapp.src.home.ubuntu.js.thread_config import configure_threads
+
+    # 线程池大小只能在 TF 运行时初始化前设置，因此放在首次建图之前
+    configure_threads(getattr(settings, 'CTA_THREAD_CONFIG', None))
+    configure_registry(**REGISTRY_OPTIONS)
+    return get_registry()
+
+
+def get_inference_client():
+    """配置了推理服务 socket 时返回客户端，否则返回 None"""
+    global _client
+    socket_path = getattr(settings, 'CTA_INFERENCE_SOCKET', None)
+    if not socket_path:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = InferenceClient(socket_path, timeout=getattr(settings, 'CTA_INFERENCE_TIMEOUT', 120))
+    return _client
+
+
+def server_info():
+    """推理服务的 info()，在 CTA_INFERENCE_INFO_TTL 秒内复用上一次结果；每个成像请求都要查询版本和预览支持，不必每次往返"""
+    global _server_info
+    # 过期时只由一个线程刷新，其余线程等待后复用
+    with _server_info_lock:
+        fetched_at, info = _server_info
+        if info is None or time.monotonic() - fetched_at > getattr(settings, 'CTA_INFERENCE_INFO_TTL', 1.0):
+            info = get_inference_client().info()
+            _server_info = (time.monotonic(), info)
+        return info
+
+
+def _check_server_version(client):
+    """推理服务应答中的模型版本与缓存的 info 不一致时说明清单已切换，立即作废缓存的 info"""
+    global _server_info
+    version = client.last_model_version()
+    with _server_info_lock:
+        info = _server_info[1]
+        if info is not None and info.get('model_version') != version:
+            _server_info = (0.0, None)
+
+
+def preload_generator():
+    """进程启动时加载并预热生成器；使用推理服务时 Django 进程无需加载"""
+    if get_inference_client() is not None:
+        return None
+    return get_local_registry().load()
+
+
+def create_scheduler(registry):
+    from myapp.src.home.ubuntu.js.batching import BatchScheduler
+
+    return BatchScheduler(
+        registry.get_generator,
+        max_batch_size=getattr(settings, 'CTA_BATCH_MAX_SIZE', 8),
+        max_wait_ms=getattr(settings, 'CTA_BATCH_MAX_WAIT_MS', 10),
+    )
+
+
+def get_scheduler():
+    """按配置创建进程内唯一的微批调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _lock:
+            if _scheduler is None:
+                _scheduler = create_scheduler(get_local_registry())
+    return _scheduler
+
+
+def preview_supported():
+    """当前生成器能否以低分辨率快速预览（keras 动态尺寸建图时可以，SavedModel / TFLite 签名固定）"""
+    client = get_inference_client()
+    if client is not None:
+        return bool(server_info().get('preview_supported'))
+    registry = get_local_registry()
+    registry.get_generator()
+    return registry.preview_supported
+
+
+def run_generator(image_np, tiled=False, preview=False):
+    """对一张灰度图执行 CT→CTA 生成，返回 (H,W,1)，取值范围 [-1, 1]
+
+    默认缩放到 512x512 推理；tiled=True 时按原分辨率分块推理；
+    preview=True 时缩放到 CTA_PREVIEW_SIZE 推理后放大回 512x512（调用方应先确认 preview_supported()）。
+    """
+    client = get_inference_client()
+    if client is not None:
+        # 缩放与推理都在推理服务进程内完成，这里只能整体计时
+        with stage_timer('predict'):
+            output = client.generate(image_np, tiled=tiled, preview=preview)
+        _check_server_version(client)
+        return output
+
+    if tiled:
+        from myapp.src.home.ubuntu.js.tiling import tiled_generate
+
+        with stage_timer('predict'):
+            return tiled_generate(get_local_registry().get_generator(), image_np, **tile_options())
+
+    if preview:
+        from myapp.src.home.ubuntu.js.preprocessing import preprocess, resize_output
+
+        registry = get_local_registry()
+        size = registry.preview_size
+        with stage_timer('resize'):
+            batch = preprocess(image_np, (size, size))[np.newaxis]
+        # 预览请求很少，直接推理，不进入 512x512 的微批队列
+        generator = registry.get_generator()
+        with stage_timer('predict'):
+            output = generator.predict(batch)[0]
+        with stage_timer('upsample'):
+            return resize_output(output)
+
+    from myapp.src.home.ubuntu.js.test_image import preprocess_image
+
+    with stage_timer('resize'):
+        batch = preprocess_image(image_np)[np.newaxis]
+    if getattr(settings, 'CTA_BATCH_ENABLED', False):
+        # 包含在调度器队列中的等待时间
+        with stage_timer('predict'):
+            return get_scheduler().predict(batch[0])
+    generator = get_local_registry().get_generator()
+    with stage_timer('predict'):
+        return generator.predict(batch)[0]
+
+
+def run_generator_batch(slices):
+    """对同尺寸的一批 uint8 灰度切片 (N,H,W) 执行生成，返回 (N,512,512,1)"""
+    client = get_inference_client()
+    if client is not None:
+        with stage_timer('predict'):
+            output = client.generate(slices)
+        _check_server_version(client)
+        return output
+
+    from myapp.src.home.ubuntu.js.preprocessing import preprocess_into
+
+    batch = np.empty((len(slices), 512, 512, 1), dtype=np.float32)
+    with stage_timer('resize'):
+        for i, image in enumerate(slices):
+            preprocess_into(image, batch[i])
+    generator = get_local_registry().get_generator()
+    with stage_timer('predict'):
+        return generator.predict(batch)
+
+
+def model_version():
+    """当前生效的模型版本，首次调用会触发生成器加载"""
+    client = get_inference_client()
+    if client is not None:
+        return server_info()['model_version']
+    registry = get_local_registry()
+    registry.get_generator()
+    return registry.version
+
+
+def inference_stats():
+    stats = {'result_cache': get_result_cache().stats()}
+    client = get_inference_client()
+    if client is not None:
+        info = client.info()
+        info.pop('ok', None)
+        stats.update(info)
+        return stats
+
+    registry = get_local_registry()
+    stats['generator_loaded'] = registry.loaded
+    stats['model_version'] = registry.version
+    stats['resident_versions'] = registry.resident_versions()
+    if _scheduler is not None:
+        stats['batching'] = _scheduler.stats()
+    return stats
+
+
+def _collect_metrics():
+    """导出时附带结果缓存、批处理与推理服务的统计；不会为此触发 TensorFlow 加载"""
+    stats = {'result_cache': get_result_cache().stats()}
+    client = get_inference_client()
+    if client is not None:
+        info = client.info()
+        stats['generator_loaded'] = info.get('generator_loaded', False)
+        if 'batching' in info:
+            stats['batching'] = info['batching']
+    elif _scheduler is not None:
+        stats['batching'] = _scheduler.stats()
+    return flatten_stats('cta', stats)
+
+
+REGISTRY.add_collector(_collect_metrics)
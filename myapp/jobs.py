@@ -0,0 +1,114 @@
+# jobs.py
+# 异步生成任务：POST 立即返回 job id，由独立的推理进程池完成生成，结果落盘并按 TTL 过期
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from myapp.inference import REGISTRY_OPTIONS, tile_options
+from myapp.src.home.ubuntu.js.job_worker import init_worker, run_job
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobManager:
+    # 状态与结果都放在 job_dir 下的文件里，同一台机器上的任意 Django worker 都能查询
+    def __init__(self, job_dir, workers=2, ttl=600):
+        self.job_dir = job_dir
+        self.workers = workers
+        self.ttl = ttl
+        self._executor = None
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        os.makedirs(job_dir, exist_ok=True)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn 出的子进程不继承 Django/TensorFlow 状态，各自加载一次生成器
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=init_worker,
+                        initargs=(REGISTRY_OPTIONS, getattr(settings, 'CTA_THREAD_CONFIG', None)),
+                    )
+        return self._executor
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.job_dir, f"{job_id}.{suffix}")
+
+    def submit(self, data, tiled=False):
+        self.sweep()
+        job_id = uuid.uuid4().hex
+        open(self._path(job_id, 'pending'), 'wb').close()
+        try:
+            future = self._get_executor().submit(run_job, self.job_dir, job_id, data, tiled, tile_options())
+        except Exception:
+            os.remove(self._path(job_id, 'pending'))
+            raise
+        future.add_done_callback(self._log_failure)
+        return job_id
+
+    @staticmethod
+    def _log_failure(future):
+        # run_job 自身的异常已写入 .error，这里只会收到进程崩溃之类的错误
+        if future.exception() is not None:
+            logger.error(f"生成任务进程异常: {future.exception()}")
+
+    def status(self, job_id):
+        """返回 (状态, 结果路径或错误信息)，状态为 done / failed / pending / missing"""
+        if not JOB_ID_RE.match(job_id):
+            return 'missing', None
+        self.sweep()
+        result_path = self._path(job_id, 'png')
+        if os.path.exists(result_path):
+            return 'done', result_path
+        try:
+            with open(self._path(job_id, 'error'), 'rb') as f:
+                return 'failed', f.read().decode('utf-8', 'replace')
+        except FileNotFoundError:
+            pass
+        if os.path.exists(self._path(job_id, 'pending')):
+            return 'pending', None
+        return 'missing', None
+
+    def sweep(self):
+        """删除超过 TTL 的结果；残留的 pending 标记按 10 倍 TTL 清理（工作进程崩溃时会遗留）"""
+        now = time.time()
+        if now - self._last_sweep < min(60, self.ttl):
+            return
+        self._last_sweep = now
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            ttl = self.ttl * 10 if name.endswith('.pending') else self.ttl
+            try:
+                if now - os.path.getmtime(path) > ttl:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager(
+                    getattr(settings, 'CTA_JOB_DIR', os.path.join(settings.BASE_DIR, 'cache', 'jobs')),
+                    workers=getattr(settings, 'CTA_JOB_WORKERS', 2),
+                    ttl=getattr(settings, 'CTA_JOB_RESULT_TTL', 600),
+                )
+    return _manager
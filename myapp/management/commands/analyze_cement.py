@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.dicom_volume import analyze_cement, load_volume_from_files, load_volume_from_path
+from myapp.models import DicomInstance
+
+
+class Command(BaseCommand):
+    help = "对整个脊柱 DICOM 序列做骨水泥三维分析：阈值分割 + 三维连通域，报告每个区域的体积、包围盒与切片范围"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', type=str, nargs='?', help='DICOM 序列目录或 ZIP 文件')
+        parser.add_argument('--series', type=str, default=None, help='按 SeriesInstanceUID 从 index_dicom 的索引中取文件')
+        parser.add_argument('--threshold', type=float, default=650, help='骨水泥 HU 阈值')
+        parser.add_argument('--min-volume-mm3', type=float, default=1.0, help='忽略小于该体积的区域（噪点）')
+        parser.add_argument('--memmap', type=str, default=None, help='体数据改为写入该路径的内存映射文件（大序列）')
+        parser.add_argument('--json', type=str, default=None, help='把完整报告写入 JSON 文件')
+        parser.add_argument('--top', type=int, default=20, help='终端最多列出的区域数')
+
+    def handle(self, *args, **options):
+        if options['series']:
+            paths = DicomInstance.series_paths(options['series'])
+            if not paths:
+                raise CommandError(f"索引中没有序列 {options['series']}，请先运行 index_dicom")
+        elif not options['input'] or not os.path.exists(options['input']):
+            raise CommandError(f"输入不存在: {options['input']}")
+
+        started = time.perf_counter()
+        try:
+            if options['series']:
+                volume = load_volume_from_files(paths, options['memmap'])
+            else:
+                volume = load_volume_from_path(options['input'], options['memmap'])
+        except Exception as e:
+            raise CommandError(f"读取序列失败: {str(e)}")
+        loaded = time.perf_counter()
+        report = analyze_cement(volume, options['threshold'], options['min_volume_mm3'])
+        finished = time.perf_counter()
+        report['timing_s'] = {'load': loaded - started, 'analyze': finished - loaded}
+
+        dz, dy, dx = volume.spacing
+        self.stdout.write(
+            f"📦 体数据 {volume.shape[0]}×{volume.shape[1]}×{volume.shape[2]}，"
+            f"体素 {dz:.2f}×{dy:.2f}×{dx:.2f} mm，读取 {loaded - started:.2f}s，分析 {finished - loaded:.2f}s"
+        )
+        for c in report['components'][:options['top']]:
+            bbox = c['bbox']
+            self.stdout.write(
+                f"  #{c['label']:<5} {c['volume_mm3'] / 1000:8.2f} mL  切片 {bbox['slice'][0]}-{bbox['slice'][1]}"
+                f"（{c['slice_count']} 张）  行 {bbox['row'][0]}-{bbox['row'][1]}  列 {bbox['column'][0]}-{bbox['column'][1]}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ 阈值 {options['threshold']:g} HU：{report['component_count']} 个骨水泥区域，"
+            f"合计 {report['total_volume_mm3'] / 1000:.2f} mL"
+        ))
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"报告已写入 {options['json']}")
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.src.home.ubuntu.js.export_model import (
+    SavedModelGenerator,
+    export_saved_model,
+    measure_latency,
+    parity_check,
+)
+from myapp.src.home.ubuntu.js.model_registry import ModelRegistry
+from myapp.src.home.ubuntu.js.test_image import opt
+
+
+class Command(BaseCommand):
+    help = "把训练好的 G_A2B 导出为 SavedModel，并做输出一致性校验与 CPU 延迟对比"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default=settings.CTA_GENERATOR_ARTIFACT,
+                            help='SavedModel 输出目录')
+        parser.add_argument('--samples', type=int, default=4, help='一致性校验使用的随机样本数')
+        parser.add_argument('--tolerance', type=float, default=1e-4, help='允许的最大绝对误差')
+        parser.add_argument('--repeats', type=int, default=10, help='延迟测试重复次数')
+        parser.add_argument('--batch-size', type=int, default=1, help='延迟测试的批大小')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("🚀 构建 G_A2B 并加载训练权重..."))
+        registry = ModelRegistry(backend='keras')
+        generator = registry.load()
+
+        export_saved_model(generator, options['output'], opt['img_shape'])
+        self.stdout.write(self.style.SUCCESS(f"📦 已导出: {options['output']}"))
+
+        exported = SavedModelGenerator(options['output'])
+        rng = np.random.default_rng(0)
+        inputs = rng.uniform(-1, 1, (options['samples'],) + opt['img_shape']).astype(np.float32)
+        parity = parity_check(generator, exported, inputs)
+        self.stdout.write(
+            f"🔍 一致性: max_abs_diff={parity['max_abs_diff']:.2e} mean_abs_diff={parity['mean_abs_diff']:.2e}"
+        )
+        if parity['max_abs_diff'] > options['tolerance']:
+            raise CommandError(f"导出模型与原模型输出不一致（容差 {options['tolerance']}）")
+
+        batch = inputs[:1].repeat(options['batch_size'], axis=0)
+        for label, model in (('keras Model.predict', generator), ('SavedModel', exported)):
+            latency = measure_latency(model, batch, repeats=options['repeats'])
+            self.stdout.write(
+                f"⏱ {label:<20} mean={latency['mean_ms']:.1f}ms "
+                f"p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ 完成，设置 CTA_GENERATOR_BACKEND = 'savedmodel' 后由 {os.path.abspath(options['output'])} 提供推理"
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.storage import get_media_storage
+
+
+def _mb(size):
+    return size / 1024 / 1024
+
+
+class Command(BaseCommand):
+    help = "清理 media 下的输出文件：删除超过 TTL 未访问的文件，再按最近访问时间淘汰到容量上限以内"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=float, default=None, help='覆盖 MEDIA_STORAGE_TTL（秒）')
+        parser.add_argument('--max-mb', type=float, default=None, help='覆盖 MEDIA_STORAGE_MAX_BYTES（MB）')
+        parser.add_argument('--dry-run', action='store_true', help='只列出将被删除的文件')
+
+    def handle(self, *args, **options):
+        if options['ttl'] is not None and options['ttl'] < 0:
+            raise CommandError("--ttl 不能为负数")
+        if options['max_mb'] is not None and options['max_mb'] < 0:
+            raise CommandError("--max-mb 不能为负数")
+        storage = get_media_storage()
+        max_bytes = int(options['max_mb'] * 1024 * 1024) if options['max_mb'] is not None else None
+
+        if options['dry_run']:
+            victims, _, _ = storage.plan(ttl=options['ttl'], max_bytes=max_bytes)
+            for _, size, path in victims:
+                self.stdout.write(f"  {path}（{size / 1024:.1f} KB）")
+        result = storage.collect(ttl=options['ttl'], max_bytes=max_bytes, dry_run=options['dry_run'])
+        action = '将删除' if options['dry_run'] else '已删除'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {action} {result['removed']} 项（{_mb(result['freed_bytes']):.1f} MB），"
+            f"{', '.join(storage.areas)} 中保留 {result['files']} 项（{_mb(result['bytes']):.1f} MB）"
+        ))
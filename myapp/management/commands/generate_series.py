@@ -0,0 +1,46 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.dicom_render import PRESETS, resolve_window
+from myapp.inference import run_generator_batch
+from myapp.series import SeriesWriter, generate_series, iter_path_slices
+
+
+class Command(BaseCommand):
+    help = "对整个 CT 序列（切片 ZIP 或 DICOM 目录）执行 CT→CTA 生成，结果逐张写入 ZIP 或多帧 TIFF"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', type=str, help='切片 ZIP 文件，或包含 DICOM / 图像文件的目录')
+        parser.add_argument('output', type=str, help='输出文件路径（.zip 或 .tif）')
+        parser.add_argument('--format', choices=['zip', 'tiff'], default=None, help='输出格式，默认按扩展名判断')
+        parser.add_argument('--batch-size', type=int, default=8, help='每次前向的切片数')
+        parser.add_argument('--preset', choices=sorted(PRESETS), default=None, help='DICOM 序列使用的窗预设')
+        parser.add_argument('--window', type=float, default=None, help='DICOM 序列的窗宽（HU），需与 --level 同时指定')
+        parser.add_argument('--level', type=float, default=None, help='DICOM 序列的窗位（HU）')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['input']):
+            raise CommandError(f"输入不存在: {options['input']}")
+        fmt = options['format'] or ('tiff' if options['output'].lower().endswith(('.tif', '.tiff')) else 'zip')
+        if options['preset'] or options['window'] is not None or options['level'] is not None:
+            try:
+                window = resolve_window(options['preset'], options['window'], options['level'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            window = getattr(settings, 'CTA_SERIES_WINDOW', PRESETS['soft_tissue'])
+
+        self.stdout.write(self.style.SUCCESS(f"🚀 开始生成: {options['input']}"))
+        try:
+            with SeriesWriter(options['output'], fmt) as writer:
+                count = generate_series(
+                    iter_path_slices(options['input'], window),
+                    writer,
+                    run_generator_batch,
+                    batch_size=options['batch_size'],
+                )
+        except Exception as e:
+            raise CommandError(f"序列生成失败: {str(e)}")
+        self.stdout.write(self.style.SUCCESS(f"✅ 共生成 {count} 张切片，已写入 {options['output']}"))
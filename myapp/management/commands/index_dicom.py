@@ -0,0 +1,67 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from myapp.dicom_index import plan_scan, read_headers, walk_files
+from myapp.models import DicomInstance
+
+BATCH_SIZE = 500
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Command(BaseCommand):
+    help = "只读文件头为 DICOM 目录建立索引（患者 / 检查 / 序列 / 切片位置 / 像素偏移），重复运行时只处理新增或变化的文件"
+
+    def add_arguments(self, parser):
+        parser.add_argument('roots', nargs='+', type=str, help='要索引的目录')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='读取文件头的进程数')
+        parser.add_argument('--chunk-size', type=int, default=64, help='每个子任务处理的文件数')
+        parser.add_argument('--keep-missing', action='store_true', help='保留已从磁盘消失的文件的索引')
+
+    def handle(self, *args, **options):
+        roots = [os.path.abspath(root) for root in options['roots']]
+        for root in roots:
+            if not os.path.isdir(root):
+                raise CommandError(f"目录不存在: {root}")
+
+        started = time.perf_counter()
+        known = {}
+        for root in roots:
+            prefix = root.rstrip(os.sep) + os.sep
+            for key, size, mtime in DicomInstance.objects.filter(path__startswith=prefix) \
+                    .values_list('path_hash', 'size', 'mtime'):
+                known[key] = (size, mtime)
+
+        files = list(walk_files(roots))
+        changed, vanished = plan_scan(files, known)
+        self.stdout.write(f"🔍 共 {len(files)} 个文件，其中 {len(changed)} 个新增或有变化，{len(vanished)} 个已消失")
+
+        by_path = {path: (key, size, mtime) for path, key, size, mtime in changed}
+        instances, skipped = [], 0
+        for path, header in read_headers(list(by_path), options['workers'], options['chunk_size']):
+            if header is None:
+                skipped += 1
+                continue
+            key, size, mtime = by_path[path]
+            instances.append(DicomInstance(path=path, path_hash=key, size=size, mtime=mtime, **header))
+
+        with transaction.atomic():
+            # 有变化的文件整行重建；变成非 DICOM 的文件也就此移出索引
+            stale = [key for key in (c[1] for c in changed) if key in known]
+            if not options['keep_missing']:
+                stale.extend(vanished)
+            for batch in _batches(stale):
+                DicomInstance.objects.filter(path_hash__in=batch).delete()
+            DicomInstance.objects.bulk_create(instances, batch_size=BATCH_SIZE)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ 已索引 {len(instances)} 个 DICOM 文件，跳过 {skipped} 个非 DICOM 文件，"
+            f"移除 {0 if options['keep_missing'] else len(vanished)} 条，耗时 {time.perf_counter() - started:.1f}s"
+        ))
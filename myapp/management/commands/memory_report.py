@@ -0,0 +1,100 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+# smaps_rollup 中参与统计的字段（单位 kB）
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps(pid):
+    """读取进程的内存汇总；内核不支持 smaps_rollup 时退回逐段累加 smaps"""
+    totals = dict.fromkeys(FIELDS, 0)
+    for name in ('smaps_rollup', 'smaps'):
+        path = f"/proc/{pid}/{name}"
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in totals:
+                    totals[key] += int(rest.split()[0])
+        break
+    else:
+        raise CommandError(f"无法读取 /proc/{pid}/smaps_rollup（进程不存在或非 Linux）")
+    return {
+        'pid': pid,
+        'rss_mb': totals['Rss'] / 1024,
+        'pss_mb': totals['Pss'] / 1024,
+        'uss_mb': (totals['Private_Clean'] + totals['Private_Dirty']) / 1024,
+        'shared_mb': (totals['Shared_Clean'] + totals['Shared_Dirty']) / 1024,
+    }
+
+
+def child_pids(pid):
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+        except FileNotFoundError:
+            continue
+    return sorted(set(pids))
+
+
+class Command(BaseCommand):
+    help = "统计 master 与各 worker 的 RSS / PSS / USS（独占内存），用于比较预派生前后每台机器能容纳的 worker 数"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--master', type=int, help='gunicorn master 进程号，自动统计其子进程')
+        parser.add_argument('--pids', type=int, nargs='+', default=[], help='直接指定要统计的 worker 进程号')
+        parser.add_argument('--budget-mb', type=float, default=None, help='机器可用内存，用于估算可容纳的 worker 数')
+        parser.add_argument('--save', type=str, default=None, help='把结果保存为 JSON，供之后 --compare')
+        parser.add_argument('--compare', type=str, default=None, help='与之前保存的结果对比（如未开启预派生时）')
+
+    def handle(self, *args, **options):
+        workers = list(options['pids'])
+        if options['master']:
+            workers.extend(child_pids(options['master']))
+        if not workers:
+            raise CommandError("请通过 --master 或 --pids 指定进程")
+
+        report = {
+            'master': read_smaps(options['master']) if options['master'] else None,
+            'workers': [read_smaps(pid) for pid in sorted(set(workers))],
+        }
+        uss = [w['uss_mb'] for w in report['workers']]
+        report['mean_worker_uss_mb'] = sum(uss) / len(uss)
+        report['total_pss_mb'] = sum(w['pss_mb'] for w in report['workers']) + \
+            (report['master']['pss_mb'] if report['master'] else 0)
+
+        rows = ([('master', report['master'])] if report['master'] else []) + \
+            [('worker', w) for w in report['workers']]
+        self.stdout.write(f"{'角色':<8}{'PID':>8}{'RSS':>10}{'PSS':>10}{'USS':>10}{'共享':>10}  (MB)")
+        for role, r in rows:
+            self.stdout.write(
+                f"{role:<8}{r['pid']:>8}{r['rss_mb']:>10.1f}{r['pss_mb']:>10.1f}{r['uss_mb']:>10.1f}{r['shared_mb']:>10.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 每个 worker 平均独占 {report['mean_worker_uss_mb']:.1f} MB，全部进程 PSS 合计 {report['total_pss_mb']:.1f} MB"
+        ))
+
+        if options['budget_mb']:
+            # 共享部分只算一次（取 master 的 RSS 近似），其余按每个 worker 的独占内存分摊
+            shared = report['master']['rss_mb'] if report['master'] else max(w['shared_mb'] for w in report['workers'])
+            capacity = int((options['budget_mb'] - shared) // report['mean_worker_uss_mb'])
+            self.stdout.write(f"🧮 {options['budget_mb']:.0f} MB 内存约可容纳 {max(capacity, 0)} 个 worker")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                before = json.load(f)
+            delta = report['mean_worker_uss_mb'] - before['mean_worker_uss_mb']
+            self.stdout.write(
+                f"🔍 worker 平均 USS: {before['mean_worker_uss_mb']:.1f} → {report['mean_worker_uss_mb']:.1f} MB "
+                f"({delta:+.1f} MB)"
+            )
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"结果已保存到 {options['save']}")
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.src.home.ubuntu.js.model_manifest import (
+    BACKENDS,
+    add_version,
+    file_sha256,
+    load_manifest,
+    resolve_path,
+    set_default,
+    write_manifest,
+)
+from myapp.src.home.ubuntu.js.preprocessing import INPUT_SIZE
+
+
+class Command(BaseCommand):
+    help = "管理生成器版本清单：登记新版本、列出版本、切换默认版本（运行中的进程会在轮询后热切换）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['add', 'list', 'activate', 'remove'], help='操作')
+        parser.add_argument('name', nargs='?', help='版本名')
+        parser.add_argument('--path', type=str, help='add：权重文件（.hdf5）、SavedModel 目录或 .tflite 文件')
+        parser.add_argument('--backend', choices=BACKENDS, default='keras', help='add：推理后端')
+        parser.add_argument('--input-shape', type=int, nargs=3, default=list(INPUT_SIZE) + [1],
+                            help='add：生成器输入尺寸 H W C')
+        parser.add_argument('--default', action='store_true', help='add：登记后设为默认版本')
+        parser.add_argument('--manifest', type=str, default=settings.CTA_MODEL_MANIFEST, help='清单路径')
+
+    def handle(self, *args, **options):
+        manifest_path = options['manifest']
+        manifest = load_manifest(manifest_path)
+        action, name = options['action'], options['name']
+        if action != 'list' and not name:
+            raise CommandError(f"{action} 需要指定版本名")
+
+        if action == 'list':
+            if not manifest['versions']:
+                self.stdout.write("清单为空，serving 进程使用 saved_models/ 目录扫描")
+            for version, entry in sorted(manifest['versions'].items()):
+                marker = '*' if entry.get('default') else ' '
+                self.stdout.write(
+                    f"{marker} {version:<20} {entry['backend']:<10} {entry['sha256'][:12]} "
+                    f"{tuple(entry['input_shape'])} {entry['path']}"
+                )
+            return
+
+        if action == 'add':
+            if not options['path']:
+                raise CommandError("add 需要 --path")
+            if name in manifest['versions']:
+                raise CommandError(f"版本 {name} 已存在")
+            try:
+                entry = add_version(manifest, name, options['path'], options['input_shape'],
+                                    backend=options['backend'], make_default=options['default'],
+                                    manifest_path=manifest_path)
+            except (FileNotFoundError, ValueError) as e:
+                raise CommandError(str(e))
+            write_manifest(manifest, manifest_path)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ 已登记 {name}（sha256 {entry['sha256'][:12]}）{'，并设为默认版本' if entry['default'] else ''}"
+            ))
+            return
+
+        if name not in manifest['versions']:
+            raise CommandError(f"清单中没有版本: {name}")
+        entry = manifest['versions'][name]
+
+        if action == 'activate':
+            # 切换前再校验一次文件，避免把已被覆盖的权重发布出去
+            if file_sha256(resolve_path(entry, manifest_path)) != entry['sha256']:
+                raise CommandError(f"版本 {name} 的文件与登记的校验和不一致")
+            set_default(manifest, name)
+            write_manifest(manifest, manifest_path)
+            self.stdout.write(self.style.SUCCESS(f"🚀 默认版本已切换为 {name}，serving 进程将在下次轮询时后台加载并切换"))
+            return
+
+        if entry.get('default'):
+            raise CommandError("不能删除默认版本，请先 activate 其它版本")
+        del manifest['versions'][name]
+        write_manifest(manifest, manifest_path)
+        self.stdout.write(self.style.SUCCESS(f"🗑 已从清单移除 {name}（文件保留）"))
@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.src.home.ubuntu.js.export_model import SavedModelGenerator
+from myapp.src.home.ubuntu.js.quantize import (
+    DEFAULT_CALIBRATION_DIR,
+    TFLiteGenerator,
+    convert_to_tflite,
+    load_calibration_slices,
+    quality_gate,
+    split_holdout,
+)
+
+
+class Command(BaseCommand):
+    help = "对 G_A2B 做训练后量化（int8/float16），SSIM/PSNR 不达标时拒绝发布"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['int8', 'float16'], default='int8', help='量化方式')
+        parser.add_argument('--saved-model', type=str, default=settings.CTA_GENERATOR_ARTIFACT,
+                            help='export_generator 导出的浮点 SavedModel 目录')
+        parser.add_argument('--calibration-dir', type=str, default=DEFAULT_CALIBRATION_DIR,
+                            help='校准切片目录（默认 dataset/100dataset/testCT）')
+        parser.add_argument('--limit', type=int, default=32, help='最多读取的切片数（未指定 --eval-dir 时含留出集）')
+        parser.add_argument('--eval-dir', type=str, default=None,
+                            help='质量门槛使用的独立切片目录；不指定时从校准目录中按 --holdout 比例留出')
+        parser.add_argument('--holdout', type=float, default=0.25, help='未指定 --eval-dir 时留出的切片比例')
+        parser.add_argument('--min-ssim', type=float, default=0.98, help='平均 SSIM 下限')
+        parser.add_argument('--min-psnr', type=float, default=35.0, help='平均 PSNR 下限（dB）')
+        parser.add_argument('--output', type=str, default=settings.CTA_QUANTIZED_ARTIFACT,
+                            help='量化模型发布路径')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['saved_model']):
+            raise CommandError(f"找不到浮点 SavedModel: {options['saved_model']}，请先运行 export_generator")
+
+        if not 0 < options['holdout'] < 1:
+            raise CommandError("--holdout 必须在 0 和 1 之间")
+        # 质量门槛只在未参与校准的切片上评估，否则量化参数恰好拟合这些切片，结果偏向通过
+        slices = load_calibration_slices(options['calibration_dir'], options['limit'])
+        if options['eval_dir']:
+            calibration = slices
+            evaluation = load_calibration_slices(options['eval_dir'], options['limit'])
+        else:
+            try:
+                calibration, evaluation = split_holdout(slices, options['holdout'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 已载入 {len(calibration)} 张校准切片、{len(evaluation)} 张留出切片，开始 {options['mode']} 量化..."
+        ))
+        tflite_model = convert_to_tflite(options['saved_model'], options['mode'], calibration)
+
+        output_dir = os.path.dirname(os.path.abspath(options['output']))
+        os.makedirs(output_dir, exist_ok=True)
+        fd, candidate_path = tempfile.mkstemp(dir=output_dir, suffix='.tflite.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(tflite_model)
+
+        try:
+            reference = SavedModelGenerator(options['saved_model'])
+            candidate = TFLiteGenerator(candidate_path)
+            result = quality_gate(reference, candidate, evaluation,
+                                  min_ssim=options['min_ssim'], min_psnr=options['min_psnr'])
+            self.stdout.write(
+                f"🔍 SSIM={result['ssim']:.4f}（最低 {result['ssim_min']:.4f}） "
+                f"PSNR={result['psnr']:.2f}dB（最低 {result['psnr_min']:.2f}dB）"
+            )
+            if not result['passed']:
+                raise CommandError(
+                    f"量化模型未通过质量门槛（SSIM ≥ {options['min_ssim']}，PSNR ≥ {options['min_psnr']}dB），拒绝发布"
+                )
+            # 通过门槛后才原子替换到发布路径，线上进程不会读到半成品
+            os.replace(candidate_path, options['output'])
+        finally:
+            if os.path.exists(candidate_path):
+                os.remove(candidate_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ 已发布 {options['output']}（{len(tflite_model) / 1024 / 1024:.1f} MB），"
+            f"设置 CTA_GENERATOR_BACKEND = 'tflite' 即可启用"
+        ))
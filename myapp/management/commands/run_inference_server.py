@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.inference import create_scheduler, get_local_registry, tile_options
+from myapp.src.home.ubuntu.js.inference_server import InferenceServer
+
+
+class Command(BaseCommand):
+    help = "启动进程外 CT→CTA 推理服务（Unix socket + 共享内存），Django 进程通过 CTA_INFERENCE_SOCKET 连接"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', type=str, default=getattr(settings, 'CTA_INFERENCE_SOCKET', None),
+                            help='监听的 Unix socket 路径（默认取 CTA_INFERENCE_SOCKET）')
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError("请通过 --socket 或 CTA_INFERENCE_SOCKET 指定 socket 路径")
+
+        registry = get_local_registry()
+        self.stdout.write(self.style.SUCCESS("🚀 加载生成器..."))
+        registry.load()
+
+        server = InferenceServer(options['socket'], registry, create_scheduler(registry), tile_options())
+        self.stdout.write(self.style.SUCCESS(f"✅ 推理服务已启动: {options['socket']}（模型 {registry.version}）"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("⏹ 推理服务已停止"))
+        finally:
+            server.server_close()
@@ -0,0 +1,108 @@
+import itertools
+import os
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarks.inference import parse_worker_output, worker_command
+from myapp.src.home.ubuntu.js.thread_config import worker_cpus, write_thread_config
+
+
+def run_concurrent(workers, intra, inter, batch_size, repeats, warmup, affinity, cpus):
+    """同时启动 workers 个基准子进程（模拟同一台机器上的多个 worker），返回各自的 predict 统计"""
+    cmd = worker_command([batch_size], intra, inter, repeats, warmup, 512, ['predict'])
+    procs = []
+    for index in range(workers):
+        preexec = None
+        if affinity:
+            assigned = worker_cpus(index, intra, cpus)
+            preexec = lambda assigned=assigned: os.sched_setaffinity(0, assigned)
+        procs.append(subprocess.Popen(cmd, stdout=subprocess.PIPE, preexec_fn=preexec))
+    stats = []
+    for proc in procs:
+        output, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise CommandError(f"基准子进程失败（intra={intra} inter={inter} workers={workers}）")
+        stats.append(parse_worker_output(output)[str(batch_size)]['predict'])
+    return stats
+
+
+class Command(BaseCommand):
+    help = "扫描 TF intra-op / inter-op 线程数与 worker 数，按整机吞吐选出最优组合并写入线程配置，serving 进程启动时应用"
+
+    def add_arguments(self, parser):
+        cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        parser.add_argument('--intra', type=int, nargs='+', default=sorted({1, 2, 4, cpu_count}),
+                            help='要测试的 intra-op 线程数')
+        parser.add_argument('--inter', type=int, nargs='+', default=[1, 2], help='要测试的 inter-op 线程数')
+        parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, cpu_count}),
+                            help='要测试的 worker 数')
+        parser.add_argument('--batch-size', type=int, default=1, help='每次前向的图像数')
+        parser.add_argument('--repeats', type=int, default=10)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--max-p95-ms', type=float, default=None, help='单次推理 p95 延迟上限，超出的组合不参与选择')
+        parser.add_argument('--affinity', action='store_true', help='测量和部署时把每个 worker 绑定到专属 CPU 段')
+        parser.add_argument('--oversubscribe', action='store_true', help='也测试 workers × intra 超过 CPU 数的组合')
+        parser.add_argument('--output', type=str, default=settings.CTA_THREAD_CONFIG, help='线程配置输出路径')
+        parser.add_argument('--dry-run', action='store_true', help='只打印结果，不写配置')
+
+    def handle(self, *args, **options):
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+        if options['affinity'] and not hasattr(os, 'sched_setaffinity'):
+            raise CommandError("当前平台不支持 CPU 绑定")
+
+        results = []
+        for workers, intra, inter in itertools.product(options['workers'], options['intra'], options['inter']):
+            if workers * intra > len(cpus) and not options['oversubscribe']:
+                continue
+            self.stdout.write(f"⏱ workers={workers} intra={intra} inter={inter} ...")
+            stats = run_concurrent(workers, intra, inter, options['batch_size'], options['repeats'],
+                                   options['warmup'], options['affinity'], cpus)
+            row = {
+                'workers': workers,
+                'intra_op_threads': intra,
+                'inter_op_threads': inter,
+                # 各 worker 同时运行，整机吞吐为各自吞吐之和，延迟取最差的 worker
+                'images_per_s': sum(s['images_per_s'] for s in stats),
+                'p50_ms': max(s['p50_ms'] for s in stats),
+                'p95_ms': max(s['p95_ms'] for s in stats),
+            }
+            results.append(row)
+            self.stdout.write(
+                f"   {row['images_per_s']:7.2f} img/s  p50={row['p50_ms']:8.1f}ms  p95={row['p95_ms']:8.1f}ms"
+            )
+        if not results:
+            raise CommandError(f"没有可测试的组合（CPU 数 {len(cpus)}），可加 --oversubscribe")
+
+        candidates = [r for r in results if options['max_p95_ms'] is None or r['p95_ms'] <= options['max_p95_ms']]
+        if not candidates:
+            raise CommandError(f"没有组合满足 p95 ≤ {options['max_p95_ms']}ms")
+        best = max(candidates, key=lambda r: r['images_per_s'])
+        baseline = next((r for r in results if r['workers'] == 1 and r['intra_op_threads'] == max(options['intra'])), None)
+
+        config = {
+            'intra_op_threads': best['intra_op_threads'],
+            'inter_op_threads': best['inter_op_threads'],
+            'workers': best['workers'],
+            'affinity': options['affinity'],
+            'cpus_per_worker': best['intra_op_threads'],
+            'measured': best,
+            'cpu_count': len(cpus),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sweep': results,
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f"🏆 最优：workers={best['workers']} intra={best['intra_op_threads']} inter={best['inter_op_threads']}，"
+            f"{best['images_per_s']:.2f} img/s，p95 {best['p95_ms']:.1f}ms"
+        ))
+        if baseline is not None and baseline is not best:
+            self.stdout.write(f"🔍 对比单 worker、intra={baseline['intra_op_threads']}：{baseline['images_per_s']:.2f} img/s")
+
+        if options['dry_run']:
+            return
+        write_thread_config(config, options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ 线程配置已写入 {options['output']}，重启 serving 进程（gunicorn / run_inference_server）后生效"
+        ))
@@ -0,0 +1,228 @@
+# metrics.py
+# 轻量指标：计数器 / 仪表 / 直方图，按 Prometheus 文本格式导出。
+# 每次观测只有一次 perf_counter、一次加锁和一次 bisect，开销在微秒级，可以常驻在请求路径上。
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# 秒级延迟桶：覆盖从解码（毫秒级）到 CPU 上整图推理（秒级）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, label_values, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, label_values, extra)} "
+                         f"{_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [('_total', key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self._lock:
+            return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 每个桶只记本桶的次数，导出时再累加成 Prometheus 要求的累计值
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', key, (('le', _format_value(float(bound))),), cumulative))
+            samples.append(('_sum', key, (), total))
+            samples.append(('_count', key, (), count))
+        return samples
+
+
+class MetricsRegistry:
+    """进程内指标集合；collectors 在导出时调用，用于把已有的统计（批处理、缓存）转成仪表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        """collector() 返回 [(名称, 说明, 数值)]，导出时写成无标签仪表"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} 失败: {e}")
+                continue
+            for name, documentation, value in samples:
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge",
+                              f"{name} {_format_value(value)}"])
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'cta_stage_duration_seconds', '成像请求各阶段耗时（upload/decode/resize/predict/encode/mask_encode 等）', ('stage',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'cta_http_request_duration_seconds', '成像接口的端到端延迟', ('endpoint',))
+REQUESTS = REGISTRY.counter(
+    'cta_http_requests', '成像接口请求数', ('endpoint', 'status'))
+IN_FLIGHT = REGISTRY.gauge(
+    'cta_http_requests_in_flight', '成像接口正在处理的请求数', ('endpoint',))
+
+
+def stage_timer(stage):
+    """with stage_timer('decode'): ... 记录一个阶段的耗时"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def track_endpoint(endpoint):
+    """视图方法装饰器：记录端到端延迟、状态码和并发中的请求数"""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapped(*args, **kwargs):
+            IN_FLIGHT.inc(endpoint=endpoint)
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                response = view_method(*args, **kwargs)
+                status = str(getattr(response, 'status_code', 200))
+                return response
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+                REQUESTS.inc(endpoint=endpoint, status=status)
+                IN_FLIGHT.dec(endpoint=endpoint)
+
+        return wrapped
+
+    return decorator
+
+
+def flatten_stats(prefix, stats):
+    """把嵌套的统计 dict 展平成 [(名称, 说明, 数值)]，只保留数值项"""
+    samples = []
+    for key, value in stats.items():
+        name = re.sub(r'[^a-zA-Z0-9_:]', '_', f"{prefix}_{key}")
+        if isinstance(value, bool):
+            samples.append((name, key, int(value)))
+        elif isinstance(value, (int, float)):
+            samples.append((name, key, value))
+        elif isinstance(value, dict):
+            samples.extend(flatten_stats(name, value))
+    return samples
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_alter_image_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DicomInstance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.TextField(verbose_name='文件路径')),
+                ('path_hash', models.CharField(max_length=64, unique=True, verbose_name='路径哈希')),
+                ('size', models.BigIntegerField(verbose_name='文件大小')),
+                ('mtime', models.FloatField(verbose_name='修改时间')),
+                ('patient_id', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='患者ID')),
+                ('patient_name', models.CharField(blank=True, max_length=128, verbose_name='患者姓名')),
+                ('study_uid', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='检查UID')),
+                ('study_date', models.CharField(blank=True, max_length=8, verbose_name='检查日期')),
+                ('study_description', models.CharField(blank=True, max_length=128, verbose_name='检查描述')),
+                ('series_uid', models.CharField(blank=True, max_length=64, verbose_name='序列UID')),
+                ('series_number', models.IntegerField(blank=True, null=True, verbose_name='序列号')),
+                ('series_description', models.CharField(blank=True, max_length=128, verbose_name='序列描述')),
+                ('modality', models.CharField(blank=True, max_length=16, verbose_name='模态')),
+                ('sop_instance_uid', models.CharField(blank=True, max_length=64, verbose_name='实例UID')),
+                ('instance_number', models.IntegerField(blank=True, null=True, verbose_name='实例号')),
+                ('slice_position', models.FloatField(blank=True, null=True, verbose_name='切片位置')),
+                ('rows', models.IntegerField(blank=True, null=True, verbose_name='行数')),
+                ('columns', models.IntegerField(blank=True, null=True, verbose_name='列数')),
+                ('rescale_slope', models.FloatField(default=1.0, verbose_name='RescaleSlope')),
+                ('rescale_intercept', models.FloatField(default=0.0, verbose_name='RescaleIntercept')),
+                ('transfer_syntax', models.CharField(blank=True, max_length=64, verbose_name='传输语法')),
+                ('pixel_offset', models.BigIntegerField(blank=True, null=True, verbose_name='像素数据偏移')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+            options={
+                'db_table': 'dicom_instances',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dicominstance',
+            index=models.Index(fields=['series_uid', 'slice_position', 'instance_number'], name='dicom_series_order'),
+        ),
+    ]
@@ -76,3 +76,48 @@ class CTPrice(models.Model):
 
     class Meta:
         db_table = 'ct_prices'  # 指定表名
+
+
+class DicomInstance(models.Model):
+    # index_dicom 只读文件头建立的 DICOM 索引；路径可能超过索引长度限制，唯一性由路径的 SHA-256 保证
+    path = models.TextField("文件路径")
+    path_hash = models.CharField("路径哈希", max_length=64, unique=True)
+    size = models.BigIntegerField("文件大小")
+    mtime = models.FloatField("修改时间")
+    patient_id = models.CharField("患者ID", max_length=64, blank=True, db_index=True)
+    patient_name = models.CharField("患者姓名", max_length=128, blank=True)
+    study_uid = models.CharField("检查UID", max_length=64, blank=True, db_index=True)
+    study_date = models.CharField("检查日期", max_length=8, blank=True)
+    study_description = models.CharField("检查描述", max_length=128, blank=True)
+    series_uid = models.CharField("序列UID", max_length=64, blank=True)
+    series_number = models.IntegerField("序列号", null=True, blank=True)
+    series_description = models.CharField("序列描述", max_length=128, blank=True)
+    modality = models.CharField("模态", max_length=16, blank=True)
+    sop_instance_uid = models.CharField("实例UID", max_length=64, blank=True)
+    instance_number = models.IntegerField("实例号", null=True, blank=True)
+    slice_position = models.FloatField("切片位置", null=True, blank=True)
+    rows = models.IntegerField("行数", null=True, blank=True)
+    columns = models.IntegerField("列数", null=True, blank=True)
+    rescale_slope = models.FloatField("RescaleSlope", default=1.0)
+    rescale_intercept = models.FloatField("RescaleIntercept", default=0.0)
+    transfer_syntax = models.CharField("传输语法", max_length=64, blank=True)
+    pixel_offset = models.BigIntegerField("像素数据偏移", null=True, blank=True)
+    indexed_at = models.DateTimeField("索引时间", auto_now=True)
+
+    class Meta:
+        db_table = 'dicom_instances'
+        indexes = [
+            models.Index(fields=['series_uid', 'slice_position', 'instance_number'], name='dicom_series_order'),
+        ]
+
+    def __str__(self):
+        return f"{self.series_uid} #{self.instance_number}"
+
+    @classmethod
+    def series_paths(cls, series_uid):
+        """按切片位置、实例号排好序的文件路径，序列处理可直接按此打开"""
+        return list(
+            cls.objects.filter(series_uid=series_uid)
+            .order_by('slice_position', 'instance_number', 'path')
+            .values_list('path', flat=True)
+        )
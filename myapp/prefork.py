@@ -0,0 +1,66 @@
+# prefork.py
+# 预派生（pre-fork）部署：master 进程在 fork worker 之前完成所有与 TensorFlow 运行时无关的准备，
+# worker 通过写时复制共享导入的模块，各自只承担建图和预热。
+#
+# - master：导入 TensorFlow / Keras / 模型代码（占 worker 私有内存的大头是这部分 Python 对象和库初始化），
+#   把权重文件预读进页缓存，最后 gc.freeze() 把这些对象移出 GC 扫描，
+#   避免 worker 中的垃圾回收改写引用计数所在的页而触发复制。
+# - worker（post_fork）：建图、加载权重并预热。
+#
+# 注意：TensorFlow 的线程池和 eager 上下文不是 fork 安全的，master 中绝不能执行任何 TF op
+# （包括 build_generator、load_weights 和 predict），否则 worker 里的推理可能死锁。
+# 因此权重不在 worker 之间共享：每个 worker 各自加载一份（G_A2B 几十 MB），预读只让首次加载不必读盘。
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _prefetch(path):
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size and hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+
+
+def _prefetch_artifact(path):
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in files:
+                _prefetch(os.path.join(root, name))
+    else:
+        _prefetch(path)
+
+
+def preload_for_fork():
+    """在 master 中调用：导入模型代码、预读权重文件并冻结 GC，不初始化 TF 运行时"""
+    from myapp.inference import get_inference_client, get_local_registry
+
+    if get_inference_client() is not None:
+        # 推理在独立服务进程中完成，worker 不需要 TensorFlow
+        gc.freeze()
+        return None
+
+    registry = get_local_registry()
+    try:
+        backend, path = registry.resolve_artifact()
+        _prefetch_artifact(path)
+        logger.info(f"预派生：已预读 {backend} 权重 {path}")
+    except (FileNotFoundError, TypeError) as e:
+        logger.warning(f"预派生：未找到权重文件，worker 启动时再加载: {e}")
+
+    gc.collect()
+    gc.freeze()
+    logger.info(f"预派生：已冻结 {gc.get_freeze_count()} 个对象")
+    return registry
+
+
+def post_fork_warmup():
+    """在每个 worker fork 之后调用：建图、加载权重并预热"""
+    from myapp.inference import preload_generator
+
+    try:
+        preload_generator()
+    except Exception:
+        logger.exception("worker 中生成器预加载失败，将在首个请求时重试")
@@ -0,0 +1,119 @@
+# pyramid.py
+# 处理结果的多分辨率瓦片金字塔：第 0 级为原图，之后每级边长减半（2x2 盒式下采样），直到整幅放得进一块瓦片；
+# 每级切成固定边长的 PNG 瓦片，与 meta.json 一起写入 media/pyramids/<内容哈希>/，查看器只请求当前可见的瓦片。
+# 目录按结果内容哈希命名，内容不变则瓦片不变，可以长期缓存；整个目录作为一个单元参与 MediaStorage 的垃圾回收。
+# 处理请求只把结果按同一内容哈希存进 media/processed，金字塔在查看器第一次请求 meta.json 时才生成。
+import glob
+import io
+import json
+import os
+import re
+import shutil
+import uuid
+
+from PIL import Image
+from django.conf import settings
+
+from myapp.storage import content_hash, get_media_storage
+
+AREA = 'pyramids'
+SOURCE_AREA = 'processed'
+META_NAME = 'meta.json'
+KEY_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def tile_name(level, col, row):
+    return os.path.join(str(level), f"{col}_{row}.png")
+
+
+def pyramid_levels(width, height, tile_size):
+    """各级 (宽, 高, 列数, 行数)，与 Image.reduce(2) 的向上取整一致"""
+    levels = []
+    while True:
+        levels.append((width, height, -(-width // tile_size), -(-height // tile_size)))
+        if width <= tile_size and height <= tile_size:
+            return levels
+        width, height = -(-width // 2), -(-height // 2)
+
+
+def build_pyramid(image, directory, tile_size=256):
+    """把 PIL 图像写成瓦片金字塔，返回 meta 信息"""
+    if image.mode not in ('L', 'RGB', 'RGBA'):
+        # 1 位掩膜等模式不支持 reduce，统一转为 8 位
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'L')
+    levels = pyramid_levels(image.width, image.height, tile_size)
+    for level, (width, height, cols, rows) in enumerate(levels):
+        if level:
+            image = image.reduce(2)
+        os.makedirs(os.path.join(directory, str(level)), exist_ok=True)
+        for row in range(rows):
+            for col in range(cols):
+                box = (col * tile_size, row * tile_size,
+                       min((col + 1) * tile_size, width), min((row + 1) * tile_size, height))
+                image.crop(box).save(os.path.join(directory, tile_name(level, col, row)), format='PNG')
+    meta = {
+        'width': levels[0][0],
+        'height': levels[0][1],
+        'tile_size': tile_size,
+        'format': 'png',
+        'levels': [{'level': i, 'width': w, 'height': h, 'cols': c, 'rows': r} for i, (w, h, c, r) in enumerate(levels)],
+    }
+    with open(os.path.join(directory, META_NAME), 'w') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def pyramid_dir(key):
+    return os.path.join(settings.MEDIA_ROOT, AREA, key)
+
+
+def ensure_pyramid(data):
+    """为编码后的结果图像（PNG / WebP 字节串）生成金字塔并返回其内容哈希；已存在时只刷新访问时间"""
+    storage = get_media_storage()
+    storage.sweep()
+    key = content_hash(data)
+    directory = pyramid_dir(key)
+    if os.path.exists(os.path.join(directory, META_NAME)):
+        touch_pyramid(key)
+        return key
+    # 先在临时目录中生成再整体改名，并发请求或清理都不会看到只写了一半的金字塔
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, AREA, f".{key}.{uuid.uuid4().hex}")
+    try:
+        build_pyramid(Image.open(io.BytesIO(data)), tmp_dir, getattr(settings, 'PYRAMID_TILE_SIZE', 256))
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # 其他请求已生成了相同内容的金字塔
+            if not os.path.exists(os.path.join(directory, META_NAME)):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return key
+
+
+def touch_pyramid(key):
+    """刷新目录的 mtime 作为最近访问时间；目录已被清理时返回 False"""
+    try:
+        os.utime(pyramid_dir(key))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def find_source(key):
+    """media/processed 中内容哈希为 key 的结果文件（result_<key>.png、cta_<key>.png 等），不存在时返回 None"""
+    matches = glob.glob(os.path.join(settings.MEDIA_ROOT, SOURCE_AREA, f"*_{key}.*"))
+    return matches[0] if matches else None
+
+
+def load_meta(key):
+    """返回金字塔的 meta 信息，首次请求时由结果文件生成；金字塔和结果文件都已被清理时返回 None"""
+    meta_path = os.path.join(pyramid_dir(key), META_NAME)
+    if not touch_pyramid(key):
+        source = find_source(key)
+        if source is None:
+            return None
+        with open(source, 'rb') as f:
+            ensure_pyramid(f.read())
+    with open(meta_path) as f:
+        return json.load(f)
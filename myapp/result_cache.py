@@ -0,0 +1,164 @@
+# result_cache.py
+# CT→CTA 生成结果的两级缓存：进程内 LRU + 带容量上限的磁盘存储，键为像素内容哈希 + 模型版本
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    def __init__(self, directory, memory_items=128, disk_max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(pixels, model_version, mode='full'):
+        """对解码后的像素数组、模型版本和推理模式做 SHA-256"""
+        pixels = np.ascontiguousarray(pixels)
+        digest = hashlib.sha256()
+        digest.update(f"{model_version}|{mode}|{pixels.dtype.str}|{pixels.shape}".encode('utf-8'))
+        digest.update(memoryview(pixels).cast('B'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 用 mtime 记录最近访问时间，磁盘淘汰按它排序
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def set(self, key, data):
+        with self._lock:
+            self.stores += 1
+            self._remember(key, data)
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，并发写同一键时不会读到半个文件
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # 覆盖已有文件时只计入大小差，否则重复写同一键会让计数虚高、提前触发淘汰
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception("结果缓存写盘失败")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(data) - old_size
+            over_limit = self._disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.png'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_disk_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict_disk(self):
+        """删除最久未访问的文件，直到占用降到上限的 90%"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': ((self.memory_hits + self.disk_hits) / lookups) if lookups else 0.0,
+                'stores': self.stores,
+                'disk_evictions': self.evictions,
+                'memory_items': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    getattr(settings, 'CTA_RESULT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'cta')),
+                    memory_items=getattr(settings, 'CTA_RESULT_CACHE_MEMORY_ITEMS', 128),
+                    disk_max_bytes=getattr(settings, 'CTA_RESULT_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024),
+                )
+    return _cache
@@ -0,0 +1,210 @@
+# series.py
+# 整个序列的 CT→CTA 生成：读取切片 ZIP 或多文件 DICOM 序列，按固定批大小流式推理，结果逐张写入 ZIP / 多帧 TIFF
+import io
+import os
+import re
+import zipfile
+
+import numpy as np
+import pydicom
+from PIL import Image
+
+from myapp.dicom_render import PRESETS, render_dataset
+from myapp.src.home.ubuntu.js.preprocessing import decode_gray, denormalize_to_uint8
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+# 整个序列共用的显示窗 (窗宽, 窗位)，同一 HU 在每张切片上映射到相同灰度
+DEFAULT_WINDOW = PRESETS['soft_tissue']
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def _is_dicom_name(name):
+    return name.lower().endswith('.dcm')
+
+
+def _probe_dicom(opener):
+    """按内容识别 DICOM：PACS 导出的文件常常没有扩展名。与 dicom_index.read_header 一样只读文件头
+    （要求 128 字节前导后的 DICM 标记），并要求是带图像尺寸的实例，排除 DICOMDIR 等"""
+    try:
+        with opener() as f:
+            ds = pydicom.dcmread(f, stop_before_pixels=True)
+    except Exception:
+        return False
+    return 'Rows' in ds and ('SOPClassUID' in ds or 'SeriesInstanceUID' in ds)
+
+
+def dicom_sources(sources):
+    """从 (名称, 打开函数) 列表中挑出 DICOM 切片：.dcm 直接认定，普通图像扩展名跳过，其余按内容探测"""
+    result = []
+    for name, opener in sources:
+        lower = name.lower()
+        if lower.endswith(IMAGE_EXTENSIONS) or os.path.basename(name).upper() == 'DICOMDIR':
+            continue
+        if _is_dicom_name(lower) or _probe_dicom(opener):
+            result.append((name, opener))
+    return result
+
+
+def dicom_to_uint8(ds, window=DEFAULT_WINDOW):
+    """按 RescaleSlope/Intercept 换算 HU 后用固定窗映射到 0-255（不按单张切片的最值拉伸）"""
+    return render_dataset(ds, window=window[0], level=window[1])
+
+
+def _dicom_sort_key(name, ds):
+    # 优先按切片空间位置排序，其次按 InstanceNumber，最后按文件名
+    position = getattr(ds, 'ImagePositionPatient', None)
+    z = float(position[2]) if position is not None and len(position) == 3 else float('inf')
+    instance = getattr(ds, 'InstanceNumber', None)
+    return (z, int(instance) if instance is not None else 0, _natural_key(name))
+
+
+def iter_dicom_slices(sources, window=DEFAULT_WINDOW):
+    """sources 为 (名称, 打开函数) 列表；先只读文件头排序，再逐张解码像素，整个序列用同一个窗"""
+    headers = []
+    for name, opener in sources:
+        with opener() as f:
+            headers.append((_dicom_sort_key(name, pydicom.dcmread(f, stop_before_pixels=True)), name, opener))
+    headers.sort(key=lambda item: item[0])
+    for _, name, opener in headers:
+        with opener() as f:
+            yield name, dicom_to_uint8(pydicom.dcmread(f), window)
+
+
+def iter_image_slices(sources):
+    for name, opener in sorted(sources, key=lambda item: _natural_key(item[0])):
+        with opener() as f:
+            yield name, decode_gray(f)
+
+
+def _split_sources(sources):
+    dicom = dicom_sources(sources)
+    images = [s for s in sources if s[0].lower().endswith(IMAGE_EXTENSIONS)]
+    if dicom and images:
+        raise ValueError("序列中同时包含 DICOM 和普通图像，请分开上传")
+    if not dicom and not images:
+        raise ValueError("序列中没有可识别的 DICOM 或图像切片")
+    return dicom, images
+
+
+def iter_zip_slices(zip_file, window=DEFAULT_WINDOW):
+    """逐张读取 ZIP 中的切片（PNG/JPEG 或 DICOM）"""
+    with zipfile.ZipFile(zip_file) as zf:
+        names = [n for n in zf.namelist()
+                 if not n.endswith('/') and not os.path.basename(n).startswith('.') and '__MACOSX' not in n]
+        sources = [(n, (lambda n=n: zf.open(n))) for n in names]
+        dicom, images = _split_sources(sources)
+        yield from iter_dicom_slices(dicom, window) if dicom else iter_image_slices(images)
+
+
+def iter_path_slices(path, window=DEFAULT_WINDOW):
+    """读取 ZIP 文件，或目录下的 DICOM / 图像文件"""
+    if zipfile.is_zipfile(path):
+        yield from iter_zip_slices(path, window)
+        return
+    names = sorted(os.listdir(path))
+    sources = [(n, (lambda p=os.path.join(path, n): open(p, 'rb'))) for n in names
+               if os.path.isfile(os.path.join(path, n)) and not n.startswith('.')]
+    dicom, images = _split_sources(sources)
+    yield from iter_dicom_slices(dicom, window) if dicom else iter_image_slices(images)
+
+
+def iter_upload_slices(files, window=DEFAULT_WINDOW):
+    """上传的单个 ZIP 或多个 DICOM 文件"""
+    if len(files) == 1 and zipfile.is_zipfile(files[0]):
+        files[0].seek(0)
+        yield from iter_zip_slices(files[0], window)
+        return
+
+    def opener(f):
+        f.seek(0)
+        # 上传文件由 Django 负责关闭，这里返回不关闭底层文件的包装
+        return _NonClosing(f)
+
+    sources = [(f.name, (lambda f=f: opener(f))) for f in files]
+    dicom, images = _split_sources(sources)
+    yield from iter_dicom_slices(dicom, window) if dicom else iter_image_slices(images)
+
+
+class _NonClosing(io.RawIOBase):
+    def __init__(self, f):
+        self._f = f
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._f.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+
+class SeriesWriter:
+    """逐张写出生成结果：zip 为每张一个 PNG，tiff 为多帧 TIFF，均不在内存中累积整个序列"""
+
+    def __init__(self, path, fmt='zip'):
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        if fmt == 'zip':
+            self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+        elif fmt == 'tiff':
+            import tifffile
+
+            self._tiff = tifffile.TiffWriter(path, bigtiff=True)
+        else:
+            raise ValueError(f"不支持的输出格式: {fmt}")
+
+    def write(self, name, image):
+        self.count += 1
+        if self.fmt == 'zip':
+            buffer = io.BytesIO()
+            Image.fromarray(image).save(buffer, format='PNG')
+            stem = os.path.splitext(os.path.basename(name))[0]
+            self._zip.writestr(f"{self.count:04d}_{stem}.png", buffer.getvalue())
+        else:
+            self._tiff.write(image, contiguous=False)
+
+    def close(self):
+        if self.fmt == 'zip':
+            self._zip.close()
+        else:
+            self._tiff.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def generate_series(slices, writer, generate_batch, batch_size=8):
+    """把切片按 batch_size 分批送入生成器；尺寸变化时提前结束当前批次"""
+    names, pending = [], []
+
+    def flush():
+        outputs = generate_batch(np.stack(pending))
+        for name, output in zip(names, outputs):
+            writer.write(name, denormalize_to_uint8(output))
+        names.clear()
+        pending.clear()
+
+    for name, image in slices:
+        if pending and (len(pending) >= batch_size or image.shape != pending[0].shape):
+            flush()
+        names.append(name)
+        pending.append(image)
+    if pending:
+        flush()
+    return writer.count
@@ -0,0 +1,120 @@
+# coding: utf-8
+# 动态微批调度：把并发到达的单张推理请求合并成一个批次，只跑一次 G_A2B 前向。
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ('image', 'future', 'enqueued_at')
+
+    def __init__(self, image):
+        self.image = image
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """收集最多 max_wait_ms 毫秒或 max_batch_size 个请求，堆叠成 (N,512,512,1) 后一次推理"""
+
+    def __init__(self, generator_fn, max_batch_size=8, max_wait_ms=10, input_shape=(512, 512, 1)):
+        # generator_fn 延迟返回模型，保证调度线程启动时才触发加载
+        self.generator_fn = generator_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.input_shape = tuple(input_shape)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batch_size_histogram = Counter()
+        self.queue_depth_histogram = Counter()
+        self.batches = 0
+        self.requests = 0
+        self.queue_wait_seconds = 0.0
+
+    def start(self):
+        # 线程在首次提交时才创建，避免 fork 之前就起线程
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='cta-batch-scheduler', daemon=True)
+                self._thread.start()
+
+    def submit(self, image):
+        """提交一张预处理后的 (512,512,1) 图像，返回 Future"""
+        image = np.asarray(image, dtype=np.float32).reshape(self.input_shape)
+        request = _Request(image)
+        self.start()
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, image, timeout=None):
+        return self.submit(image).result(timeout=timeout)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self.queue_depth,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self.batches,
+                'requests': self.requests,
+                'mean_batch_size': (self.requests / self.batches) if self.batches else 0.0,
+                'mean_queue_wait_ms': (self.queue_wait_seconds / self.requests * 1000.0) if self.requests else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_size_histogram.items())},
+                'queue_depth_histogram': {str(k): v for k, v in sorted(self.queue_depth_histogram.items())},
+            }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        # 记录凑批开始时仍在排队的请求数
+        depth = self._queue.qsize()
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch, depth
+
+    def _run(self):
+        while True:
+            batch, depth = self._collect()
+            started = time.perf_counter()
+            try:
+                inputs = np.empty((len(batch),) + self.input_shape, dtype=np.float32)
+                for i, request in enumerate(batch):
+                    inputs[i] = request.image
+                outputs = self.generator_fn().predict(inputs)
+            except Exception as e:
+                logger.exception("批量推理失败")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            for i, request in enumerate(batch):
+                request.future.set_result(outputs[i])
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.batch_size_histogram[len(batch)] += 1
+                self.queue_depth_histogram[depth] += 1
+                self.queue_wait_seconds += sum(started - r.enqueued_at for r in batch)
@@ -0,0 +1,62 @@
+# coding: utf-8
+# 把训练好的 G_A2B 导出为固定签名的 SavedModel，推理时绕开 Keras 建图与 Model.predict 的调度开销。
+import time
+
+import numpy as np
+import tensorflow as tf
+
+SIGNATURE_INPUT = 'ct'
+SIGNATURE_OUTPUT = 'cta'
+
+
+def export_saved_model(generator, export_dir, input_shape=(512, 512, 1)):
+    """以 concrete tf.function 导出生成器，签名为 (None,512,512,1) float32 -> 同尺寸输出"""
+
+    @tf.function(input_signature=[tf.TensorSpec((None,) + tuple(input_shape), tf.float32, name=SIGNATURE_INPUT)])
+    def serve(ct):
+        return {SIGNATURE_OUTPUT: generator(ct, training=False)}
+
+    module = tf.Module()
+    module.generator = generator
+    module.serve = serve
+    tf.saved_model.save(module, export_dir, signatures={'serving_default': serve.get_concrete_function()})
+    return export_dir
+
+
+class SavedModelGenerator:
+    """加载导出的 SavedModel，对外提供与 keras Model 相同的 predict 接口"""
+
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        self._loaded = tf.saved_model.load(export_dir)
+        self._fn = self._loaded.signatures['serving_default']
+        spec = self._fn.structured_input_signature[1][SIGNATURE_INPUT]
+        self.input_shape = tuple(spec.shape.as_list())
+
+    def predict(self, batch):
+        outputs = self._fn(**{SIGNATURE_INPUT: tf.convert_to_tensor(batch, dtype=tf.float32)})
+        return outputs[SIGNATURE_OUTPUT].numpy()
+
+
+def parity_check(reference, candidate, inputs):
+    """比较两个模型在同一批输入上的输出差异"""
+    expected = reference.predict(inputs)
+    actual = candidate.predict(inputs)
+    diff = np.abs(expected.astype(np.float32) - actual.astype(np.float32))
+    return {'max_abs_diff': float(diff.max()), 'mean_abs_diff': float(diff.mean())}
+
+
+def measure_latency(model, inputs, repeats=20, warmup=3):
+    """单线程重复推理，返回毫秒级延迟分位数"""
+    for _ in range(warmup):
+        model.predict(inputs)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict(inputs)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return {
+        'mean_ms': float(np.mean(samples)),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+    }
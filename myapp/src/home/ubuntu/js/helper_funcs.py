@@ -1,4 +1,4 @@
-from keras.layers import Layer
+from keras.layers import Layer, Conv2D
 #from keras_contrib.layers.normalization.instancenormalization import InputSpec
 import tensorflow_addons as tfa
 from tensorflow.keras.layers import InputSpec
@@ -26,7 +26,12 @@ class ReflectionPadding2D(Layer):
         super(ReflectionPadding2D, self).__init__(**kwargs)
 
     def compute_output_shape(self, s):
-        return (s[0], s[1] + 2 * self.padding[0], s[2] + 2 * self.padding[1], s[3])
+        # 与 call 一致：padding 为 (宽, 高)；空间维度可以是 None（动态输入尺寸）
+        w_pad, h_pad = self.padding
+        return (s[0],
+                None if s[1] is None else s[1] + 2 * h_pad,
+                None if s[2] is None else s[2] + 2 * w_pad,
+                s[3])
 
     def call(self, x, mask=None):
         w_pad, h_pad = self.padding
@@ -37,6 +42,91 @@ class ReflectionPadding2D(Layer):
         return config
 
 
+def reflect_pad_conv2d(x, kernel, h_pad, w_pad):
+    """步长 1 的反射填充卷积，不生成整张填充后的特征图
+
+    先用零填充的 SAME 卷积算出全图（oneDNN 在卷积内部处理零填充，不额外拷贝），
+    再只对受填充方式影响的边框（上下 h_pad 行、左右 w_pad 列）用反射填充的窄条重新卷积，
+    原地写回。窄条只有 3*pad 宽，额外的计算和内存读写都与边长成正比而不是与面积成正比。
+    """
+    n, h, w = tf.shape(x)[0], tf.shape(x)[1], tf.shape(x)[2]
+    out = tf.nn.conv2d(x, kernel, strides=1, padding='SAME')
+    filters = tf.shape(kernel)[3]
+
+    # 上下两条：各取 2*h_pad 行，向外反射 h_pad 行、左右反射 w_pad 列，卷积后得到 h_pad 行 × 全宽
+    top = tf.pad(x[:, :2 * h_pad], [[0, 0], [h_pad, 0], [w_pad, w_pad], [0, 0]], 'REFLECT')
+    bottom = tf.pad(x[:, h - 2 * h_pad:], [[0, 0], [0, h_pad], [w_pad, w_pad], [0, 0]], 'REFLECT')
+    rows = tf.nn.conv2d(tf.concat([top, bottom], 0), kernel, strides=1, padding='VALID')
+    rows = tf.concat([rows[:n], rows[n:]], 1)
+    # 左右两条：各取 2*w_pad 列，上下反射 h_pad 行，只保留四角之外的部分
+    left = tf.pad(x[:, :, :2 * w_pad], [[0, 0], [h_pad, h_pad], [w_pad, 0], [0, 0]], 'REFLECT')
+    right = tf.pad(x[:, :, w - 2 * w_pad:], [[0, 0], [h_pad, h_pad], [0, w_pad], [0, 0]], 'REFLECT')
+    cols = tf.nn.conv2d(tf.concat([left, right], 0), kernel, strides=1, padding='VALID')[:, h_pad:h - h_pad]
+    cols = tf.concat([cols[:n], cols[n:]], 2)
+
+    # 边框像素坐标，顺序与 rows / cols 展平后的顺序一致
+    row_ids = tf.concat([tf.range(h_pad), tf.range(h - h_pad, h)], 0)
+    col_ids = tf.concat([tf.range(w_pad), tf.range(w - w_pad, w)], 0)
+    rr, rc = tf.meshgrid(row_ids, tf.range(w), indexing='ij')
+    cr, cc = tf.meshgrid(tf.range(h_pad, h - h_pad), col_ids, indexing='ij')
+    positions = tf.concat([tf.stack([tf.reshape(rr, [-1]), tf.reshape(rc, [-1])], 1),
+                           tf.stack([tf.reshape(cr, [-1]), tf.reshape(cc, [-1])], 1)], 0)
+    count = tf.shape(positions)[0]
+    batch_ids = tf.repeat(tf.range(n), count)
+    indices = tf.concat([batch_ids[:, None], tf.tile(positions, [n, 1])], 1)
+    updates = tf.concat([tf.reshape(rows, [n, -1, filters]), tf.reshape(cols, [n, -1, filters])], 1)
+    return tf.tensor_scatter_nd_update(out, indices, tf.reshape(updates, [-1, filters]))
+
+
+class ReflectionPaddingConv2D(Conv2D):
+    """ReflectionPadding2D + Conv2D(padding='valid') 的合并层
+
+    权重（kernel/bias）与原来的 Conv2D 完全相同，build_generator 中替换后按拓扑顺序加载的 .hdf5 仍然兼容。
+    步长为 1 且 kernel_size == 2*padding+1 时走 reflect_pad_conv2d，其余情况退回先填充再卷积。
+    """
+
+    def __init__(self, filters, kernel_size, reflect_padding=(1, 1), **kwargs):
+        kwargs['padding'] = 'valid'
+        super(ReflectionPaddingConv2D, self).__init__(filters, kernel_size, **kwargs)
+        self.reflect_padding = tuple(reflect_padding)
+
+    def _fusable(self):
+        w_pad, h_pad = self.reflect_padding
+        return (self.data_format == 'channels_last' and tuple(self.strides) == (1, 1)
+                and tuple(self.dilation_rate) == (1, 1) and h_pad > 0 and w_pad > 0
+                and tuple(self.kernel_size) == (2 * h_pad + 1, 2 * w_pad + 1))
+
+    def call(self, inputs):
+        w_pad, h_pad = self.reflect_padding
+        if self._fusable():
+            outputs = reflect_pad_conv2d(inputs, self.kernel, h_pad, w_pad)
+        else:
+            padded = tf.pad(inputs, [[0, 0], [h_pad, h_pad], [w_pad, w_pad], [0, 0]], 'REFLECT')
+            outputs = tf.nn.conv2d(padded, self.kernel, strides=self.strides, padding='VALID',
+                                   dilations=self.dilation_rate,
+                                   data_format='NHWC' if self.data_format == 'channels_last' else 'NCHW')
+        if self.use_bias:
+            outputs = tf.nn.bias_add(outputs, self.bias,
+                                     data_format='NHWC' if self.data_format == 'channels_last' else 'NCHW')
+        if self.activation is not None:
+            outputs = self.activation(outputs)
+        return outputs
+
+    def compute_output_shape(self, s):
+        w_pad, h_pad = self.reflect_padding
+        s = tf.TensorShape(s).as_list()
+        padded = [s[0],
+                  None if s[1] is None else s[1] + 2 * h_pad,
+                  None if s[2] is None else s[2] + 2 * w_pad,
+                  s[3]]
+        return super(ReflectionPaddingConv2D, self).compute_output_shape(padded)
+
+    def get_config(self):
+        config = super(ReflectionPaddingConv2D, self).get_config()
+        config.update({"reflect_padding": self.reflect_padding})
+        return config
+
+
 class ImagePool():
     def __init__(self, pool_size):
         self.pool_size = pool_size
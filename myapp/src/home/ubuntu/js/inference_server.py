@@ -0,0 +1,215 @@
+# coding: utf-8
+# 进程外推理服务：独立守护进程持有生成器，经 Unix socket 接收请求，图像数组通过 multiprocessing.shared_memory 传递。
+#
+# 协议：每条消息为 4 字节大端长度 + UTF-8 JSON。
+#   客户端创建一块共享内存，前半段放解码后的 uint8 灰度图，后半段留给 float32 结果，
+#   发送 {"op": "generate", "shm": 名称, "shape": [H, W], "tiled": bool, "preview": bool}；
+#   服务端原地读取输入、把结果写入后半段，回复 {"ok": true, "shape": [...]}。
+#   shape 为 [N, H, W] 时表示同尺寸切片组成的批次（非分块），结果为 (N,512,512,1)。
+#   preview 时以低分辨率推理后放大，结果形状与非分块相同；生成器不支持动态尺寸时按 512 推理，应答中 mode 为实际模式。
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>I')
+GENERATOR_SIZE = (512, 512)
+
+
+def _send(sock, message):
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("推理服务连接已关闭")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+
+def output_shape(input_shape, tiled):
+    """生成结果的形状：分块模式保持原分辨率，否则固定为 512x512（批次输入保留批维度）"""
+    if tiled:
+        height, width = input_shape
+        return (height, width, 1)
+    return tuple(input_shape[:-2]) + GENERATOR_SIZE + (1,)
+
+
+def _layout(input_shape, tiled):
+    # 输出区按 8 字节对齐，放在输入区之后
+    in_bytes = int(np.prod(input_shape))
+    offset = (in_bytes + 7) // 8 * 8
+    out_shape = output_shape(input_shape, tiled)
+    return in_bytes, offset, out_shape, offset + int(np.prod(out_shape)) * 4
+
+
+class InferenceClient:
+    """Django 侧的轻量客户端，不导入 TensorFlow；每个线程复用一条 socket 连接"""
+
+    def __init__(self, socket_path, timeout=120):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def request(self, message):
+        # 连接可能因服务重启而失效，断线时重连一次
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                _send(sock, message)
+                reply = _recv(sock)
+                break
+            except socket.timeout:
+                # 超时后连接上的应答顺序已不可靠，丢弃连接但不重发
+                self._reset()
+                raise
+            except (ConnectionError, FileNotFoundError):
+                self._reset()
+                if attempt:
+                    raise
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error', '推理服务返回错误'))
+        return reply
+
+    def generate(self, image, tiled=False, preview=False):
+        """把 uint8 灰度图 (H,W) 或同尺寸批次 (N,H,W) 交给推理服务，返回 float32 结果，取值范围 [-1, 1]"""
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if (tiled or preview) and image.ndim != 2:
+            raise ValueError("分块 / 预览模式只接受单张图像")
+        in_bytes, offset, out_shape, total = _layout(image.shape, tiled)
+        shm = shared_memory.SharedMemory(create=True, size=total)
+        try:
+            np.ndarray(image.shape, dtype=np.uint8, buffer=shm.buf)[:] = image
+            reply = self.request({'op': 'generate', 'shm': shm.name, 'shape': list(image.shape),
+                                  'tiled': bool(tiled), 'preview': bool(preview)})
+            self._local.model_version = reply.get('model_version')
+            result = np.ndarray(out_shape, dtype=np.float32, buffer=shm.buf, offset=offset).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return result
+
+    def last_model_version(self):
+        """本线程上一次 generate 实际使用的模型版本；推理期间发生切换时为 None"""
+        return getattr(self._local, 'model_version', None)
+
+    def info(self):
+        return self.request({'op': 'info'})
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """持有生成器的推理守护进程；非分块请求经 BatchScheduler 与其他连接的请求合批"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, registry, scheduler, tile_options=None):
+        self.registry = registry
+        self.scheduler = scheduler
+        self.tile_options = tile_options or {}
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+    def generate(self, message):
+        from myapp.src.home.ubuntu.js.test_image import generate_preview, preprocess_image
+        from myapp.src.home.ubuntu.js.tiling import tiled_generate
+
+        input_shape = tuple(message['shape'])
+        tiled = bool(message.get('tiled'))
+        preview = bool(message.get('preview')) and not tiled and self.registry.preview_supported
+        in_bytes, offset, out_shape, total = _layout(input_shape, tiled)
+        version = self.registry.version
+        shm = shared_memory.SharedMemory(name=message['shm'])
+        # 共享内存由客户端负责释放，避免服务端的 resource_tracker 在退出时误删
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        image = None
+        try:
+            if shm.size < total:
+                raise ValueError("共享内存大小与请求不符")
+            image = np.ndarray(input_shape, dtype=np.uint8, buffer=shm.buf)
+            if tiled:
+                result = tiled_generate(self.registry.get_generator(), image, **self.tile_options)
+            elif preview:
+                result = generate_preview(image, self.registry.get_generator(), self.registry.preview_size)
+            elif image.ndim == 3:
+                # 批次里的每张切片单独提交，调度器会把它们与其他连接的请求一起合批
+                futures = [self.scheduler.submit(preprocess_image(im)) for im in image]
+                result = np.stack([f.result() for f in futures])
+            else:
+                result = self.scheduler.predict(preprocess_image(image))
+            np.ndarray(out_shape, dtype=np.float32, buffer=shm.buf, offset=offset)[:] = result.reshape(out_shape)
+        finally:
+            image = None
+            try:
+                shm.close()
+            except BufferError:
+                # 异常回溯仍引用着视图时无法立即关闭，映射会在回收时释放
+                pass
+        mode = 'tiled' if tiled else 'preview' if preview else 'full'
+        # 随结果返回所用的模型版本，客户端据此发现缓存的 info 已过期；推理期间发生切换时无法确定版本
+        if self.registry.version != version:
+            version = None
+        return {'ok': True, 'shape': list(out_shape), 'mode': mode, 'model_version': version}
+
+    def info(self):
+        return {
+            'ok': True,
+            'model_version': self.registry.version,
+            'generator_loaded': self.registry.loaded,
+            'preview_supported': self.registry.preview_supported,
+            'batching': self.scheduler.stats(),
+        }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = _recv(self.request)
+            except ConnectionError:
+                return
+            try:
+                if message.get('op') == 'generate':
+                    reply = self.server.generate(message)
+                elif message.get('op') == 'info':
+                    reply = self.server.info()
+                else:
+                    reply = {'ok': False, 'error': f"未知操作: {message.get('op')}"}
+            except Exception as e:
+                logger.exception("推理请求处理失败")
+                reply = {'ok': False, 'error': str(e)}
+            _send(self.request, reply)
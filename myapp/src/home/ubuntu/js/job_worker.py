@@ -0,0 +1,51 @@
+# coding: utf-8
+# 异步生成任务的工作进程入口：不依赖 Django，在独立进程中完成 解码→推理→PNG 编码 并把结果写盘。
+# 模型模块在函数内导入，Django 进程导入本模块提交任务时不会加载 TensorFlow。
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+
+def init_worker(registry_options, thread_config_path=None):
+    """进程池初始化：每个工作进程启动时应用线程配置，加载并预热一次生成器"""
+    from myapp.src.home.ubuntu.js.model_registry import configure_registry, get_registry
+    from myapp.src.home.ubuntu.js.thread_config import configure_threads
+
+    configure_threads(thread_config_path)
+    configure_registry(**registry_options)
+    get_registry().load()
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def run_job(job_dir, job_id, data, tiled=False, tile_options=None):
+    """执行一个生成任务，成功写 <job_id>.png，失败写 <job_id>.error"""
+    from myapp.src.home.ubuntu.js.model_registry import get_registry
+    from myapp.src.home.ubuntu.js.preprocessing import decode_gray, denormalize_to_uint8
+    from myapp.src.home.ubuntu.js.test_image import generate_image
+    from myapp.src.home.ubuntu.js.tiling import tiled_generate
+
+    try:
+        image_np = decode_gray(io.BytesIO(data))
+        generator = get_registry().get_generator()
+        if tiled:
+            processed = tiled_generate(generator, image_np, **(tile_options or {}))
+        else:
+            processed = generate_image(image_np, generator)
+        buffer = io.BytesIO()
+        Image.fromarray(denormalize_to_uint8(processed)).save(buffer, format='PNG')
+        _write_atomic(os.path.join(job_dir, f"{job_id}.png"), buffer.getvalue())
+    except Exception as e:
+        _write_atomic(os.path.join(job_dir, f"{job_id}.error"), str(e).encode('utf-8'))
+    finally:
+        try:
+            os.remove(os.path.join(job_dir, f"{job_id}.pending"))
+        except OSError:
+            pass
@@ -0,0 +1,117 @@
+# coding: utf-8
+# 模型版本清单 saved_models/manifest.json：每个版本记录路径、sha256、输入尺寸、推理后端和是否为默认版本。
+#
+# {
+#   "versions": {
+#     "epoch200": {"path": "trip-.../G_A2B_model_weights_epoch_200.hdf5", "backend": "keras",
+#                  "sha256": "...", "input_shape": [512, 512, 1], "default": true, "added_at": "..."}
+#   }
+# }
+#
+# path 为相对清单所在目录的路径；清单始终通过临时文件 + os.replace 原子写入，serving 进程不会读到半成品。
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_models', 'manifest.json')
+BACKENDS = ('keras', 'savedmodel', 'tflite')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """文件的 sha256；目录（SavedModel）按相对路径排序后依次计入路径与内容"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).replace(os.sep, '/').encode('utf-8'))
+                with open(full, 'rb') as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_signature(manifest_path=DEFAULT_MANIFEST_PATH):
+    """用于轮询变化的 (mtime_ns, size)，清单不存在时返回 None"""
+    try:
+        st = os.stat(manifest_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_manifest(manifest_path=DEFAULT_MANIFEST_PATH):
+    """读取清单，不存在时返回空清单"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {'versions': {}}
+    manifest.setdefault('versions', {})
+    return manifest
+
+
+def write_manifest(manifest, manifest_path=DEFAULT_MANIFEST_PATH):
+    """原子写入清单"""
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.json.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def resolve_path(entry, manifest_path=DEFAULT_MANIFEST_PATH):
+    return os.path.join(os.path.dirname(os.path.abspath(manifest_path)), entry['path'])
+
+
+def default_version(manifest):
+    """返回 (版本名, 条目)；没有标记默认版本时返回 (None, None)"""
+    for name, entry in manifest['versions'].items():
+        if entry.get('default'):
+            return name, entry
+    return None, None
+
+
+def add_version(manifest, name, path, input_shape, backend='keras', make_default=False,
+                manifest_path=DEFAULT_MANIFEST_PATH):
+    """登记一个版本并计算校验和；第一个登记的版本自动成为默认版本"""
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {backend}")
+    absolute = os.path.abspath(path)
+    if not os.path.exists(absolute):
+        raise FileNotFoundError(f"模型文件不存在: {absolute}")
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    manifest['versions'][name] = {
+        'path': os.path.relpath(absolute, base).replace(os.sep, '/'),
+        'backend': backend,
+        'sha256': file_sha256(absolute),
+        'input_shape': list(input_shape),
+        'default': False,
+        'added_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if make_default or len(manifest['versions']) == 1:
+        set_default(manifest, name)
+    return manifest['versions'][name]
+
+
+def set_default(manifest, name):
+    """把 name 标记为唯一的默认版本"""
+    if name not in manifest['versions']:
+        raise KeyError(f"清单中没有版本: {name}")
+    for version, entry in manifest['versions'].items():
+        entry['default'] = version == name
@@ -0,0 +1,263 @@
+# coding: utf-8
+# 进程级生成器注册表：每个 worker 进程只建图、加载权重一次，之后所有请求复用同一个模型。
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from tensorflow_addons.layers import InstanceNormalization
+
+from myapp.src.home.ubuntu.js.model_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    default_version,
+    file_sha256,
+    load_manifest,
+    manifest_signature,
+    resolve_path,
+)
+from myapp.src.home.ubuntu.js.test_image import build_generator, opt, supports_dynamic_input
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_models')
+DEFAULT_RUN_NAME = 'trip-ce-ssimG_rate1False10.0100datasettime1'
+
+
+def find_weight_file(weight_path=DEFAULT_WEIGHT_PATH, run_name=DEFAULT_RUN_NAME, direction='A2B'):
+    """在 saved_models/ 下查找指定训练批次的生成器权重（.hdf5）；仅在没有 manifest.json 时使用"""
+    for name in sorted(os.listdir(weight_path)):
+        if run_name not in name:
+            continue
+        run_dir = os.path.join(weight_path, name)
+        for weight in sorted(os.listdir(run_dir)):
+            if direction in weight and '.hdf5' in weight:
+                return os.path.join(run_dir, weight)
+    raise FileNotFoundError(f"未在 {weight_path} 中找到 {run_name} 的 {direction} 权重文件")
+
+
+class ModelRegistry:
+    """只构建推理需要的 G_A2B，加载权重并预热后交给调用方复用
+
+    存在 saved_models/manifest.json 时按清单加载默认版本：按需加载、最多常驻 max_resident 个版本，
+    每 poll_interval 秒检查一次清单，默认版本变化后在后台线程建图预热，完成后原子切换，切换期间继续用旧版本服务。
+    没有清单时退回原来的目录扫描：
+    backend='keras' 时按 build_generator 建图并加载 .hdf5；
+    backend='savedmodel' 时直接加载 export_generator 导出的 SavedModel；
+    backend='tflite' 时加载 quantize_generator 发布的量化模型。
+    keras 后端默认以动态输入尺寸 (None, None, C) 建图，可用 preview_size 低分辨率快速预览；
+    SavedModel / TFLite 的签名固定为 512x512，不支持预览。
+    """
+
+    def __init__(self, weight_path=DEFAULT_WEIGHT_PATH, run_name=DEFAULT_RUN_NAME,
+                 backend='keras', artifact_path=None,
+                 manifest_path=DEFAULT_MANIFEST_PATH, max_resident=2, poll_interval=5.0,
+                 dynamic_input=True, preview_size=256):
+        self.weight_path = weight_path
+        self.run_name = run_name
+        self.backend = backend
+        self.artifact_path = artifact_path
+        self.manifest_path = manifest_path
+        self.max_resident = max(1, max_resident)
+        self.poll_interval = poll_interval
+        self.dynamic_input = dynamic_input
+        self.preview_size = preview_size
+        self.weight_file = None
+        # (版本名, 生成器, 版本标识)；版本名为 None 表示走目录扫描
+        self._active = None
+        self._resident = OrderedDict()
+        self._manifest_signature = None
+        self._next_poll = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._active is not None
+
+    @property
+    def version(self):
+        """模型版本标识，供结果缓存等区分不同权重；清单模式为 版本名:sha256 前缀"""
+        active = self._active
+        return active[2] if active is not None else None
+
+    @property
+    def preview_supported(self):
+        """当前生成器是否接受任意输入尺寸（可用于低分辨率预览）"""
+        active = self._active
+        return active is not None and self.preview_size is not None and supports_dynamic_input(active[1])
+
+    @property
+    def active_version(self):
+        active = self._active
+        return active[0] if active is not None else None
+
+    def resident_versions(self):
+        with self._build_lock:
+            return list(self._resident)
+
+    def resolve_artifact(self):
+        """不建图，返回默认版本的 (后端, 路径)，供预加载时预读权重文件"""
+        name, entry = default_version(load_manifest(self.manifest_path))
+        if name is not None:
+            return entry.get('backend', self.backend), resolve_path(entry, self.manifest_path)
+        if self.backend == 'keras':
+            return 'keras', find_weight_file(self.weight_path, self.run_name)
+        return self.backend, self.artifact_path
+
+    def load(self):
+        # 双重检查，保证并发的首批请求只触发一次建图
+        if self._active is not None:
+            return self._active[1]
+        with self._lock:
+            if self._active is None:
+                self._manifest_signature = manifest_signature(self.manifest_path)
+                name, entry = (None, None)
+                if self._manifest_signature is not None:
+                    name, entry = default_version(load_manifest(self.manifest_path))
+                if name is None:
+                    self._active = self._build_legacy()
+                else:
+                    self._active = self._load_version(name, entry)
+                self._next_poll = time.monotonic() + self.poll_interval
+        return self._active[1]
+
+    def get_generator(self, version=None):
+        """返回当前默认版本的生成器；指定 version 时按清单加载该版本"""
+        if version is not None:
+            entry = load_manifest(self.manifest_path)['versions'].get(version)
+            if entry is None:
+                raise KeyError(f"清单中没有版本: {version}")
+            return self._load_version(version, entry)[1]
+        if self._active is None:
+            return self.load()
+        self._poll()
+        return self._active[1]
+
+    def _poll(self):
+        """节流地检查清单是否变化；默认版本变化时在后台加载新版本"""
+        now = time.monotonic()
+        if now < self._next_poll or not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = now + self.poll_interval
+            signature = manifest_signature(self.manifest_path)
+            if signature == self._manifest_signature:
+                return
+            self._manifest_signature = signature
+            if signature is None:
+                return
+            try:
+                name, entry = default_version(load_manifest(self.manifest_path))
+            except ValueError as e:
+                logger.error(f"模型清单解析失败，继续使用 {self.version}: {e}")
+                return
+            if name is None or name == self._active[0] or name == self._pending:
+                return
+            self._pending = name
+            threading.Thread(target=self._activate, args=(name, entry), daemon=True,
+                             name=f"model-activate-{name}").start()
+        finally:
+            self._poll_lock.release()
+
+    def _activate(self, name, entry):
+        try:
+            record = self._load_version(name, entry)
+            with self._lock:
+                previous = self.version
+                self._active = record
+            logger.info(f"生成器已切换: {previous} → {record[2]}")
+        except Exception:
+            logger.exception(f"加载模型版本 {name} 失败，继续使用 {self.version}")
+        finally:
+            self._pending = None
+
+    def _load_version(self, name, entry):
+        """按清单条目加载一个版本（已常驻则直接复用），并按 LRU 淘汰超出上限的非活动版本"""
+        with self._build_lock:
+            record = self._resident.get(name)
+            if record is not None and record[2].endswith(entry['sha256'][:12]):
+                self._resident.move_to_end(name)
+                return record
+
+            path = resolve_path(entry, self.manifest_path)
+            checksum = file_sha256(path)
+            if checksum != entry['sha256']:
+                raise ValueError(f"模型 {name} 校验和不匹配: 清单 {entry['sha256'][:12]}，文件 {checksum[:12]}")
+            logger.info(f"加载模型版本 {name}: {path}")
+            generator = self._build(entry.get('backend', self.backend), path,
+                                    tuple(entry.get('input_shape', opt['img_shape'])))
+            record = (name, generator, f"{name}:{checksum[:12]}")
+            self.weight_file = path
+            self._resident[name] = record
+            self._resident.move_to_end(name)
+
+            active = self.active_version
+            for resident in list(self._resident):
+                if len(self._resident) <= self.max_resident:
+                    break
+                if resident not in (active, name):
+                    logger.info(f"卸载模型版本 {resident}")
+                    del self._resident[resident]
+            return record
+
+    def _build_legacy(self):
+        """没有清单时的原有加载方式：keras 扫描 saved_models/，其它后端使用 artifact_path"""
+        if self.backend == 'keras':
+            weight_file = find_weight_file(self.weight_path, self.run_name)
+        else:
+            weight_file = self.artifact_path
+        generator = self._build(self.backend, weight_file, opt['img_shape'])
+        self.weight_file = weight_file
+        version = f"{self.backend}:{os.path.basename(weight_file)}@{int(os.path.getmtime(weight_file))}"
+        return None, generator, version
+
+    def _build(self, backend, path, input_shape):
+        if backend == 'savedmodel':
+            from myapp.src.home.ubuntu.js.export_model import SavedModelGenerator
+
+            logger.info(f"加载 SavedModel 推理产物: {path}")
+            generator = SavedModelGenerator(path)
+        elif backend == 'tflite':
+            from myapp.src.home.ubuntu.js.quantize import TFLiteGenerator
+
+            logger.info(f"加载量化模型: {path}")
+            generator = TFLiteGenerator(path)
+        elif backend == 'keras':
+            model = {'normalization': InstanceNormalization}
+            # 生成器是全卷积的，动态空间尺寸建图后同一份权重可在任意（4 的倍数）尺寸上推理
+            img_shape = (None, None, input_shape[2]) if self.dynamic_input else tuple(input_shape)
+            generator = build_generator(model, dict(opt, img_shape=img_shape), name='G_A2B_model')
+            logger.info(f"加载生成器权重: {path}")
+            generator.load_weights(path)
+        else:
+            raise ValueError(f"未知的推理后端: {backend}")
+        # 预热一次，把图追踪与内存分配的开销留在启动（或切换前）阶段
+        generator.predict(np.zeros((1,) + tuple(input_shape), dtype=np.float32))
+        if self.preview_size and supports_dynamic_input(generator):
+            generator.predict(np.zeros((1, self.preview_size, self.preview_size, input_shape[2]), dtype=np.float32))
+        return generator
+
+
+_registry = None
+_registry_options = {}
+_registry_lock = threading.Lock()
+
+
+def configure_registry(**options):
+    """设置注册表参数（后端、权重目录等），需在首次 get_registry() 之前调用才会生效"""
+    with _registry_lock:
+        _registry_options.update(options)
+
+
+def get_registry():
+    """返回当前进程唯一的注册表实例"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(**_registry_options)
+    return _registry
@@ -0,0 +1,70 @@
+# coding: utf-8
+# 生成器输入输出的前/后处理：全程 uint8 / float32，缩放用 PIL 的 C 实现，归一化直接写进预分配的批缓冲区。
+# 替代 skimage.transform.resize（会升到 float64）加 *2-1、newaxis、reshape 的多次整图拷贝。
+import numpy as np
+from PIL import Image
+
+INPUT_SIZE = (512, 512)
+
+
+def decode_gray(file):
+    """解码上传文件为 uint8 灰度图 (H,W)"""
+    with Image.open(file) as image:
+        return np.asarray(image.convert('L'))
+
+
+def resize_gray(image, size=INPUT_SIZE):
+    """uint8 灰度图缩放到 size（高, 宽），尺寸一致时不拷贝"""
+    if image.shape[:2] == tuple(size):
+        return image
+    # PIL 的 BILINEAR 在缩小时会按比例扩大支撑域，等价于带抗混叠的双线性插值
+    resized = Image.fromarray(image).resize((size[1], size[0]), Image.BILINEAR)
+    return np.asarray(resized)
+
+
+def normalize_into(image, out):
+    """把 uint8（或 [0,1] 浮点）图像原地写入 out 并映射到 [-1, 1]，out 为 (H,W) 或 (H,W,1) float32"""
+    if out.ndim == 3:
+        out = out[:, :, 0]
+    scale = 2.0 / 255.0 if np.issubdtype(image.dtype, np.integer) else 2.0
+    np.multiply(image, scale, out=out, casting='unsafe')
+    out -= 1.0
+    return out
+
+
+def preprocess_into(image, out, size=INPUT_SIZE):
+    """缩放并归一化到批缓冲区中的一个槽位，例如 batch[i]"""
+    if image.ndim == 3:
+        image = image[:, :, 0]
+    if not np.issubdtype(image.dtype, np.integer):
+        image = np.clip(image * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    normalize_into(resize_gray(image, size), out)
+    return out
+
+
+def preprocess(image, size=INPUT_SIZE):
+    """返回新分配的 (H,W,1) float32 生成器输入"""
+    out = np.empty(tuple(size) + (1,), dtype=np.float32)
+    return preprocess_into(image, out, size)
+
+
+def resize_output(output, size=INPUT_SIZE):
+    """生成器输出 (h,w,1) float32 双线性缩放到 size，取值范围不变（预览模式把低分辨率结果放大回原尺寸）"""
+    output = np.asarray(output, dtype=np.float32)
+    if output.shape[:2] == tuple(size):
+        return output
+    resized = Image.fromarray(np.ascontiguousarray(output.reshape(output.shape[:2])), mode='F')
+    resized = resized.resize((size[1], size[0]), Image.BILINEAR)
+    return np.asarray(resized, dtype=np.float32)[:, :, np.newaxis]
+
+
+def denormalize_to_uint8(output, out=None):
+    """生成器输出 [-1, 1] 直接换算为 uint8 (H,W)，与原先 (x*127.5+127.5).astype(uint8) 的截断方式一致"""
+    output = np.asarray(output, dtype=np.float32)
+    output = output.reshape(output.shape[:2]) if output.ndim == 3 else output
+    scratch = np.multiply(output, 127.5)
+    scratch += 127.5
+    if out is None:
+        out = np.empty(output.shape, dtype=np.uint8)
+    np.copyto(out, scratch, casting='unsafe')
+    return out
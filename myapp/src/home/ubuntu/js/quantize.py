@@ -0,0 +1,101 @@
+# coding: utf-8
+# G_A2B 训练后量化（int8 / float16 TFLite），附带与浮点模型对比的 SSIM/PSNR 质量门槛。
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from myapp.src.home.ubuntu.js.test_image import preprocess_image
+
+DEFAULT_CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset', '100dataset', 'testCT')
+
+
+def load_calibration_slices(directory=DEFAULT_CALIBRATION_DIR, limit=32):
+    """读取校准用 CT 切片，返回 (N,512,512,1) float32，取值范围 [-1, 1]"""
+    names = [n for n in sorted(os.listdir(directory)) if n[-1].lower() == 'g'][:limit]
+    if not names:
+        raise FileNotFoundError(f"{directory} 中没有可用的校准图像")
+    slices = np.empty((len(names),) + (512, 512, 1), dtype=np.float32)
+    for i, name in enumerate(names):
+        slices[i] = preprocess_image(np.array(Image.open(os.path.join(directory, name)).convert('L')))
+    return slices
+
+
+def split_holdout(slices, fraction=0.25):
+    """按固定间隔抽出约 fraction 比例的切片作为质量门槛的留出集，其余用于 int8 校准，两者互不重叠"""
+    if len(slices) < 2:
+        raise ValueError("至少需要 2 张切片才能划分校准集与留出集")
+    step = max(2, int(round(1.0 / fraction)))
+    held_out = np.zeros(len(slices), dtype=bool)
+    held_out[step - 1::step] = True
+    if not held_out.any():
+        held_out[-1] = True
+    return slices[~held_out], slices[held_out]
+
+
+def convert_to_tflite(saved_model_dir, mode, calibration=None):
+    """把导出的 SavedModel 转为 TFLite；int8 需要校准数据，输入输出仍保持 float32"""
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'int8':
+        if calibration is None:
+            raise ValueError("int8 量化需要校准数据")
+
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    else:
+        raise ValueError(f"未知的量化模式: {mode}")
+    return converter.convert()
+
+
+class TFLiteGenerator:
+    """TFLite 解释器封装，对外提供与 keras Model 相同的 predict 接口"""
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self._interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self.input_shape = (None,) + tuple(int(d) for d in self._input['shape'][1:])
+        self._batch_size = None
+        # 解释器不是线程安全的
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input['index'], batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input['index'], batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output['index']).copy()
+
+
+def quality_gate(reference, candidate, inputs, min_ssim=0.98, min_psnr=35.0, batch_size=4):
+    """逐批比较量化模型与浮点模型的输出，返回平均 SSIM/PSNR 以及是否达标"""
+    ssim, psnr = [], []
+    for i in range(0, len(inputs), batch_size):
+        batch = inputs[i:i + batch_size]
+        # 输出从 [-1, 1] 映射到 [0, 1] 再计算指标
+        expected = (reference.predict(batch) + 1.0) / 2.0
+        actual = (candidate.predict(batch) + 1.0) / 2.0
+        ssim.extend(tf.image.ssim(expected, actual, max_val=1.0).numpy().tolist())
+        psnr.extend(tf.image.psnr(expected, actual, max_val=1.0).numpy().tolist())
+    result = {
+        'ssim': float(np.mean(ssim)),
+        'ssim_min': float(np.min(ssim)),
+        'psnr': float(np.mean(psnr)),
+        'psnr_min': float(np.min(psnr)),
+    }
+    result['passed'] = result['ssim'] >= min_ssim and result['psnr'] >= min_psnr
+    return result
@@ -24,7 +24,8 @@ import tensorflow as tf
 from skimage.transform import resize
 from skimage import color
 from skimage import io as sk_io
-from myapp.src.home.ubuntu.js.helper_funcs import ReflectionPadding2D
+from myapp.src.home.ubuntu.js.helper_funcs import ReflectionPadding2D, ReflectionPaddingConv2D
+from myapp.src.home.ubuntu.js.preprocessing import preprocess, preprocess_into, resize_output
 
 #from helper_funcs import *
 
@@ -44,6 +45,7 @@ opt['img_shape'] = (512,512,1)
 # Architecture parameters
 opt['use_dropout'] = False  # Dropout in residual blocks
 opt['use_bias'] = True  # Use bias
+opt['fuse_reflection_conv'] = False  # 反射填充与其后的卷积合并为 ReflectionPaddingConv2D，权重与原结构兼容；提交实测的延迟收益前默认关闭（myapp/benchmarks/reflection_conv.py --generator）
 opt['use_resize_convolution'] = True  # Resize convolution - instead of transpose convolution in deconvolution layers (uk) - can reduce checkerboard artifacts but the blurring might affect the cycle-consistency
 
 # Tweaks
@@ -62,9 +64,16 @@ def ck(model, opt, x, k, use_normalization, use_bias):
     x = LeakyReLU(alpha=0.2)(x)
     return x
 
+# Reflection padding followed by a 'valid' convolution (fused into one layer when opt['fuse_reflection_conv'])
+def reflect_conv(opt, x, k, kernel_size, padding, use_bias):
+    if opt.get('fuse_reflection_conv', False):
+        return ReflectionPaddingConv2D(filters=k, kernel_size=kernel_size, reflect_padding=padding, use_bias=use_bias)(x)
+    x = ReflectionPadding2D(padding)(x)
+    return Conv2D(filters=k, kernel_size=kernel_size, strides=1, padding='valid', use_bias=use_bias)(x)
+
 # First generator layer
 def c7Ak(model, opt, x, k):
-    x = Conv2D(filters=k, kernel_size=7, strides=1, padding='valid', use_bias=opt['use_bias'])(x)
+    x = reflect_conv(opt, x, k, 7, (3, 3), opt['use_bias'])
     x = model['normalization'](axis=3, center=True, epsilon=1e-5)(x, training=True)
     x = Activation('relu')(x)
     return x
@@ -81,8 +90,7 @@ def Rk(model, opt, x0):
     k = int(x0.shape[-1])
 
     # First layer
-    x = ReflectionPadding2D((1,1))(x0)
-    x = Conv2D(filters=k, kernel_size=3, strides=1, padding='valid', use_bias=opt['use_bias'])(x)
+    x = reflect_conv(opt, x0, k, 3, (1, 1), opt['use_bias'])
     x = model['normalization'](axis=3, center=True, epsilon=1e-5)(x, training=True)
     x = Activation('relu')(x)
 
@@ -90,8 +98,7 @@ def Rk(model, opt, x0):
         x = Dropout(0.5)(x)
 
     # Second layer
-    x = ReflectionPadding2D((1, 1))(x)
-    x = Conv2D(filters=k, kernel_size=3, strides=1, padding='valid', use_bias=opt['use_bias'])(x)
+    x = reflect_conv(opt, x, k, 3, (1, 1), opt['use_bias'])
     x = model['normalization'](axis=3, center=True, epsilon=1e-5)(x, training=True)
     # Merge
     x = add([x, x0])
@@ -103,8 +110,7 @@ def uk(model, opt, x, k):
     # (up sampling followed by 1x1 convolution <=> fractional-strided 1/2)
     if opt['use_resize_convolution']:
         x = UpSampling2D(size=(2, 2))(x)  # Nearest neighbor upsampling
-        x = ReflectionPadding2D((1, 1))(x)
-        x = Conv2D(filters=k, kernel_size=3, strides=1, padding='valid', use_bias=opt['use_bias'])(x)
+        x = reflect_conv(opt, x, k, 3, (1, 1), opt['use_bias'])
     else:
         x = Conv2DTranspose(filters=k, kernel_size=3, strides=2, padding='same', use_bias=opt['use_bias'])(x)  # this matches fractionally stided with stride 1/2
     x = model['normalization'](axis=3, center=True, epsilon=1e-5)(x, training=True)
@@ -117,8 +123,7 @@ def build_generator(model, opt, name=None):
     # Layer 1: Input
 
     input_img = Input(shape=opt['img_shape'])
-    x = ReflectionPadding2D((3, 3))(input_img)
-    x = c7Ak(model, opt, x, 32)
+    x = c7Ak(model, opt, input_img, 32)
 
     # Layer 2-3: Downsampling
     x = dk(model, opt, x, 64)
@@ -133,8 +138,7 @@ def build_generator(model, opt, name=None):
     x = uk(model, opt, x, 32)
 
     # Layer 15: Output
-    x = ReflectionPadding2D((3, 3))(x)
-    x = Conv2D(opt['channels'], kernel_size=7, strides=1, padding='valid', use_bias=True)(x)
+    x = reflect_conv(opt, x, opt['channels'], 7, (3, 3), True)
     x = Activation('tanh')(x)
     # x = Reshape((217,181,1))(x)
     # print("Generator Model:")
@@ -146,45 +150,31 @@ def build_generator(model, opt, name=None):
 # In[ ]:
 
 
-def generate_image(image):
-    # Load Model
-
-    model = {}
-    # Normalization
-    model['normalization'] = InstanceNormalization
-    model['G_A2B'] = build_generator(model, opt, name='G_A2B_model')
-    model['G_B2A'] = build_generator(model, opt, name='G_B2A_model')
-
-    weight_path = 'D:/PyCharm/djangoProject/myapp/src/home/ubuntu/js/saved_models/'
-
-    GA2B = model['G_A2B']
-
-    files_name = os.listdir(weight_path)
+def preprocess_image(image):
+    # Resize to the generator input and scale to [-1, 1] -> (512,512,1) float32
+    return preprocess(image, opt['img_shape'][:2])
 
-    for name in files_name:
-        if 'trip-ce-ssimG_rate1False10.0100datasettime1' in name: # You need to change this.
-         b = name.split('10.0') # Change here
-         c = b[0].split('False') # Change here
-         file_name = c[0]+c[1]
-         a=b[1].split('time1') # Change here
-         weight_file = os.path.join(weight_path,name)
-         for weight in os.listdir(weight_file):
-            if 'A2B' in weight and '.hdf5' in weight:
-                print(os.path.join(weight_file,weight))
-                GA2B.load_weights(os.path.join(weight_file,weight))
 
-                #image = mpimg.imread(os.path.join(image_path,images))
-                image = resize(image,(512,512))
-                image = image[:, :, np.newaxis]
-                image = image * 2 - 1
-                real_image = image
-                image = np.reshape(image,(1, 512,512,1))
-                im = GA2B.predict(image)
-                im = np.reshape(im,(512,512))
-                im = im[:, :, np.newaxis]
-                return im;
+def supports_dynamic_input(generator):
+    # Fully convolutional builds with img_shape (None, None, C) accept any size divisible by 4
+    shape = getattr(generator, 'input_shape', None)
+    return shape is not None and shape[1] is None and shape[2] is None
 
 
+def generate_preview(image, generator, size=256):
+    # Run at size x size (about (512/size)^2 less compute) and upsample back to img_shape
+    batch = np.empty((1, size, size, opt['channels']), dtype=np.float32)
+    preprocess_into(image, batch[0], (size, size))
+    return resize_output(generator.predict(batch)[0], opt['img_shape'][:2])
 
 
+def generate_image(image, generator=None):
+    # Load Model (built once per process by the registry)
+    if generator is None:
+        from myapp.src.home.ubuntu.js.model_registry import get_registry
+        generator = get_registry().get_generator()
 
+    batch = np.empty((1,) + opt['img_shape'], dtype=np.float32)
+    preprocess_into(image, batch[0], opt['img_shape'][:2])
+    im = generator.predict(batch)
+    return im[0]
@@ -0,0 +1,77 @@
+# thread_config.py
+# TensorFlow CPU 线程拓扑配置：tune_threads 扫描 intra-op / inter-op 线程数与 worker 数后写入 JSON，
+# 各推理进程在 TF 运行时初始化之前读取并应用，避免多个 worker 默认各开满核数的线程池而互相抢占。
+#
+# 配置示例：
+#   {"intra_op_threads": 2, "inter_op_threads": 1, "workers": 4, "affinity": true, "cpus_per_worker": 2}
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+_applied = None
+
+
+def load_thread_config(path):
+    """读取线程配置；文件不存在时返回 None"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_thread_config(config, path):
+    """原子写入，避免启动中的进程读到半个文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def apply_thread_config(config):
+    """设置 TF 线程池大小；必须在本进程执行任何 TF op 之前调用"""
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(int(config['intra_op_threads']))
+        tf.config.threading.set_inter_op_parallelism_threads(int(config['inter_op_threads']))
+    except RuntimeError as e:
+        # 运行时已初始化（例如已有推理发生），线程池大小无法再修改
+        logger.warning(f"TF 运行时已初始化，线程配置未生效: {e}")
+        return None
+    logger.info(f"TF 线程配置: intra_op={config['intra_op_threads']} inter_op={config['inter_op_threads']}")
+    return config
+
+
+def configure_threads(path):
+    """进程内只读取并应用一次配置文件，返回生效的配置（没有配置文件时为 None）"""
+    global _configured, _applied
+    if _configured:
+        return _applied
+    _configured = True
+    config = load_thread_config(path)
+    if config:
+        _applied = apply_thread_config(config)
+    return _applied
+
+
+def worker_cpus(index, cpus_per_worker, cpus=None):
+    """第 index 个 worker 绑定的 CPU 集合，按可用 CPU 顺序分段、超出后循环"""
+    cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    cpus_per_worker = max(1, min(cpus_per_worker, len(cpus)))
+    slots = max(1, len(cpus) // cpus_per_worker)
+    start = (index % slots) * cpus_per_worker
+    return set(cpus[start:start + cpus_per_worker])
+
+
+def pin_worker(index, config, cpus=None):
+    """按配置把当前进程绑定到专属的 CPU 段；未开启 affinity 或平台不支持时返回 None"""
+    if not config or not config.get('affinity') or not hasattr(os, 'sched_setaffinity'):
+        return None
+    assigned = worker_cpus(index, config.get('cpus_per_worker') or config['intra_op_threads'], cpus)
+    os.sched_setaffinity(0, assigned)
+    return assigned
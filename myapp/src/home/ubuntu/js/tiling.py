@@ -0,0 +1,81 @@
+# coding: utf-8
+# 分块推理：大尺寸 CT 切片按重叠 tile 分批送入生成器，用窗函数加权融合接缝，不再强制缩放到 512x512。
+import tempfile
+
+import numpy as np
+
+from myapp.src.home.ubuntu.js.preprocessing import normalize_into
+
+
+def tile_starts(length, tile_size, stride):
+    """沿一个维度计算 tile 起点，保证最后一块贴齐边界"""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)
+    return starts
+
+
+def blend_window(tile_size, overlap, floor=1e-3):
+    """二维融合窗：中心区域为 1，重叠带内按 Hann 曲线过渡"""
+    ramp = np.ones(tile_size, dtype=np.float32)
+    if overlap > 0:
+        t = (np.arange(overlap, dtype=np.float32) + 0.5) / overlap
+        edge = np.sin(t * np.pi / 2) ** 2
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge[::-1]
+    # 保留一个下限，图像边界处只被一块 tile 覆盖时权重也不为 0
+    ramp = np.maximum(ramp, floor)
+    return np.outer(ramp, ramp)
+
+
+def _accumulator(shape, scratch_dir):
+    if scratch_dir is None:
+        return np.zeros(shape, dtype=np.float32)
+    # 超大图的累加缓冲放到磁盘映射文件上，常驻内存只剩当前批次的 tile
+    return np.memmap(tempfile.TemporaryFile(dir=scratch_dir), dtype=np.float32, mode='w+', shape=shape)
+
+
+def tiled_generate(generator, image, tile_size=512, overlap=64, batch_size=4, scratch_dir=None):
+    """对任意尺寸的灰度图分块推理，返回原分辨率的 (H,W,1)，取值范围 [-1, 1]"""
+    if tile_size % 4:
+        raise ValueError("tile_size 必须是 4 的倍数（生成器包含两次 2 倍下采样）")
+    if not 0 <= overlap < tile_size // 2:
+        raise ValueError("overlap 必须小于 tile_size 的一半")
+
+    input_shape = getattr(generator, 'input_shape', None)
+    if input_shape is not None and None not in input_shape[1:3] and tuple(input_shape[1:3]) != (tile_size, tile_size):
+        raise ValueError(f"生成器输入尺寸为 {tuple(input_shape[1:3])}，与 tile_size={tile_size} 不一致")
+
+    image = np.asarray(image)
+    if image.ndim == 3:
+        image = image[:, :, 0]
+    height, width = image.shape
+
+    # 小于一块 tile 的维度先做反射填充，输出时再裁回
+    pad_h, pad_w = max(0, tile_size - height), max(0, tile_size - width)
+    if pad_h or pad_w:
+        image = np.pad(image, ((0, pad_h), (0, pad_w)), mode='reflect')
+    padded_h, padded_w = image.shape
+
+    stride = tile_size - overlap
+    positions = [(y, x) for y in tile_starts(padded_h, tile_size, stride)
+                 for x in tile_starts(padded_w, tile_size, stride)]
+    window = blend_window(tile_size, overlap)
+
+    output = _accumulator((padded_h, padded_w), scratch_dir)
+    weight = _accumulator((padded_h, padded_w), scratch_dir)
+    batch = np.empty((batch_size, tile_size, tile_size, 1), dtype=np.float32)
+
+    for i in range(0, len(positions), batch_size):
+        chunk = positions[i:i + batch_size]
+        for j, (y, x) in enumerate(chunk):
+            normalize_into(image[y:y + tile_size, x:x + tile_size], batch[j])
+        predicted = generator.predict(batch[:len(chunk)])
+        for j, (y, x) in enumerate(chunk):
+            output[y:y + tile_size, x:x + tile_size] += predicted[j, :, :, 0] * window
+            weight[y:y + tile_size, x:x + tile_size] += window
+
+    result = np.empty((height, width, 1), dtype=np.float32)
+    np.divide(output[:height, :width], weight[:height, :width], out=result[:, :, 0])
+    return result
@@ -30,6 +30,8 @@ document.getElementById('imageForm').addEventListener('submit', function(event)
                 const url = URL.createObjectURL(xhr.response);
                 document.getElementById('processedImage').src = url;
                 document.getElementById('downloadLink').href = url;
+                // 服务端在不支持预览时会退回完整推理，以响应头中的实际模式为准
+                document.getElementById('renderMode').classList.toggle('hidden', xhr.getResponseHeader('X-Render-Mode') !== 'preview');
             }, 2000); // 2秒延迟
         } else {
             alert('Error processing image.');
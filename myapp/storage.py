@@ -0,0 +1,187 @@
+# storage.py
+# media 输出文件管理：结果按内容哈希命名，相同的结果只存一份，重复写入时只刷新 mtime 作为最近访问时间；
+# 垃圾回收先删除超过 TTL 未访问的文件，再按最近访问时间淘汰到容量上限的 90%，保证磁盘占用有界。
+# 写入时顺带做节流的定期清理，也可以用 gc_media 命令（cron / systemd timer）单独执行。
+# 受管理目录下的子目录（如瓦片金字塔）作为一个整体按目录的 mtime 计时、按总大小计容量、整体删除。
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from myapp.metrics import REGISTRY, flatten_stats
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+class MediaStorage:
+    def __init__(self, root, url, areas=('processed', 'temp', 'series', 'pyramids'), ttl=24 * 3600, max_bytes=1024 * 1024 * 1024,
+                 sweep_interval=300):
+        self.root = root
+        self.url = url
+        self.areas = tuple(areas)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.saves = 0
+        self.dedup_hits = 0
+        self.removed = 0
+        self.freed_bytes = 0
+
+    def _area_dir(self, area):
+        if area not in self.areas:
+            raise ValueError(f"未受管理的 media 目录: {area}")
+        return os.path.join(self.root, area)
+
+    def save(self, area, data, ext, prefix='result'):
+        """按内容哈希保存并返回 URL；内容已存在时不重写，只刷新访问时间"""
+        self.sweep()
+        directory = self._area_dir(area)
+        name = f"{prefix}_{content_hash(data)}{ext}"
+        path = os.path.join(directory, name)
+        try:
+            os.utime(path)
+            with self._lock:
+                self.dedup_hits += 1
+        except FileNotFoundError:
+            os.makedirs(directory, exist_ok=True)
+            # 先写临时文件再原子替换，并发写入同一内容或清理进行中都不会看到半个文件
+            tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            with self._lock:
+                self.saves += 1
+        return self.url_for(area, name)
+
+    def url_for(self, area, name):
+        return os.path.join(self.url, area, name)
+
+    def _entries(self):
+        for area in self.areas:
+            directory = os.path.join(self.root, area)
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                        if entry.is_dir(follow_symlinks=False):
+                            yield st.st_mtime, _tree_size(entry.path), entry.path
+                        elif entry.is_file(follow_symlinks=False):
+                            yield st.st_mtime, st.st_size, entry.path
+                    except OSError:
+                        continue
+
+    def plan(self, now=None, ttl=None, max_bytes=None):
+        """返回 (待删除的 [(mtime, 大小, 路径)], 保留的文件数, 保留的字节数)，不做任何修改"""
+        now = time.time() if now is None else now
+        ttl = self.ttl if ttl is None else ttl
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        expired = [e for e in entries if now - e[0] > ttl]
+        kept = entries[len(expired):]
+        total = sum(size for _, size, _ in kept)
+        if total > max_bytes:
+            target = max_bytes * 0.9
+            evict = 0
+            while evict < len(kept) and total > target:
+                total -= kept[evict][1]
+                evict += 1
+            expired.extend(kept[:evict])
+            kept = kept[evict:]
+        return expired, len(kept), total
+
+    def collect(self, ttl=None, max_bytes=None, dry_run=False):
+        """立即执行一次垃圾回收，返回统计"""
+        victims, files, total = self.plan(ttl=ttl, max_bytes=max_bytes)
+        removed = freed = 0
+        for _, size, path in victims:
+            if dry_run:
+                removed += 1
+                freed += size
+                continue
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+        if not dry_run:
+            with self._lock:
+                self.removed += removed
+                self.freed_bytes += freed
+        return {'removed': removed, 'freed_bytes': freed, 'files': files, 'bytes': total}
+
+    def sweep(self):
+        """节流的定期清理：距离上次不足 sweep_interval 秒时直接返回"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        try:
+            self.collect()
+        except OSError:
+            logger.exception("media 垃圾回收失败")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'saves': self.saves,
+                'dedup_hits': self.dedup_hits,
+                'removed': self.removed,
+                'freed_bytes': self.freed_bytes,
+            }
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_media_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = MediaStorage(
+                    settings.MEDIA_ROOT,
+                    settings.MEDIA_URL,
+                    areas=getattr(settings, 'MEDIA_STORAGE_AREAS', ('processed', 'temp', 'series', 'pyramids')),
+                    ttl=getattr(settings, 'MEDIA_STORAGE_TTL', 24 * 3600),
+                    max_bytes=getattr(settings, 'MEDIA_STORAGE_MAX_BYTES', 1024 * 1024 * 1024),
+                    sweep_interval=getattr(settings, 'MEDIA_STORAGE_SWEEP_INTERVAL', 300),
+                )
+    return _storage
+
+
+REGISTRY.add_collector(lambda: flatten_stats('media_storage', get_media_storage().stats()))
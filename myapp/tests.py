@@ -1,3 +1,1388 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from PIL import Image
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, generate_uid
+
+from myapp import inference, prefork
+from myapp.benchmarks.inference import _summarize, _time
+from myapp.dicom_index import PIXEL_DATA_TAG, path_hash, plan_scan, read_header, read_headers, walk_files
+from myapp.dicom_render import render, render_volume, resolve_window, window_lut
+from myapp.dicom_utils import (MULTIPART_OVERHEAD, DicomUploadHandler, encode_mask, mask_content_type, mask_extension,
+                               read_upload, upload_too_large)
+from myapp.dicom_volume import DicomVolume, analyze_cement, load_volume
+from myapp.hu_cache import HUCache, rescale_hu
+from myapp.jobs import JobManager
+from myapp.management.commands.memory_report import child_pids, read_smaps
+from myapp.metrics import REGISTRY, MetricsRegistry, flatten_stats, track_endpoint
+from myapp.pyramid import ensure_pyramid, load_meta, pyramid_dir, pyramid_levels, tile_name
+from myapp.result_cache import ResultCache
+from myapp.series import SeriesWriter, generate_series, iter_path_slices, iter_zip_slices
+from myapp.src.home.ubuntu.js import thread_config
+from myapp.src.home.ubuntu.js.batching import BatchScheduler
+from myapp.src.home.ubuntu.js.inference_server import InferenceClient, InferenceServer, _layout, _recv, _send
+from myapp.src.home.ubuntu.js.model_manifest import (add_version, default_version, file_sha256, load_manifest,
+                                                     resolve_path, set_default, write_manifest)
+from myapp.src.home.ubuntu.js.preprocessing import (decode_gray, denormalize_to_uint8, preprocess, preprocess_into,
+                                                    resize_gray, resize_output)
+from myapp.src.home.ubuntu.js.thread_config import load_thread_config, pin_worker, worker_cpus, write_thread_config
+from myapp.src.home.ubuntu.js.tiling import tile_starts, tiled_generate
+from myapp.storage import MediaStorage, content_hash
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.weight_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.weight_path, ignore_errors=True)
+        run_dir = os.path.join(self.weight_path, 'run1')
+        os.makedirs(run_dir)
+        for name in ('G_B2A_model_weights_epoch_200.hdf5', 'G_A2B_model_weights_epoch_200.hdf5'):
+            open(os.path.join(run_dir, name), 'wb').close()
+
+    def test_find_weight_file(self):
+        from myapp.src.home.ubuntu.js.model_registry import find_weight_file
+
+        path = find_weight_file(self.weight_path, 'run1')
+        self.assertEqual(os.path.basename(path), 'G_A2B_model_weights_epoch_200.hdf5')
+        with self.assertRaises(FileNotFoundError):
+            find_weight_file(self.weight_path, 'run2')
+
+    def test_concurrent_first_requests_build_once(self):
+        from myapp.src.home.ubuntu.js.model_registry import ModelRegistry
+
+        registry = ModelRegistry(self.weight_path, 'run1', manifest_path=os.path.join(self.weight_path, 'manifest.json'))
+        generator = object()
+
+        def build(*args):
+            # 建图期间其余线程都已到达
+            time.sleep(0.05)
+            return generator
+
+        with mock.patch.object(ModelRegistry, '_build', side_effect=build) as build_mock:
+            with ThreadPoolExecutor(8) as pool:
+                results = list(pool.map(lambda _: registry.get_generator(), range(8)))
+        self.assertEqual(build_mock.call_count, 1)
+        self.assertTrue(all(result is generator for result in results))
+        self.assertTrue(registry.loaded)
+
+
+class CountingGenerator:
+    """记录每次 predict 的批大小，输出为输入的 2 倍"""
+
+    def __init__(self, error=None):
+        self.batch_sizes = []
+        self.error = error
+
+    def predict(self, batch):
+        self.batch_sizes.append(len(batch))
+        if self.error is not None:
+            raise self.error
+        return batch * 2
+
+
+class BatchSchedulerTests(SimpleTestCase):
+    def _scheduler(self, generator, **options):
+        return BatchScheduler(lambda: generator, input_shape=(4, 4, 1), **options)
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        generator = CountingGenerator()
+        scheduler = self._scheduler(generator, max_batch_size=4, max_wait_ms=500)
+        images = [np.full((4, 4, 1), i, dtype=np.float32) for i in range(4)]
+        futures = [scheduler.submit(image) for image in images]
+        for image, future in zip(images, futures):
+            np.testing.assert_array_equal(future.result(timeout=5), image * 2)
+        self.assertEqual(generator.batch_sizes, [4])
+        stats = scheduler.stats()
+        self.assertEqual((stats['batches'], stats['requests']), (1, 4))
+        self.assertEqual(stats['batch_size_histogram'], {'4': 1})
+
+    def test_batch_size_is_capped(self):
+        generator = CountingGenerator()
+        scheduler = self._scheduler(generator, max_batch_size=2, max_wait_ms=200)
+        futures = [scheduler.submit(np.zeros((4, 4), dtype=np.float32)) for _ in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(sum(generator.batch_sizes), 5)
+        self.assertLessEqual(max(generator.batch_sizes), 2)
+
+    def test_failure_is_delivered_to_every_request(self):
+        scheduler = self._scheduler(CountingGenerator(RuntimeError('boom')), max_batch_size=4, max_wait_ms=200)
+        futures = [scheduler.submit(np.zeros((4, 4, 1), dtype=np.float32)) for _ in range(3)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        # 失败后调度线程继续服务后续请求
+        scheduler.generator_fn = lambda: CountingGenerator()
+        np.testing.assert_array_equal(scheduler.predict(np.ones((4, 4, 1)), timeout=5), np.full((4, 4, 1), 2))
+
+
+class IdentityGenerator:
+    input_shape = (None, None, None, 1)
+
+    def predict(self, batch):
+        return batch.copy()
+
+
+class TiledGenerateTests(SimpleTestCase):
+    def _check(self, shape, **options):
+        image = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+        result = tiled_generate(IdentityGenerator(), image, **options)
+        self.assertEqual(result.shape, shape + (1,))
+        np.testing.assert_allclose(result[:, :, 0], image / 127.5 - 1.0, atol=1e-5)
+
+    def test_tile_starts_cover_the_edge(self):
+        self.assertEqual(tile_starts(100, 128, 96), [0])
+        self.assertEqual(tile_starts(300, 128, 96), [0, 96, 172])
+
+    def test_blend_is_identity_for_overlapping_tiles(self):
+        self._check((300, 420), tile_size=128, overlap=32, batch_size=3)
+
+    def test_blend_is_identity_for_image_smaller_than_tile(self):
+        self._check((100, 60), tile_size=128, overlap=32)
+
+    def test_scratch_dir_accumulator(self):
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch, ignore_errors=True)
+        self._check((256, 300), tile_size=128, overlap=16, scratch_dir=scratch)
+
+    def test_rejects_fixed_size_generator_mismatch(self):
+        generator = IdentityGenerator()
+        generator.input_shape = (None, 512, 512, 1)
+        with self.assertRaises(ValueError):
+            tiled_generate(generator, np.zeros((600, 600), dtype=np.uint8), tile_size=256, overlap=32)
+
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.keys = [f"{i:064x}" for i in range(3)]
+
+    def test_key_depends_on_pixels_and_model_version(self):
+        pixels = np.zeros((4, 4), dtype=np.uint8)
+        key = ResultCache.make_key(pixels, 'v1')
+        self.assertEqual(key, ResultCache.make_key(pixels.copy(), 'v1'))
+        others = {ResultCache.make_key(pixels, 'v2'), ResultCache.make_key(pixels + 1, 'v1'),
+                  ResultCache.make_key(pixels, 'v1', 'preview')}
+        self.assertEqual(len(others), 3)
+        self.assertNotIn(key, others)
+
+    def test_memory_tier_is_lru(self):
+        cache = ResultCache(self.directory, memory_items=2)
+        for key in self.keys:
+            cache.set(key, key.encode())
+        # 第一个键已移出内存，从磁盘读回
+        self.assertEqual(cache.get(self.keys[0]), self.keys[0].encode())
+        self.assertEqual(cache.get(self.keys[2]), self.keys[2].encode())
+        stats = cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['disk_hits'], stats['misses']), (1, 1, 0))
+        self.assertEqual(stats['memory_items'], 2)
+
+    def test_disk_tier_evicts_least_recently_used(self):
+        cache = ResultCache(self.directory, memory_items=1, disk_max_bytes=250)
+        now = time.time()
+        for i, key in enumerate(self.keys[:2]):
+            cache.set(key, b'x' * 100)
+            os.utime(cache._path(key), (now - 100 + i, now - 100 + i))
+        # 300 字节超过上限，淘汰最久未访问的文件直到 225 以下
+        cache.set(self.keys[2], b'x' * 100)
+        self.assertFalse(os.path.exists(cache._path(self.keys[0])))
+        self.assertTrue(os.path.exists(cache._path(self.keys[1])))
+        stats = cache.stats()
+        self.assertEqual((stats['disk_evictions'], stats['disk_bytes']), (1, 200))
+        self.assertIsNone(cache.get(self.keys[0]))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_rewriting_a_key_counts_its_size_once(self):
+        cache = ResultCache(self.directory, memory_items=1, disk_max_bytes=250)
+        cache.set(self.keys[0], b'x' * 10)
+        # 覆盖同一键不应让计数越过上限、触发整目录扫描
+        with mock.patch.object(cache, '_evict_disk', wraps=cache._evict_disk) as evict:
+            for _ in range(5):
+                cache.set(self.keys[1], b'x' * 100)
+        evict.assert_not_called()
+        self.assertEqual(cache.stats()['disk_bytes'], 110)
+
+
+class SavedModelExportTests(SimpleTestCase):
+    def test_exported_signature_matches_keras_model(self):
+        import tensorflow as tf
+        from myapp.src.home.ubuntu.js.export_model import SavedModelGenerator, export_saved_model, parity_check
+
+        inputs = tf.keras.Input((8, 8, 1))
+        model = tf.keras.Model(inputs, tf.keras.layers.Conv2D(1, 3, padding='same', activation='tanh')(inputs))
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir, ignore_errors=True)
+        export_saved_model(model, export_dir, input_shape=(8, 8, 1))
+
+        exported = SavedModelGenerator(export_dir)
+        self.assertEqual(exported.input_shape, (None, 8, 8, 1))
+        batch = np.random.default_rng(0).uniform(-1, 1, (2, 8, 8, 1)).astype(np.float32)
+        self.assertLess(parity_check(model, exported, batch)['max_abs_diff'], 1e-6)
+
+
+class OffsetGenerator:
+    def __init__(self, offset=0.0):
+        self.offset = offset
+
+    def predict(self, batch):
+        return np.clip(batch + self.offset, -1, 1)
+
+
+class QualityGateTests(SimpleTestCase):
+    def setUp(self):
+        self.inputs = np.random.default_rng(0).uniform(-0.5, 0.5, (3, 16, 16, 1)).astype(np.float32)
+
+    def test_identical_outputs_pass(self):
+        from myapp.src.home.ubuntu.js.quantize import quality_gate
+
+        result = quality_gate(OffsetGenerator(), OffsetGenerator(), self.inputs, batch_size=2)
+        self.assertTrue(result['passed'])
+        self.assertAlmostEqual(result['ssim'], 1.0, places=5)
+
+    def test_degraded_outputs_fail(self):
+        from myapp.src.home.ubuntu.js.quantize import quality_gate
+
+        # 在 [0, 1] 上偏移 0.1，PSNR 约 20dB
+        result = quality_gate(OffsetGenerator(), OffsetGenerator(0.2), self.inputs, batch_size=2)
+        self.assertFalse(result['passed'])
+        self.assertLess(result['psnr'], 35.0)
+
+    def test_holdout_is_disjoint_from_calibration(self):
+        from myapp.src.home.ubuntu.js.quantize import split_holdout
+
+        slices = np.arange(10, dtype=np.float32).reshape(10, 1, 1, 1)
+        calibration, evaluation = split_holdout(slices, 0.25)
+        self.assertEqual((len(calibration), len(evaluation)), (8, 2))
+        self.assertFalse(set(calibration.ravel()) & set(evaluation.ravel()))
+        self.assertEqual(sorted(np.concatenate([calibration, evaluation]).ravel()), list(range(10)))
+        with self.assertRaises(ValueError):
+            split_holdout(slices[:1])
+
+
+class ImmediateExecutor:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def submit(self, fn, *args):
+        if self.error is not None:
+            raise self.error
+        self.calls.append(args)
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+class JobManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.job_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.job_dir, ignore_errors=True)
+        self.manager = JobManager(self.job_dir, ttl=600)
+        self.job_id = uuid.uuid4().hex
+
+    def _touch(self, suffix, data=b'', age=0):
+        path = os.path.join(self.job_dir, f"{self.job_id}.{suffix}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def test_submit_marks_job_pending(self):
+        executor = ImmediateExecutor()
+        with mock.patch.object(self.manager, '_get_executor', return_value=executor):
+            job_id = self.manager.submit(b'png', tiled=True)
+        self.assertRegex(job_id, r'^[0-9a-f]{32}$')
+        self.assertEqual(executor.calls[0][:4], (self.job_dir, job_id, b'png', True))
+        self.assertEqual(self.manager.status(job_id), ('pending', None))
+
+    def test_submit_failure_removes_pending_marker(self):
+        with mock.patch.object(self.manager, '_get_executor', return_value=ImmediateExecutor(RuntimeError('pool'))):
+            with self.assertRaises(RuntimeError):
+                self.manager.submit(b'png')
+        self.assertEqual(os.listdir(self.job_dir), [])
+
+    def test_status(self):
+        self.assertEqual(self.manager.status('../etc/passwd'), ('missing', None))
+        self.assertEqual(self.manager.status(self.job_id), ('missing', None))
+        self._touch('pending')
+        self.assertEqual(self.manager.status(self.job_id), ('pending', None))
+        self._touch('error', '解码失败'.encode('utf-8'))
+        self.assertEqual(self.manager.status(self.job_id), ('failed', '解码失败'))
+        result = self._touch('png', b'png')
+        self.assertEqual(self.manager.status(self.job_id), ('done', result))
+
+    def test_sweep_expires_results_and_stale_markers(self):
+        old_result = self._touch('png', age=700)
+        pending = self._touch('pending', age=700)
+        self.manager.sweep()
+        self.assertFalse(os.path.exists(old_result))
+        # pending 标记按 10 倍 TTL 清理
+        self.assertTrue(os.path.exists(pending))
+        os.utime(pending, (time.time() - 6001, time.time() - 6001))
+        self.manager._last_sweep = 0.0
+        self.manager.sweep()
+        self.assertFalse(os.path.exists(pending))
+
+    def test_result_expired_after_status_is_missing(self):
+        from myapp.views import ImageJobStatusView
+
+        # 查询状态之后、读取结果之前被 TTL 清理删除
+        gone = os.path.join(self.job_dir, f"{self.job_id}.png")
+        with mock.patch('myapp.views.get_job_manager') as get_manager:
+            get_manager.return_value.status.return_value = ('done', gone)
+            request = RequestFactory().get(f"/image-jobs/{self.job_id}/")
+            response = ImageJobStatusView.as_view()(request, job_id=self.job_id)
+        self.assertEqual(response.status_code, 404)
+
+
+class InferenceProtocolTests(SimpleTestCase):
+    def test_length_prefixed_json_framing(self):
+        left, right = socket.socketpair()
+        self.addCleanup(right.close)
+        message = {'op': 'generate', 'shm': 'psm_test', 'shape': [2, 3], 'note': '切片'}
+        _send(left, message)
+        _send(left, {'op': 'info'})
+        self.assertEqual(_recv(right), message)
+        self.assertEqual(_recv(right), {'op': 'info'})
+        left.close()
+        with self.assertRaises(ConnectionError):
+            _recv(right)
+
+    def test_shared_memory_layout(self):
+        in_bytes, offset, out_shape, total = _layout((3, 5), tiled=False)
+        self.assertEqual((in_bytes, offset, out_shape), (15, 16, (512, 512, 1)))
+        self.assertEqual(total, 16 + 512 * 512 * 4)
+        self.assertEqual(_layout((2, 3, 5), tiled=False)[2], (2, 512, 512, 1))
+        self.assertEqual(_layout((300, 200), tiled=True)[2], (300, 200, 1))
+
+
+class FakeRegistry:
+    version = 'v1:abc'
+    loaded = True
+    preview_supported = False
+    preview_size = None
+
+    def get_generator(self):
+        return CountingGenerator()
+
+
+class InferenceServerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        socket_path = os.path.join(directory, 'inference.sock')
+        # 客户端与服务端在同一进程时共用 resource_tracker，服务端不再重复注销共享内存
+        patcher = mock.patch('myapp.src.home.ubuntu.js.inference_server.resource_tracker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generator = CountingGenerator()
+        scheduler = BatchScheduler(lambda: self.generator, max_wait_ms=1)
+        server = InferenceServer(socket_path, FakeRegistry(), scheduler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = InferenceClient(socket_path, timeout=10)
+        self.addCleanup(self.client._reset)
+
+    def test_generate_through_shared_memory(self):
+        from myapp.src.home.ubuntu.js.test_image import preprocess_image
+
+        image = np.random.default_rng(0).integers(0, 256, (64, 48), dtype=np.uint8)
+        result = self.client.generate(image)
+        self.assertEqual(result.shape, (512, 512, 1))
+        np.testing.assert_allclose(result, preprocess_image(image) * 2, atol=1e-6)
+        batch = self.client.generate(np.stack([image, image]))
+        self.assertEqual(batch.shape, (2, 512, 512, 1))
+        self.assertEqual(self.client.last_model_version(), 'v1:abc')
+
+    def test_info_and_errors(self):
+        self.assertEqual(self.client.info()['model_version'], 'v1:abc')
+        with self.assertRaises(RuntimeError):
+            self.client.request({'op': 'unknown'})
+
+
+class ServerInfoTests(SimpleTestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.info.return_value = {'ok': True, 'model_version': 'v1:abc', 'preview_supported': True}
+        patcher = mock.patch('myapp.inference.get_inference_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        inference._server_info = (0.0, None)
+        self.addCleanup(setattr, inference, '_server_info', (0.0, None))
+
+    @override_settings(CTA_INFERENCE_INFO_TTL=60)
+    def test_info_reused_within_ttl(self):
+        for _ in range(5):
+            self.assertEqual(inference.model_version(), 'v1:abc')
+            self.assertTrue(inference.preview_supported())
+        self.assertEqual(self.client.info.call_count, 1)
+
+    @override_settings(CTA_INFERENCE_INFO_TTL=0)
+    def test_info_refreshed_after_ttl(self):
+        inference.model_version()
+        time.sleep(0.01)
+        inference.model_version()
+        self.assertEqual(self.client.info.call_count, 2)
+
+    @override_settings(CTA_INFERENCE_INFO_TTL=60)
+    def test_concurrent_refresh_queries_server_once(self):
+        def slow_info():
+            time.sleep(0.05)
+            return {'ok': True, 'model_version': 'v1:abc'}
+
+        self.client.info.side_effect = slow_info
+        with ThreadPoolExecutor(8) as pool:
+            versions = list(pool.map(lambda _: inference.model_version(), range(8)))
+        self.assertEqual(versions, ['v1:abc'] * 8)
+        self.assertEqual(self.client.info.call_count, 1)
+
+    @override_settings(CTA_INFERENCE_INFO_TTL=60)
+    def test_version_in_reply_invalidates_cached_info(self):
+        self.client.generate.return_value = np.zeros((512, 512, 1), dtype=np.float32)
+        self.client.last_model_version.return_value = 'v1:abc'
+        self.assertEqual(inference.model_version(), 'v1:abc')
+        inference.run_generator(np.zeros((8, 8), dtype=np.uint8))
+        self.assertEqual(self.client.info.call_count, 1)
+
+        # 清单已切换到 v2，TTL 内缓存的 info 仍是 v1
+        self.client.last_model_version.return_value = 'v2:def'
+        self.client.info.return_value = {'ok': True, 'model_version': 'v2:def'}
+        inference.run_generator(np.zeros((8, 8), dtype=np.uint8))
+        self.assertEqual(inference.model_version(), 'v2:def')
+        self.assertEqual(self.client.info.call_count, 2)
+
+    def test_result_not_cached_when_model_swapped_during_generation(self):
+        from myapp.views import ImageProcessingView
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        cache = ResultCache(directory)
+        upload = SimpleUploadedFile('slice.png', _png(0), content_type='image/png')
+        request = RequestFactory().post('/process_image/', {'imageUpload': upload})
+        with mock.patch('myapp.views.get_result_cache', return_value=cache), \
+                mock.patch('myapp.views.get_media_storage'), \
+                mock.patch('myapp.views.model_version', side_effect=['v1:abc', 'v2:def']), \
+                mock.patch('myapp.views.run_generator', return_value=np.zeros((512, 512, 1), dtype=np.float32)):
+            response = ImageProcessingView.as_view()(request)
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+        self.assertEqual(cache.stats()['stores'], 0)
+
+
+def _png(value, shape=(8, 8)):
+    buffer = io.BytesIO()
+    Image.fromarray(np.full(shape, value, dtype=np.uint8)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class SeriesTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_zip_slices_in_natural_order(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            for i in (10, 2, 1):
+                zf.writestr(f"series/slice{i}.png", _png(i))
+            zf.writestr('__MACOSX/series/._slice1.png', b'')
+        buffer.seek(0)
+        slices = list(iter_zip_slices(buffer))
+        self.assertEqual([name for name, _ in slices], ['series/slice1.png', 'series/slice2.png', 'series/slice10.png'])
+        self.assertEqual([int(image[0, 0]) for _, image in slices], [1, 2, 10])
+
+    def test_batches_split_on_size_change(self):
+        shapes = []
+
+        def generate_batch(batch):
+            shapes.append(batch.shape)
+            return np.zeros((len(batch), 512, 512, 1), dtype=np.float32)
+
+        slices = [(f"s{i}.png", np.zeros((8, 8), dtype=np.uint8)) for i in range(3)]
+        slices.append(('big.png', np.zeros((16, 16), dtype=np.uint8)))
+        path = os.path.join(self.directory, 'out.zip')
+        with SeriesWriter(path) as writer:
+            self.assertEqual(generate_series(slices, writer, generate_batch, batch_size=2), 4)
+        self.assertEqual(shapes, [(2, 8, 8), (1, 8, 8), (1, 16, 16)])
+        with zipfile.ZipFile(path) as zf:
+            self.assertEqual(zf.namelist(), ['0001_s0.png', '0002_s1.png', '0003_s2.png', '0004_big.png'])
+            output = np.asarray(Image.open(io.BytesIO(zf.read('0004_big.png'))))
+        self.assertEqual(output.shape, (512, 512))
+        self.assertTrue((output == 127).all())
+
+    def _write_series(self, directory, names, values=None):
+        os.makedirs(directory, exist_ok=True)
+        for i, name in enumerate(names):
+            pixels = np.full((4, 4), (values or [0] * len(names))[i], dtype=np.int16)
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(_dicom_bytes(pixels, intercept=-1024, z=float(i)))
+
+    def test_extensionless_dicom_detected_by_content(self):
+        directory = os.path.join(self.directory, 'pacs')
+        self._write_series(directory, ['IM000002', 'IM000001', 'slice.dcm'])
+        with open(os.path.join(directory, 'DICOMDIR'), 'wb') as f:
+            f.write(b'\0' * 132)
+        with open(os.path.join(directory, 'README'), 'w') as f:
+            f.write('not a slice')
+        # 按 ImagePositionPatient 排序
+        self.assertEqual([name for name, _ in iter_path_slices(directory)], ['IM000002', 'IM000001', 'slice.dcm'])
+
+    def test_series_without_slices_is_rejected(self):
+        directory = os.path.join(self.directory, 'empty')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'README'), 'w') as f:
+            f.write('not a slice')
+        with self.assertRaises(ValueError):
+            list(iter_path_slices(directory))
+
+    def test_whole_series_uses_one_window(self):
+        # HU: -1024 / 0 / 1000；软组织窗 (400, 40) 下分别为 0 / 102 / 255，与单张切片的最值无关
+        directory = os.path.join(self.directory, 'window')
+        self._write_series(directory, ['a.dcm', 'b.dcm', 'c.dcm'], [0, 1024, 2024])
+        values = [int(image[0, 0]) for _, image in iter_path_slices(directory)]
+        self.assertEqual(values, [0, 102, 255])
+
+
+class PreprocessingTests(SimpleTestCase):
+    def test_preprocess_maps_to_unit_range(self):
+        image = np.array([[0, 255], [51, 204]], dtype=np.uint8)
+        out = preprocess(image, (2, 2))
+        self.assertEqual((out.shape, out.dtype), ((2, 2, 1), np.float32))
+        np.testing.assert_allclose(out[:, :, 0], image / 127.5 - 1.0, atol=1e-6)
+
+    def test_preprocess_into_writes_one_batch_slot(self):
+        batch = np.zeros((2, 512, 512, 1), dtype=np.float32)
+        preprocess_into(np.full((100, 80), 255, dtype=np.uint8), batch[1])
+        self.assertTrue((batch[0] == 0).all())
+        np.testing.assert_allclose(batch[1], 1.0)
+
+    def test_float_input_in_unit_range(self):
+        out = preprocess(np.full((4, 4), 1.0), (4, 4))
+        np.testing.assert_allclose(out, 1.0)
+
+    def test_resize_skipped_at_target_size(self):
+        image = np.zeros((512, 512), dtype=np.uint8)
+        self.assertIs(resize_gray(image), image)
+
+    def test_decode_gray_converts_color(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (3, 2), (255, 255, 255)).save(buffer, format='PNG')
+        buffer.seek(0)
+        image = decode_gray(buffer)
+        self.assertEqual((image.shape, image.dtype), ((2, 3), np.uint8))
+        self.assertTrue((image == 255).all())
+
+    def test_denormalize_matches_previous_formula(self):
+        output = np.linspace(-1, 1, 1001, dtype=np.float32).reshape(1001, 1, 1)
+        expected = (output[:, :, 0] * 127.5 + 127.5).astype(np.uint8)
+        np.testing.assert_array_equal(denormalize_to_uint8(output), expected)
+
+
+class InferenceBenchmarkTests(SimpleTestCase):
+    def test_summary_percentiles_and_throughput(self):
+        summary = _summarize(np.arange(1, 101, dtype=np.float64), {'peak_rss_mb': 300.0, 'rss_delta_mb': 20.0}, 4)
+        self.assertEqual(summary['p50_ms'], 50.5)
+        self.assertAlmostEqual(summary['p99_ms'], 99.01)
+        self.assertAlmostEqual(summary['images_per_s'], 4 * 1000.0 / 50.5)
+        self.assertEqual((summary['peak_rss_mb'], summary['rss_delta_mb']), (300.0, 20.0))
+
+    def test_peak_rss_is_measured_per_stage(self):
+        def allocate():
+            np.ones(64 * 1024 * 1024 // 8).sum()
+
+        _, large = _time(allocate, repeats=2, warmup=0)
+        _, small = _time(lambda: None, repeats=2, warmup=0)
+        # 进程峰值 ru_maxrss 会让后一个阶段沿用前一个阶段的峰值；按阶段重置后小阶段的增量接近 0
+        self.assertGreater(large['rss_delta_mb'], 32)
+        self.assertLess(small['rss_delta_mb'], 16)
+        self.assertLess(small['peak_rss_mb'], large['peak_rss_mb'])
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('test_seconds', '测试', ('stage',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, stage='predict')
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE test_seconds histogram', lines)
+        self.assertIn('test_seconds_bucket{stage="predict",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="predict",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="predict",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{stage="predict"} 3', lines)
+
+    def test_labels_and_types_are_checked(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('test_requests', '测试', ('endpoint',))
+        with self.assertRaises(ValueError):
+            counter.inc(status='200')
+        with self.assertRaises(ValueError):
+            registry.gauge('test_requests', '测试')
+        self.assertIs(registry.counter('test_requests', '测试', ('endpoint',)), counter)
+
+    def test_collectors_are_flattened_and_failures_reported(self):
+        registry = MetricsRegistry()
+        registry.add_collector(lambda: flatten_stats('cache', {'hits': 3, 'loaded': True, 'tier': {'bytes': 10},
+                                                               'name': 'ignored'}))
+
+        def broken():
+            raise RuntimeError('boom')
+
+        registry.add_collector(broken)
+        lines = registry.render().splitlines()
+        self.assertIn('cache_hits 3', lines)
+        self.assertIn('cache_loaded 1', lines)
+        self.assertIn('cache_tier_bytes 10', lines)
+        self.assertFalse(any(line.startswith('cache_name') for line in lines))
+        self.assertTrue(any(line.startswith('# collector broken') for line in lines))
+
+    def test_track_endpoint_records_status(self):
+        @track_endpoint('unit_test')
+        def view():
+            return HttpResponse(status=201)
+
+        @track_endpoint('unit_test')
+        def failing():
+            raise RuntimeError('boom')
+
+        view()
+        with self.assertRaises(RuntimeError):
+            failing()
+        lines = REGISTRY.render().splitlines()
+        self.assertIn('cta_http_requests_total{endpoint="unit_test",status="201"} 1', lines)
+        self.assertIn('cta_http_requests_total{endpoint="unit_test",status="error"} 1', lines)
+        self.assertIn('cta_http_requests_in_flight{endpoint="unit_test"} 0', lines)
+
+    def test_metrics_endpoint_is_local_only(self):
+        from myapp.views import MetricsView
+
+        factory = RequestFactory()
+        self.assertEqual(MetricsView.as_view()(factory.get('/metrics/', REMOTE_ADDR='10.0.0.8')).status_code, 403)
+        response = MetricsView.as_view()(factory.get('/metrics/', REMOTE_ADDR='127.0.0.1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE cta_stage_duration_seconds histogram', response.content)
+
+
+class ManifestTestMixin:
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self.weights = []
+        for i in range(2):
+            path = os.path.join(self.directory, 'run', f"G_A2B_epoch_{i}.hdf5")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(f"weights {i}".encode())
+            self.weights.append(path)
+
+
+class ModelManifestTests(ManifestTestMixin, SimpleTestCase):
+
+    def test_first_version_becomes_default(self):
+        manifest = load_manifest(self.manifest_path)
+        self.assertEqual(manifest, {'versions': {}})
+        entry = add_version(manifest, 'v1', self.weights[0], (512, 512, 1), manifest_path=self.manifest_path)
+        add_version(manifest, 'v2', self.weights[1], (512, 512, 1), manifest_path=self.manifest_path)
+        self.assertEqual(entry['path'], 'run/G_A2B_epoch_0.hdf5')
+        self.assertEqual(entry['sha256'], file_sha256(self.weights[0]))
+        self.assertEqual(default_version(manifest)[0], 'v1')
+
+        write_manifest(manifest, self.manifest_path)
+        loaded = load_manifest(self.manifest_path)
+        self.assertEqual(loaded, manifest)
+        self.assertEqual(resolve_path(loaded['versions']['v2'], self.manifest_path), self.weights[1])
+        self.assertEqual([n for n in os.listdir(self.directory) if n.endswith('.tmp')], [])
+
+    def test_set_default_is_exclusive(self):
+        manifest = load_manifest(self.manifest_path)
+        for i, path in enumerate(self.weights):
+            add_version(manifest, f"v{i + 1}", path, (512, 512, 1), manifest_path=self.manifest_path)
+        set_default(manifest, 'v2')
+        self.assertEqual([name for name, e in manifest['versions'].items() if e['default']], ['v2'])
+        with self.assertRaises(KeyError):
+            set_default(manifest, 'v3')
+
+    def test_rejects_unknown_backend_and_missing_file(self):
+        manifest = load_manifest(self.manifest_path)
+        with self.assertRaises(ValueError):
+            add_version(manifest, 'v1', self.weights[0], (512, 512, 1), backend='onnx',
+                        manifest_path=self.manifest_path)
+        with self.assertRaises(FileNotFoundError):
+            add_version(manifest, 'v1', os.path.join(self.directory, 'missing.hdf5'), (512, 512, 1),
+                        manifest_path=self.manifest_path)
+
+
+class ModelHotSwapTests(ManifestTestMixin, SimpleTestCase):
+    """清单默认版本变化后后台加载新版本并原子切换；回滚到仍常驻的旧版本不重新建图"""
+
+    def setUp(self):
+        super().setUp()
+        self.manifest = load_manifest(self.manifest_path)
+        for i, path in enumerate(self.weights):
+            add_version(self.manifest, f"v{i + 1}", path, (512, 512, 1), manifest_path=self.manifest_path)
+        self._publish()
+
+    def _publish(self):
+        write_manifest(self.manifest, self.manifest_path)
+        # 两次写入的大小相同时，保证 mtime 也不同
+        self.mtime_ns = getattr(self, 'mtime_ns', time.time_ns()) + 10 ** 9
+        os.utime(self.manifest_path, ns=(self.mtime_ns, self.mtime_ns))
+
+    def _registry(self):
+        from myapp.src.home.ubuntu.js.model_registry import ModelRegistry
+
+        registry = ModelRegistry(manifest_path=self.manifest_path, poll_interval=0)
+        patcher = mock.patch.object(ModelRegistry, '_build', side_effect=lambda backend, path, shape: path)
+        self.build = patcher.start()
+        self.addCleanup(patcher.stop)
+        return registry
+
+    def _wait_for(self, registry, name):
+        deadline = time.monotonic() + 5
+        while registry.active_version != name and time.monotonic() < deadline:
+            registry.get_generator()
+            time.sleep(0.01)
+        self.assertEqual(registry.active_version, name)
+
+    def test_swap_and_rollback(self):
+        registry = self._registry()
+        self.assertEqual(registry.get_generator(), self.weights[0])
+        self.assertTrue(registry.version.startswith('v1:'))
+
+        set_default(self.manifest, 'v2')
+        self._publish()
+        self._wait_for(registry, 'v2')
+        self.assertEqual(registry.get_generator(), self.weights[1])
+        self.assertEqual(registry.resident_versions(), ['v1', 'v2'])
+
+        set_default(self.manifest, 'v1')
+        self._publish()
+        self._wait_for(registry, 'v1')
+        self.assertEqual(self.build.call_count, 2)
+
+    def test_checksum_mismatch_keeps_serving_current_version(self):
+        registry = self._registry()
+        registry.get_generator()
+        with open(self.weights[1], 'ab') as f:
+            f.write(b'corrupted')
+        set_default(self.manifest, 'v2')
+        self._publish()
+        registry.get_generator()
+        deadline = time.monotonic() + 5
+        while registry._pending is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(registry.active_version, 'v1')
+        self.assertEqual(registry.get_generator(), self.weights[0])
+
+
+class MemoryReportTests(SimpleTestCase):
+    def test_read_smaps_of_current_process(self):
+        report = read_smaps(os.getpid())
+        self.assertEqual(report['pid'], os.getpid())
+        self.assertGreater(report['rss_mb'], 0)
+        self.assertLessEqual(report['uss_mb'], report['rss_mb'])
+        self.assertLessEqual(report['pss_mb'], report['rss_mb'])
+
+    def test_child_pids(self):
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+        self.assertIn(child.pid, child_pids(os.getpid()))
+
+    def test_command_saves_and_compares(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        saved = os.path.join(directory, 'before.json')
+        call_command('memory_report', '--pids', str(os.getpid()), '--save', saved, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('memory_report', '--pids', str(os.getpid()), '--compare', saved, '--budget-mb', '100000',
+                     stdout=out)
+        self.assertIn('worker 平均 USS', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('memory_report', stdout=io.StringIO())
+
+
+@mock.patch('myapp.prefork.gc')
+class PreforkTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.weights = os.path.join(self.directory, 'G_A2B_model_weights_epoch_200.hdf5')
+        with open(self.weights, 'wb') as f:
+            f.write(b'x' * 4096)
+
+    def test_master_prefetches_weights_and_freezes_gc(self, gc):
+        registry = mock.Mock()
+        registry.resolve_artifact.return_value = ('keras', self.weights)
+        with mock.patch('myapp.inference.get_inference_client', return_value=None), \
+                mock.patch('myapp.inference.get_local_registry', return_value=registry), \
+                mock.patch('myapp.prefork.os.posix_fadvise') as fadvise:
+            self.assertIs(prefork.preload_for_fork(), registry)
+        self.assertEqual(fadvise.call_args[0][1:], (0, 4096, os.POSIX_FADV_WILLNEED))
+        gc.freeze.assert_called_once_with()
+        # master 中不建图：权重由每个 worker 在 fork 之后各自加载
+        registry.get_generator.assert_not_called()
+        registry.load.assert_not_called()
+
+    def test_missing_weights_still_freeze(self, gc):
+        registry = mock.Mock()
+        registry.resolve_artifact.side_effect = FileNotFoundError(self.weights)
+        with mock.patch('myapp.inference.get_inference_client', return_value=None), \
+                mock.patch('myapp.inference.get_local_registry', return_value=registry):
+            prefork.preload_for_fork()
+        gc.freeze.assert_called_once_with()
+
+    def test_prefetch_walks_saved_model_directory(self, gc):
+        os.makedirs(os.path.join(self.directory, 'variables'))
+        open(os.path.join(self.directory, 'variables', 'empty'), 'wb').close()
+        with mock.patch('myapp.prefork.os.posix_fadvise') as fadvise:
+            prefork._prefetch_artifact(self.directory)
+        # 空文件跳过
+        self.assertEqual(fadvise.call_count, 1)
+
+
+class ReflectionPaddingConvTests(SimpleTestCase):
+    """融合层与 tf.pad(REFLECT) + VALID 卷积逐元素一致，且能直接加载未融合结构保存的权重"""
+
+    def _reference(self, x, kernel, pad):
+        import tensorflow as tf
+
+        padded = tf.pad(x, [[0, 0], [pad, pad], [pad, pad], [0, 0]], 'REFLECT')
+        return tf.nn.conv2d(padded, kernel, strides=1, padding='VALID').numpy()
+
+    def test_matches_pad_then_valid_conv(self):
+        from myapp.src.home.ubuntu.js.helper_funcs import reflect_pad_conv2d
+
+        rng = np.random.default_rng(0)
+        for kernel_size in (3, 7):
+            pad = kernel_size // 2
+            for height, width in ((6, 6), (9, 7), (32, 20)):
+                x = rng.standard_normal((2, height, width, 3)).astype(np.float32)
+                kernel = rng.standard_normal((kernel_size, kernel_size, 3, 4)).astype(np.float32)
+                fused = reflect_pad_conv2d(x, kernel, pad, pad).numpy()
+                np.testing.assert_allclose(fused, self._reference(x, kernel, pad), rtol=0, atol=1e-4,
+                                           err_msg=f"k={kernel_size} {height}x{width}")
+
+    def test_strided_layer_falls_back_to_pad_and_conv(self):
+        import tensorflow as tf
+        from myapp.src.home.ubuntu.js.helper_funcs import ReflectionPaddingConv2D
+
+        x = np.random.default_rng(1).standard_normal((1, 9, 7, 2)).astype(np.float32)
+        layer = ReflectionPaddingConv2D(3, 3, reflect_padding=(1, 1), strides=2, use_bias=False)
+        output = layer(x).numpy()
+        expected = tf.nn.conv2d(tf.pad(x, [[0, 0], [1, 1], [1, 1], [0, 0]], 'REFLECT'), layer.kernel,
+                                strides=2, padding='VALID').numpy()
+        np.testing.assert_allclose(output, expected, rtol=0, atol=1e-5)
+        self.assertEqual(tuple(layer.compute_output_shape((None, 9, 7, 2))), (None, 5, 4, 3))
+
+    def test_fusion_is_off_by_default(self):
+        from myapp.src.home.ubuntu.js.test_image import opt
+
+        self.assertFalse(opt['fuse_reflection_conv'])
+
+    def test_unfused_checkpoint_loads_into_fused_generator(self):
+        from tensorflow_addons.layers import InstanceNormalization
+        from myapp.src.home.ubuntu.js.test_image import build_generator, opt
+
+        model = {'normalization': InstanceNormalization}
+        options = dict(opt, img_shape=(32, 32, 1))
+        unfused = build_generator(model, dict(options, fuse_reflection_conv=False), name='unfused')
+        fused = build_generator(model, dict(options, fuse_reflection_conv=True), name='fused')
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        checkpoint = os.path.join(directory, 'G_A2B_model_weights_epoch_1.hdf5')
+        unfused.save_weights(checkpoint)
+        fused.load_weights(checkpoint)
+
+        x = np.random.default_rng(2).uniform(-1, 1, (2, 32, 32, 1)).astype(np.float32)
+        np.testing.assert_allclose(fused.predict(x), unfused.predict(x), rtol=0, atol=1e-6)
+
+
+class PreviewTests(SimpleTestCase):
+    def test_resize_output_upsamples_to_full_size(self):
+        output = np.full((256, 256, 1), 0.25, dtype=np.float32)
+        resized = resize_output(output)
+        self.assertEqual((resized.shape, resized.dtype), ((512, 512, 1), np.float32))
+        np.testing.assert_allclose(resized, 0.25, atol=1e-6)
+        full = np.zeros((512, 512, 1), dtype=np.float32)
+        self.assertIs(resize_output(full), full)
+
+    def test_generate_preview_runs_at_reduced_size(self):
+        from myapp.src.home.ubuntu.js.test_image import generate_preview, supports_dynamic_input
+
+        generator = CountingGenerator()
+        generator.input_shape = (None, None, None, 1)
+        self.assertTrue(supports_dynamic_input(generator))
+        result = generate_preview(np.full((600, 600), 255, dtype=np.uint8), generator, size=128)
+        self.assertEqual(result.shape, (512, 512, 1))
+        np.testing.assert_allclose(result, 2.0, atol=1e-5)
+        generator.input_shape = (None, 512, 512, 1)
+        self.assertFalse(supports_dynamic_input(generator))
+
+    def test_client_rejects_preview_batches(self):
+        client = InferenceClient('/nonexistent.sock')
+        with self.assertRaises(ValueError):
+            client.generate(np.zeros((2, 8, 8), dtype=np.uint8), preview=True)
+
+
+class ThreadConfigTests(SimpleTestCase):
+    def test_worker_cpus_partition_and_wrap(self):
+        cpus = range(8)
+        self.assertEqual(worker_cpus(0, 2, cpus), {0, 1})
+        self.assertEqual(worker_cpus(3, 2, cpus), {6, 7})
+        self.assertEqual(worker_cpus(4, 2, cpus), {0, 1})
+        self.assertEqual(worker_cpus(1, 3, cpus), {3, 4, 5})
+        self.assertEqual(worker_cpus(0, 16, cpus), set(cpus))
+
+    def test_pin_worker_requires_affinity(self):
+        self.assertIsNone(pin_worker(0, None))
+        self.assertIsNone(pin_worker(0, {'intra_op_threads': 2, 'affinity': False}))
+
+    def test_config_roundtrip_and_applied_once(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'cache', 'thread_config.json')
+        config = {'intra_op_threads': 2, 'inter_op_threads': 1, 'workers': 4, 'affinity': True}
+        self.assertIsNone(load_thread_config(path))
+        write_thread_config(config, path)
+        self.assertEqual(load_thread_config(path), config)
+
+        with mock.patch.object(thread_config, '_configured', False), \
+                mock.patch.object(thread_config, '_applied', None), \
+                mock.patch.object(thread_config, 'apply_thread_config', side_effect=lambda c: c) as apply:
+            self.assertEqual(thread_config.configure_threads(path), config)
+            self.assertEqual(thread_config.configure_threads(path), config)
+        apply.assert_called_once_with(config)
+
+
+def _dicom_bytes(pixels, slope=1, intercept=0, z=None, instance=None):
+    """最小的 CT 图像 DICOM（Explicit VR Little Endian，带 128 字节前导和 DICM 标记）"""
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CTImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(None, {}, file_meta=meta, preamble=b'\0' * 128, is_implicit_VR=False, is_little_endian=True)
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.SeriesInstanceUID = '1.2.826.0.1.3680043.8.498.1'
+    ds.Modality = 'CT'
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = 'MONOCHROME2'
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = int(pixels.dtype == np.int16)
+    ds.RescaleSlope = slope
+    ds.RescaleIntercept = intercept
+    ds.PixelSpacing = [0.5, 0.5]
+    ds.SliceThickness = 1
+    if z is not None:
+        ds.ImagePositionPatient = [0, 0, z]
+    if instance is not None:
+        ds.InstanceNumber = instance
+    ds.PixelData = np.ascontiguousarray(pixels).tobytes()
+    buffer = io.BytesIO()
+    ds.save_as(buffer)
+    return buffer.getvalue()
+
+
+class DicomUploadHandlerTests(SimpleTestCase):
+    def _receive(self, handler, data, chunk_size):
+        handler.new_file('dicom_file', 'slice.dcm', 'application/dicom', len(data))
+        for start in range(0, len(data), chunk_size):
+            handler.receive_data_chunk(data[start:start + chunk_size], start)
+        return handler.file_complete(len(data))
+
+    def test_upload_parsed_from_memory(self):
+        data = _dicom_bytes(np.arange(16, dtype=np.int16).reshape(4, 4))
+        uploaded = self._receive(DicomUploadHandler(max_size=len(data)), data, 100)
+        self.assertIsInstance(uploaded, InMemoryUploadedFile)
+        np.testing.assert_array_equal(read_upload(uploaded).pixel_array, np.arange(16).reshape(4, 4))
+
+    def test_oversized_upload_stops_parsing(self):
+        handler = DicomUploadHandler(max_size=10)
+        with self.assertRaises(StopUpload):
+            self._receive(handler, b'x' * 11, 4)
+        self.assertTrue(handler.too_large)
+        self.assertTrue(handler.file.closed)
+
+    def test_content_length_checked_before_reading_body(self):
+        request = RequestFactory().post('/process-dicom/', data=b'', content_type='application/octet-stream')
+        limit = 1024 * 1024
+        for content_length, expected in ((limit + MULTIPART_OVERHEAD + 1, True), (limit, False), ('abc', False)):
+            request.META['CONTENT_LENGTH'] = str(content_length)
+            self.assertEqual(upload_too_large(request, limit), expected)
+
+
+class MaskEncodingTests(SimpleTestCase):
+    def setUp(self):
+        # 宽度不是 8 的倍数，覆盖按行补齐字节的情况
+        self.mask = np.where(np.random.default_rng(0).random((37, 45)) > 0.5, 255, 0).astype(np.uint8)
+
+    def _decode(self, data):
+        return Image.open(io.BytesIO(data))
+
+    def test_one_bit_png(self):
+        image = self._decode(encode_mask(self.mask, 'png', bits=1))
+        self.assertEqual((image.mode, image.size), ('1', (45, 37)))
+        np.testing.assert_array_equal(np.asarray(image.convert('L')), self.mask)
+
+    def test_eight_bit_png(self):
+        image = self._decode(encode_mask(self.mask > 0, 'png', bits=8))
+        self.assertEqual(image.mode, 'L')
+        np.testing.assert_array_equal(np.asarray(image), self.mask)
+
+    def test_lossless_webp(self):
+        image = self._decode(encode_mask(self.mask, 'webp'))
+        self.assertEqual(image.format, 'WEBP')
+        np.testing.assert_array_equal(np.asarray(image.convert('L')), self.mask)
+        self.assertEqual((mask_extension('webp'), mask_content_type('webp')), ('.webp', 'image/webp'))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            encode_mask(self.mask, 'jpeg')
+
+
+class RescaleHUTests(SimpleTestCase):
+    def _dataset(self, pixels, slope, intercept):
+        return SimpleNamespace(pixel_array=pixels, RescaleSlope=slope, RescaleIntercept=intercept)
+
+    def test_uint16_above_int16_range_wraps_back(self):
+        # 40000 转 int16 时溢出为负数，加上截距后按模 2^16 回到正确的 HU
+        pixels = np.array([[0, 32768, 40000, 65535]], dtype=np.uint16)
+        hu = rescale_hu(self._dataset(pixels, 1, -32768))
+        self.assertEqual(hu.dtype, np.int16)
+        np.testing.assert_array_equal(hu, pixels.astype(np.int64) - 32768)
+
+    def test_integer_slope(self):
+        pixels = np.array([[0, 1000, 2000]], dtype=np.uint16)
+        hu = rescale_hu(self._dataset(pixels, 2, -1024))
+        self.assertEqual(hu.dtype, np.int16)
+        np.testing.assert_array_equal(hu, pixels.astype(np.int64) * 2 - 1024)
+
+    def test_out_of_range_falls_back_to_float(self):
+        pixels = np.array([[0, 60000]], dtype=np.uint16)
+        hu = rescale_hu(self._dataset(pixels, 1, -1024))
+        self.assertEqual(hu.dtype, np.float32)
+        np.testing.assert_array_equal(hu, [[-1024, 58976]])
+
+    def test_fractional_rescale_uses_float(self):
+        pixels = np.array([[0, 100]], dtype=np.int16)
+        hu = rescale_hu(self._dataset(pixels, 0.5, -1024))
+        self.assertEqual(hu.dtype, np.float32)
+        np.testing.assert_allclose(hu, [[-1024, -974]])
+
+
+class HUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = HUCache(max_bytes=300)
+        a, b, c = (cache.put(np.zeros(100, dtype=np.uint8)) for _ in range(3))
+        cache.get(a)
+        # 超出 300 字节，淘汰最久未使用的 b
+        d = cache.put(np.zeros(100, dtype=np.uint8))
+        self.assertIsNone(cache.get(b))
+        for token in (a, c, d):
+            self.assertIsNotNone(cache.get(token))
+        stats = cache.stats()
+        self.assertEqual((stats['items'], stats['bytes'], stats['evictions'], stats['misses']), (3, 300, 1, 1))
+
+    def test_oversized_array_is_not_cached(self):
+        cache = HUCache(max_bytes=300)
+        self.assertIsNone(cache.put(np.zeros(301, dtype=np.uint8)))
+        self.assertEqual(cache.stats()['items'], 0)
+
+    def test_cached_arrays_are_read_only(self):
+        cache = HUCache()
+        hu = cache.get(cache.put(np.zeros(4, dtype=np.int16)))
+        with self.assertRaises(ValueError):
+            hu[0] = 1
+
+
+class CementAnalysisTests(SimpleTestCase):
+    def setUp(self):
+        # 4 张 6x6 切片，层间距 2mm、像素 0.5mm，体素 0.5mm³；文件名顺序与空间位置不一致
+        self.hu = np.zeros((4, 6, 6), dtype=np.int16)
+        self.hu[0:2, 1:3, 1:3] = 1000
+        self.hu[3, 4, 4] = 1000
+        slopes = [1, 2, 1, 1]
+        self.sources = []
+        for i, name in ((2, 'c.dcm'), (0, 'a.dcm'), (3, 'd.dcm'), (1, 'b.dcm')):
+            # 第 1 张切片使用 RescaleSlope=2，阈值要换算到各自的原始像素值空间
+            raw = ((self.hu[i].astype(np.int32) + 1024) // slopes[i]).astype(np.int16)
+            data = _dicom_bytes(raw, slope=slopes[i], intercept=-1024, z=2.0 * i)
+            self.sources.append((name, (lambda data=data: io.BytesIO(data))))
+
+    def test_load_volume_sorts_by_position(self):
+        volume = load_volume(self.sources)
+        self.assertEqual(volume.names, ['a.dcm', 'b.dcm', 'c.dcm', 'd.dcm'])
+        self.assertEqual(volume.spacing, (2.0, 0.5, 0.5))
+        np.testing.assert_array_equal(volume.threshold(650), self.hu > 650)
+
+    def test_components_by_volume(self):
+        report = analyze_cement(load_volume(self.sources), threshold=650)
+        self.assertEqual(report['component_count'], 2)
+        self.assertEqual(report['total_voxels'], 9)
+        largest, smallest = report['components']
+        self.assertEqual((largest['voxels'], largest['volume_mm3']), (8, 4.0))
+        self.assertEqual(largest['bbox'], {'slice': [0, 1], 'row': [1, 2], 'column': [1, 2]})
+        self.assertEqual(largest['slice_extent'], ['a.dcm', 'b.dcm'])
+        self.assertEqual(smallest['voxels'], 1)
+        self.assertEqual(analyze_cement(load_volume(self.sources), 650, min_volume_mm3=1.0)['component_count'], 1)
+
+
+class DicomIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.slice_path = os.path.join(self.root, 'study', 'IM0001')
+        self.notes_path = os.path.join(self.root, 'notes.txt')
+        os.makedirs(os.path.join(self.root, 'study', '.cache'))
+        with open(self.slice_path, 'wb') as f:
+            f.write(_dicom_bytes(np.zeros((4, 6), dtype=np.int16), intercept=-1024, z=1.5, instance=7))
+        for path in (self.notes_path, os.path.join(self.root, '.DS_Store'),
+                     os.path.join(self.root, 'study', '.cache', 'IM0001')):
+            with open(path, 'w') as f:
+                f.write('not dicom')
+
+    def test_read_header_without_pixels(self):
+        header = read_header(self.slice_path)
+        self.assertEqual((header['rows'], header['columns']), (4, 6))
+        self.assertEqual((header['instance_number'], header['slice_position']), (7, 1.5))
+        self.assertEqual((header['modality'], header['rescale_intercept']), ('CT', -1024.0))
+        with open(self.slice_path, 'rb') as f:
+            f.seek(header['pixel_offset'])
+            self.assertEqual(f.read(4), PIXEL_DATA_TAG)
+        self.assertIsNone(read_header(self.notes_path))
+
+    def test_walk_skips_hidden_files(self):
+        self.assertEqual(sorted(path for path, _, _ in walk_files([self.root])), [self.notes_path, self.slice_path])
+
+    def test_plan_scan_reads_only_changed_files(self):
+        changed, removed = plan_scan(walk_files([self.root]), {})
+        self.assertEqual(sorted(path for path, _, _, _ in changed), [self.notes_path, self.slice_path])
+        self.assertEqual(removed, set())
+
+        known = {key: (size, mtime) for _, key, size, mtime in changed}
+        known[path_hash('/gone/IM0001')] = (1, 1.0)
+        mtime = os.path.getmtime(self.slice_path) + 10
+        os.utime(self.slice_path, (mtime, mtime))
+        changed, removed = plan_scan(walk_files([self.root]), known)
+        self.assertEqual([path for path, _, _, _ in changed], [self.slice_path])
+        self.assertEqual(removed, {path_hash('/gone/IM0001')})
+        self.assertEqual(dict(read_headers([self.slice_path, self.notes_path], workers=1))[self.notes_path], None)
+
+
+class WindowLutTests(SimpleTestCase):
+    def test_negative_int16_values(self):
+        pixels = np.array([-2048, -1024, -161, -1, 0, 40, 239, 240, 2000], dtype=np.int16)
+        lut = window_lut(400.0, 40.0, 1.0, 0.0, True)
+        # 负值按 uint16 位模式落在表的后半段
+        self.assertEqual(lut[np.uint16(65535)], lut[pixels.view(np.uint16)[3]])
+        expected = np.rint(np.clip((pixels.astype(np.float64) + 160) * (255.0 / 400), 0, 255)).astype(np.uint8)
+        np.testing.assert_array_equal(render(pixels, 400, 40), expected)
+        self.assertEqual(render(pixels, 400, 40)[0], 0)
+        self.assertEqual(render(pixels, 400, 40)[-1], 255)
+
+    def test_rescale_applied_through_lut(self):
+        stored = np.array([[0, 984, 1024, 1064, 4095]], dtype=np.int16)
+        expected = render(stored.astype(np.float64), 1800, 400, 1, -1024)
+        np.testing.assert_array_equal(render(stored, 1800, 400, 1, -1024), expected)
+        np.testing.assert_array_equal(render(stored.astype(np.uint16), 1800, 400, 1, -1024), expected)
+
+    def test_volume_groups_slices_by_rescale(self):
+        voxels = np.arange(-600, 600, 25, dtype=np.int16)[:48].reshape(3, 4, 4)
+        volume = DicomVolume(voxels, np.array([1.0, 1.0, 2.0]), np.array([0.0, 0.0, -100.0]), (1, 1, 1), ['a', 'b', 'c'])
+        expected = np.stack([render(voxels[i], 400, 40, volume.slopes[i], volume.intercepts[i]) for i in range(3)])
+        np.testing.assert_array_equal(render_volume(volume, 'soft_tissue'), expected)
+
+    def test_resolve_window_rejects_invalid_values(self):
+        for window, level in ((float('nan'), 40), (float('inf'), 40), (400, float('nan')), (0, 40), (-1, 40)):
+            with self.assertRaises(ValueError):
+                resolve_window(None, window, level)
+        with self.assertRaises(ValueError):
+            resolve_window('brain')
+        self.assertEqual(resolve_window('bone'), (1800, 400))
+
+    def test_preview_rejects_non_finite_window(self):
+        from myapp.views import DicomPreviewView
+
+        for query in ('window=nan&level=40', 'window=400&level=inf', 'window=0&level=40'):
+            request = RequestFactory().get(f"/process-dicom/preview/?{query}&token=x")
+            self.assertEqual(DicomPreviewView.as_view()(request).status_code, 400)
+
+
+def _write(path, size, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+class MediaStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        # 测试中不触发写入时的自动清理
+        self.storage = MediaStorage(self.root, '/media/', ttl=3600, max_bytes=10 ** 9, sweep_interval=10 ** 9)
+        self.now = time.time()
+
+    def _pyramid(self, key, sizes, mtime):
+        directory = os.path.join(self.root, 'pyramids', key)
+        for i, size in enumerate(sizes):
+            _write(os.path.join(directory, '0', f"{i}_0.png"), size, mtime)
+        os.utime(directory, (mtime, mtime))
+        return directory
+
+    def test_ttl_removes_only_expired_entries(self):
+        old = os.path.join(self.root, 'processed', 'result_old.png')
+        fresh = os.path.join(self.root, 'processed', 'result_new.png')
+        leak = os.path.join(self.root, 'temp', 'upload.dcm')
+        _write(old, 10, self.now - 7200)
+        _write(fresh, 10, self.now - 60)
+        _write(leak, 10, self.now - 7200)
+        pyramid = self._pyramid('a' * 32, [10, 10], self.now - 7200)
+
+        victims, files, total = self.storage.plan(now=self.now)
+        self.assertEqual({path for _, _, path in victims}, {old, leak, pyramid})
+        self.assertEqual((files, total), (1, 10))
+
+        result = self.storage.collect()
+        self.assertEqual(result['removed'], 3)
+        self.assertEqual(result['freed_bytes'], 40)
+        self.assertTrue(os.path.exists(fresh))
+        self.assertFalse(os.path.exists(old) or os.path.exists(leak) or os.path.exists(pyramid))
+
+    def test_capacity_evicts_least_recently_used_first(self):
+        paths = []
+        for i in range(4):
+            path = os.path.join(self.root, 'processed', f"result_{i}.png")
+            _write(path, 100, self.now - 100 + i)
+            paths.append(path)
+        # 金字塔目录整体计容量：两块瓦片共 150 字节，访问时间介于 result_0 与 result_1 之间
+        pyramid = self._pyramid('b' * 32, [100, 50], self.now - 99.5)
+
+        victims, files, total = self.storage.plan(now=self.now, max_bytes=400)
+        # 共 550 字节，需淘汰到 360 以下：按访问时间依次删除 result_0 和整个金字塔目录
+        self.assertEqual([path for _, _, path in victims], [paths[0], pyramid])
+        self.assertEqual([size for _, size, _ in victims], [100, 150])
+        self.assertEqual((files, total), (3, 300))
+
+        self.storage.collect(max_bytes=400)
+        self.assertFalse(os.path.exists(pyramid))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'processed'))),
+                         ['result_1.png', 'result_2.png', 'result_3.png'])
+
+    def test_dry_run_keeps_files(self):
+        path = os.path.join(self.root, 'processed', 'result_old.png')
+        _write(path, 10, self.now - 7200)
+        result = self.storage.collect(dry_run=True)
+        self.assertEqual(result['removed'], 1)
+        self.assertTrue(os.path.exists(path))
+
+    def test_unmanaged_directories_are_ignored(self):
+        path = os.path.join(self.root, 'articles', 'cover.png')
+        _write(path, 10, self.now - 7200)
+        self.storage.collect(ttl=0, max_bytes=0)
+        self.assertTrue(os.path.exists(path))
+
+    def test_save_deduplicates_by_content(self):
+        first = self.storage.save('processed', b'mask', '.png')
+        path = os.path.join(self.root, 'processed', os.path.basename(first))
+        os.utime(path, (self.now - 7200, self.now - 7200))
+
+        second = self.storage.save('processed', b'mask', '.png')
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('/media/processed/result_'))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'processed')), [os.path.basename(first)])
+        # 重复写入刷新访问时间，不会被 TTL 清理
+        self.assertGreater(os.path.getmtime(path), self.now - 60)
+        self.assertEqual(self.storage.stats()['saves'], 1)
+        self.assertEqual(self.storage.stats()['dedup_hits'], 1)
+
+        self.assertNotEqual(self.storage.save('processed', b'other', '.png'), first)
+
+    def test_save_rejects_unmanaged_area(self):
+        with self.assertRaises(ValueError):
+            self.storage.save('articles', b'x', '.png')
+
+
+@mock.patch('myapp.pyramid.get_media_storage', mock.Mock())
+class PyramidTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, PYRAMID_TILE_SIZE=256)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        buffer = io.BytesIO()
+        Image.fromarray(np.random.default_rng(0).integers(0, 256, (300, 600), dtype=np.uint8)).save(buffer, 'PNG')
+        self.png = buffer.getvalue()
+
+    def test_level_geometry(self):
+        self.assertEqual(pyramid_levels(1000, 600, 256), [(1000, 600, 4, 3), (500, 300, 2, 2), (250, 150, 1, 1)])
+        self.assertEqual(pyramid_levels(255, 17, 256), [(255, 17, 1, 1)])
+        # 奇数边长向上取整，与 Image.reduce(2) 一致
+        self.assertEqual(pyramid_levels(513, 257, 256)[1], (257, 129, 2, 1))
+
+    def test_tiles_cover_each_level(self):
+        key = ensure_pyramid(self.png)
+        self.assertEqual(key, content_hash(self.png))
+        directory = pyramid_dir(key)
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        self.assertEqual((meta['width'], meta['height'], len(meta['levels'])), (600, 300, 3))
+        for level in meta['levels']:
+            for col in range(level['cols']):
+                for row in range(level['rows']):
+                    with Image.open(os.path.join(directory, tile_name(level['level'], col, row))) as tile:
+                        self.assertEqual(tile.size, (min(256, level['width'] - col * 256),
+                                                     min(256, level['height'] - row * 256)))
+        # 内容相同时复用已有目录
+        self.assertEqual(ensure_pyramid(self.png), key)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'pyramids')), [key])
+
+    def test_meta_built_lazily_from_processed_result(self):
+        key = content_hash(self.png)
+        self.assertIsNone(load_meta(key))
+        os.makedirs(os.path.join(self.media_root, 'processed'))
+        with open(os.path.join(self.media_root, 'processed', f"cta_{key}.png"), 'wb') as f:
+            f.write(self.png)
+        self.assertFalse(os.path.exists(pyramid_dir(key)))
+        self.assertEqual(load_meta(key)['width'], 600)
+        self.assertTrue(os.path.exists(os.path.join(pyramid_dir(key), tile_name(2, 0, 0))))
+
+    def test_tiles_cached_privately(self):
+        from myapp.views import PyramidTileView
+
+        key = ensure_pyramid(self.png)
+        view = PyramidTileView.as_view()
+        response = view(RequestFactory().get('/'), key=key, level=0, col=2, row=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        response = view(RequestFactory().get('/', HTTP_IF_NONE_MATCH=response['ETag']), key=key, level=0, col=2, row=1)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(view(RequestFactory().get('/'), key=key, level=0, col=9, row=9).status_code, 404)
@@ -4,6 +4,7 @@ from django.views import View
 from django.utils.decorators import method_decorator
 from django.core.paginator import Paginator
 from django.shortcuts import render
+from django.urls import reverse
 from .models import Article, Video, CTPrice, CTAPrice
 import matplotlib.pyplot as plt
 from io import BytesIO
@@ -12,10 +13,9 @@ from collections import defaultdict
 import pydicom
 import os
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
 import uuid
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 import requests
 import time
 from django.core.cache import cache
@@ -23,7 +23,28 @@ from functools import wraps
 from PIL import Image
 import numpy as np
 import io
-from myapp.src.home.ubuntu.js.test_image import generate_image
+import logging
+from myapp.inference import run_generator, run_generator_batch, inference_stats, model_version, preview_supported
+from myapp.series import SeriesWriter, generate_series, iter_upload_slices
+from myapp.src.home.ubuntu.js.preprocessing import decode_gray, denormalize_to_uint8
+from myapp.result_cache import get_result_cache
+from myapp.jobs import get_job_manager
+from myapp.metrics import REGISTRY, stage_timer, track_endpoint
+from myapp.dicom_utils import (
+    DicomUploadHandler,
+    encode_mask,
+    mask_content_type,
+    mask_extension,
+    read_upload,
+    size_error,
+    upload_too_large,
+)
+from myapp.hu_cache import get_hu_cache, rescale_hu
+from myapp.dicom_render import PRESETS, resolve_window, render as render_window
+from myapp.storage import content_hash, get_media_storage
+from myapp.pyramid import KEY_RE, load_meta, pyramid_dir, tile_name
+
+logger = logging.getLogger(__name__)
 
 
 # 基类视图
@@ -81,74 +102,321 @@ def rate_limit(limit=10, per=60):
 # 图像处理类
 class ImageProcessor:
     @staticmethod
-    def process_image(file):
-        pil_image = Image.open(file).convert('L')
-        image_np = np.array(pil_image)
-        processed_image = generate_image(image_np)
-        return Image.fromarray((processed_image.squeeze() * 127.5 + 127.5).astype(np.uint8))
+    def decode(file):
+        with stage_timer('decode'):
+            return decode_gray(file)
 
     @staticmethod
-    def image_to_response(image):
+    def process_image(image_np, tiled=False, preview=False):
+        processed_image = run_generator(image_np, tiled=tiled, preview=preview)
+        with stage_timer('denormalize'):
+            return Image.fromarray(denormalize_to_uint8(processed_image))
+
+    @staticmethod
+    def image_to_png(image):
         buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        return HttpResponse(buffer.getvalue(), content_type="image/png")
+        with stage_timer('encode'):
+            image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    @staticmethod
+    def image_to_response(image):
+        return HttpResponse(ImageProcessor.image_to_png(image), content_type="image/png")
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ImageProcessingView(View):
+    @track_endpoint('process_image')
+    def post(self, request):
+        # 首次访问 request.FILES 时才解析 multipart 请求体，即上传 I/O
+        with stage_timer('upload'):
+            files = request.FILES
+        if 'imageUpload' not in files:
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+
+        # mode=tiled 时按原分辨率分块推理，不再缩放到 512x512；
+        # mode=preview 时低分辨率快速推理，生成器不支持动态尺寸时退回完整推理
+        mode = request.POST.get('mode', 'full')
+        if mode not in ('tiled', 'preview'):
+            mode = 'full'
+        try:
+            if mode == 'preview' and not preview_supported():
+                mode = 'full'
+            image_np = ImageProcessor.decode(files['imageUpload'])
+
+            # 相同切片 + 相同模型版本直接返回缓存的 PNG，跳过前向推理
+            cache = get_result_cache()
+            with stage_timer('cache_lookup'):
+                version = model_version()
+                key = cache.make_key(image_np, version, mode)
+                png = cache.get(key)
+            cache_status = 'HIT'
+            if png is None:
+                png = ImageProcessor.image_to_png(
+                    ImageProcessor.process_image(image_np, tiled=mode == 'tiled', preview=mode == 'preview')
+                )
+                # 推理期间模型已切换时，结果不属于查询时的版本，不能写到该版本的键下
+                if model_version() == version:
+                    cache.set(key, png)
+                cache_status = 'MISS'
+
+            response = HttpResponse(png, content_type="image/png")
+            response['X-Cache'] = cache_status
+            response['X-Render-Mode'] = mode
+            # 结果按内容哈希存入 media，瓦片金字塔在查看器首次请求 meta.json 时才生成；
+            # 只是附加功能，写盘失败时记录日志并省略该响应头，不影响已生成的结果
+            try:
+                with stage_timer('pyramid'):
+                    get_media_storage().save('processed', png, '.png', prefix='cta')
+                response['X-Pyramid'] = reverse('pyramid_meta', args=[content_hash(png)])
+            except OSError:
+                logger.exception("保存金字塔源图失败")
+            return response
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+# 异步生成：提交后立即返回 job id，推理由独立进程池完成
+@method_decorator(csrf_exempt, name='dispatch')
+class ImageJobView(View):
+    @track_endpoint('image_jobs')
     def post(self, request):
         if 'imageUpload' not in request.FILES:
             return JsonResponse({'error': 'Invalid request'}, status=400)
 
         try:
-            processed_image = ImageProcessor.process_image(request.FILES['imageUpload'])
-            return ImageProcessor.image_to_response(processed_image)
+            job_id = get_job_manager().submit(
+                request.FILES['imageUpload'].read(),
+                tiled=request.POST.get('mode') == 'tiled',
+            )
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        return JsonResponse({
+            'job_id': job_id,
+            'status_url': reverse('image_job_status', args=[job_id]),
+        }, status=202)
+
+
+class ImageJobStatusView(View):
+    def get(self, request, job_id):
+        status, payload = get_job_manager().status(job_id)
+        if status == 'done':
+            try:
+                with open(payload, 'rb') as f:
+                    return HttpResponse(f.read(), content_type="image/png")
+            except FileNotFoundError:
+                # 查询状态与读取结果之间被 TTL 清理删除，按已过期处理
+                status = 'missing'
+        if status == 'failed':
+            return JsonResponse({'status': status, 'error': payload}, status=500)
+        if status == 'pending':
+            return JsonResponse({'status': status}, status=202)
+        return JsonResponse({'error': '任务不存在或结果已过期'}, status=404)
+
+
+# 整序列生成：上传切片 ZIP 或多文件 DICOM 序列，按批流式推理，结果逐张写入 ZIP / 多帧 TIFF
+@method_decorator(csrf_exempt, name='dispatch')
+class SeriesProcessingView(View):
+    @track_endpoint('process_series')
+    def post(self, request):
+        files = request.FILES.getlist('series')
+        fmt = request.POST.get('format', 'zip')
+        if not files or fmt not in ('zip', 'tiff'):
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+
+        # 整序列结果较大且按请求命名，写入前顺带清理过期文件
+        get_media_storage().sweep()
+        output_dir = os.path.join(settings.MEDIA_ROOT, 'series')
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"series_{uuid.uuid4().hex}.{'zip' if fmt == 'zip' else 'tif'}"
+        output_path = os.path.join(output_dir, filename)
+        try:
+            with SeriesWriter(output_path, fmt) as writer:
+                count = generate_series(
+                    iter_upload_slices(files, getattr(settings, 'CTA_SERIES_WINDOW', PRESETS['soft_tissue'])),
+                    writer,
+                    run_generator_batch,
+                    batch_size=getattr(settings, 'CTA_SERIES_BATCH_SIZE', 8),
+                )
         except Exception as e:
+            if os.path.exists(output_path):
+                os.remove(output_path)
             return JsonResponse({'error': str(e)}, status=500)
+        return JsonResponse({
+            'result_url': os.path.join(settings.MEDIA_URL, 'series', filename),
+            'slices': count,
+        })
+
+
+class InferenceStatsView(View):
+    # 推理队列深度与批大小分布，用于权衡吞吐与尾延迟
+    def get(self, request):
+        return JsonResponse(inference_stats())
+
+
+class MetricsView(View):
+    # Prometheus 文本格式的指标，只对本机（或 METRICS_ALLOWED_IPS 中的地址）开放
+    def get(self, request):
+        allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+        if request.META.get('REMOTE_ADDR') not in allowed:
+            return HttpResponse(status=403)
+        return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 # DICOM处理类
 class DicomProcessor:
     @staticmethod
-    def handle_upload(file):
-        fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, 'temp'))
-        filename = fs.save(f"upload_{uuid.uuid4().hex}.dcm", file)
-        return fs.path(filename)
+    def read_hu(source):
+        """source 为文件路径或上传对象（直接在内存中解析，不写临时文件），返回 HU 数组"""
+        with stage_timer('dicom_read'):
+            dcm = read_upload(source) if hasattr(source, 'seek') else pydicom.dcmread(source)
+            return rescale_hu(dcm)
 
     @staticmethod
-    def process_file(dcm_path, threshold):
-        try:
-            dcm = pydicom.dcmread(dcm_path)
-            ct_values = dcm.pixel_array * getattr(dcm, 'RescaleSlope', 1) + getattr(dcm, 'RescaleIntercept', 0)
-            bin_img = np.where(ct_values > threshold, 255, 0).astype(np.uint8)
+    def threshold_mask(hu, threshold):
+        with stage_timer('threshold'):
+            return np.where(hu > threshold, 255, 0).astype(np.uint8)
+
+    @staticmethod
+    def encode(bin_img):
+        fmt = getattr(settings, 'DICOM_MASK_FORMAT', 'png')
+        with stage_timer('mask_encode'):
+            return encode_mask(bin_img, fmt, bits=getattr(settings, 'DICOM_MASK_BITS', 1)), fmt
 
-            output_dir = os.path.join(settings.MEDIA_ROOT, 'processed')
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"result_{uuid.uuid4().hex}.png")
+    @staticmethod
+    def save_mask(data, fmt):
+        # 按内容哈希命名，相同的掩膜只存一份，过期和超量的文件由 MediaStorage 清理
+        return get_media_storage().save('processed', data, mask_extension(fmt))
 
-            plt.imsave(output_path, bin_img, cmap='gray')
-            plt.close()
-            return os.path.join(settings.MEDIA_URL, 'processed', os.path.basename(output_path))
+    @staticmethod
+    def process_file(source, threshold):
+        try:
+            return DicomProcessor.save_mask(
+                *DicomProcessor.encode(DicomProcessor.threshold_mask(DicomProcessor.read_hu(source), threshold))
+            )
         except Exception as e:
             raise ValueError(f"处理失败: {str(e)}")
 
 
+@method_decorator(csrf_exempt, name='dispatch')
 class DicomProcessingView(View):
     def get(self, request):
         return render(request, 'dicom_processor.html')
 
+    @track_endpoint('process_dicom')
     def post(self, request):
+        # 上传处理器只能在读取请求体之前替换，CSRF 校验也会读取请求体，因此在这里装好后再做 CSRF 校验
+        if upload_too_large(request):
+            return render(request, 'dicom_processor.html', {'error': size_error()})
+        handler = DicomUploadHandler(request)
+        request.upload_handlers = [handler]
+        return self._process(request, handler)
+
+    @method_decorator(csrf_protect)
+    def _process(self, request, handler):
         context = {}
         try:
-            dcm_file = request.FILES['dicom_file']
+            with stage_timer('upload'):
+                files = request.FILES
+            if handler.too_large:
+                raise ValueError(size_error())
             threshold = int(request.POST.get('threshold', 650))
-            input_path = DicomProcessor.handle_upload(dcm_file)
-            context['result_url'] = DicomProcessor.process_file(input_path, threshold)
-            os.remove(input_path)
+            try:
+                hu = DicomProcessor.read_hu(files['dicom_file'])
+                data, fmt = DicomProcessor.encode(DicomProcessor.threshold_mask(hu, threshold))
+                context['result_url'] = DicomProcessor.save_mask(data, fmt)
+                # 掩膜已按同一内容哈希保存，金字塔在首次请求 meta.json 时由它生成
+                context['pyramid_url'] = reverse('pyramid_meta', args=[content_hash(data)])
+            except Exception as e:
+                raise ValueError(f"处理失败: {str(e)}")
+            # 缓存 HU 数组，之后调整阈值只需带着令牌请求 DicomThresholdView
+            context['hu_token'] = get_hu_cache().put(hu)
+            context['threshold'] = threshold
         except Exception as e:
             context['error'] = str(e)
         return render(request, 'dicom_processor.html', context)
 
+
+class DicomThresholdView(View):
+    # 对缓存的 HU 数组重新阈值，只返回新的掩膜图像，不写盘
+    @track_endpoint('dicom_threshold')
+    def post(self, request):
+        try:
+            threshold = float(request.POST['threshold'])
+        except (KeyError, ValueError):
+            return JsonResponse({'error': '无效的阈值'}, status=400)
+        hu = get_hu_cache().get(request.POST.get('token', ''))
+        if hu is None:
+            return JsonResponse({'error': '缓存已失效，请重新上传 DICOM 文件'}, status=404)
+        data, fmt = DicomProcessor.encode(DicomProcessor.threshold_mask(hu, threshold))
+        return HttpResponse(data, content_type=mask_content_type(fmt))
+
+
+class DicomPreviewView(View):
+    # 按窗预设（或 window / level 参数）把缓存的 HU 切片渲染为 8 位灰度 PNG；查找表按窗缓存，切换预设只需一次 np.take
+    @track_endpoint('dicom_preview')
+    def get(self, request):
+        try:
+            if 'window' in request.GET or 'level' in request.GET:
+                window, level = resolve_window(None, float(request.GET['window']), float(request.GET['level']))
+            else:
+                window, level = resolve_window(request.GET.get('preset', 'soft_tissue'))
+        except (KeyError, ValueError):
+            return JsonResponse({'error': f"无效的窗参数，可选预设: {', '.join(PRESETS)}"}, status=400)
+        hu = get_hu_cache().get(request.GET.get('token', ''))
+        if hu is None:
+            return JsonResponse({'error': '缓存已失效，请重新上传 DICOM 文件'}, status=404)
+        with stage_timer('render'):
+            image = render_window(hu, window, level)
+        with stage_timer('preview_encode'):
+            buffer = io.BytesIO()
+            Image.fromarray(image, mode='L').save(buffer, format='PNG', compress_level=1)
+        response = HttpResponse(buffer.getvalue(), content_type='image/png')
+        # 令牌对应的数据不会变化，同一窗参数的图像允许浏览器缓存
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+
+# 结果瓦片金字塔：目录按内容哈希命名，瓦片内容永不变化，允许浏览器长期缓存；
+# 瓦片是患者影像，只允许私有缓存，共享代理和 CDN 不得保存
+class PyramidMetaView(View):
+    @track_endpoint('pyramid_meta')
+    def get(self, request, key):
+        if not KEY_RE.match(key):
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+        try:
+            with stage_timer('pyramid'):
+                meta = load_meta(key)
+        except OSError:
+            logger.exception("生成瓦片金字塔失败")
+            return JsonResponse({'error': '生成瓦片金字塔失败'}, status=500)
+        if meta is None:
+            return JsonResponse({'error': '金字塔不存在或已被清理'}, status=404)
+        meta['tile_url'] = reverse('pyramid_meta', args=[key]).rsplit('/', 1)[0] + '/{level}/{col}_{row}.png'
+        response = JsonResponse(meta)
+        # meta 每次都回源校验，顺带刷新金字塔的访问时间，避免被当作过期文件清理
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class PyramidTileView(View):
+    def get(self, request, key, level, col, row):
+        if not KEY_RE.match(key):
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+        etag = f'"{key}-{level}-{col}-{row}"'
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponse(status=304)
+        else:
+            path = os.path.join(pyramid_dir(key), tile_name(level, col, row))
+            try:
+                response = FileResponse(open(path, 'rb'), content_type='image/png')
+            except FileNotFoundError:
+                return JsonResponse({'error': '瓦片不存在'}, status=404)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+
+
 # 价格分析
 class PriceAnalyzer:
     def __init__(self, model, targets):